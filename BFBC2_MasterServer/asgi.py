@@ -18,6 +18,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "BFBC2_MasterServer.settings")
 
 django_asgi_app = get_asgi_application()
 
+from Plasma.locale_data import locale_data
 from Plasma.urls import websocket_urlpatterns as plasma_websocket_urlpatterns
 from Theater.models import Lobby
 from Theater.urls import websocket_urlpatterns as theater_websocket_urlpatterns
@@ -31,6 +32,10 @@ application = ProtocolTypeRouter(
     }
 )
 
+# Parse country lists and TOS before serving (not on the event loop), and reload them when data files change
+locale_data.reload()
+locale_data.watch()
+
 try:
     # Remove all lobbies on server start
     Lobby.objects.all().delete()
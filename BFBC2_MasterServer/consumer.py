@@ -3,6 +3,7 @@ import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 
+from BFBC2_MasterServer.metrics import sent_bytes, sent_packets
 from BFBC2_MasterServer.packet import Packet, PacketParseException
 
 
@@ -52,8 +53,19 @@ class BFBC2Consumer(AsyncWebsocketConsumer):
         return packet
 
     async def send_packet(self, packet: Packet):
+        # Compile before logging, so the packet length in log doesn't compile it second time
+        data = packet.compile()
+
         self.logger.debug(f"-> {packet}")
-        await self.send(bytes_data=packet.compile())
+        await self.send_compiled(packet.service, data)
+
+    async def send_compiled(self, service: str, data: bytes):
+        """Send already compiled packet"""
+
+        sent_packets.inc(service)
+        sent_bytes.inc(service, amount=len(data))
+
+        await self.send(bytes_data=data)
 
     async def external_send(self, event):
         raise NotImplementedError("external_send not implemented")
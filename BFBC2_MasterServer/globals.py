@@ -12,3 +12,12 @@ CLIENT_INITIAL_MEMCHECK_INTERVAL = 500
 SERVER_PING_INTERVAL = 120
 SERVER_MEMCHECK_INTERVAL = 300
 SERVER_INITIAL_MEMCHECK_INTERVAL = 500
+
+# Pings and memchecks are randomly delayed by up to 10% of their interval
+TIMER_JITTER = 0.1
+
+# Max size of reassembled (decoded) chunked transaction
+MAX_CHUNKED_TRANSACTION_SIZE = 1024 * 1024
+
+# How long (in seconds) state of hosted game is kept in Redis without any heartbeat from its server
+GAME_SESSION_TTL = 60 * 60
@@ -0,0 +1,174 @@
+from bisect import bisect_left
+
+registry = {}
+
+
+class Metric:
+    """Base for in-process metrics, every metric is registered (by name) in the registry"""
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        if name in registry:
+            raise ValueError(f"Metric {name} is already registered")
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # Label values (tuple) -> value
+
+        registry[name] = self
+
+    def _new_series(self, label_values: tuple, value):
+        """Register new label combination, label values are passed in the order of labelnames"""
+
+        if len(label_values) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}")
+
+        self.values[label_values] = value
+        return value
+
+    def _format_labels(self, key, extra=""):
+        labels = [
+            f'{name}="{escape_label_value(value)}"'
+            for name, value in zip(self.labelnames, key)
+        ]
+
+        if extra:
+            labels.append(extra)
+
+        return "{" + ",".join(labels) + "}" if labels else ""
+
+    def render(self):
+        """Render metric in Prometheus text format"""
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+        for key, value in list(self.values.items()):
+            lines.extend(self._render_value(key, value))
+
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Counter(Metric):
+    """Value which only goes up (like number of sent packets)"""
+
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        value = self.values.get(label_values)
+
+        if value is None:
+            value = self._new_series(label_values, 0)
+
+        self.values[label_values] = value + amount
+
+    def get(self, *label_values):
+        return self.values.get(label_values, 0)
+
+
+class Gauge(Metric):
+    """Value which can go up and down (like number of buffered items)"""
+
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        if label_values not in self.values:
+            self._new_series(label_values, value)
+
+        self.values[label_values] = value
+
+    def get(self, *label_values):
+        return self.values.get(label_values, 0)
+
+
+class Histogram(Metric):
+    """Distribution of observed values (like transaction latency), counted in fixed buckets"""
+
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        series = self.values.get(label_values)
+
+        if series is None:
+            # Counts of every bucket (last one is +Inf) followed by sum of all values, allocated only once
+            series = self._new_series(
+                label_values, [0] * (len(self.buckets) + 1) + [0.0]
+            )
+
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def get_count(self, *label_values):
+        series = self.values.get(label_values)
+        return sum(series[:-1]) if series is not None else 0
+
+    def _render_value(self, key, series):
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + ("+Inf",), series):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(
+                f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}"
+            )
+
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {series[-1]}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+
+        return lines
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render():
+    """Render all registered metrics in Prometheus text format"""
+
+    lines = []
+
+    for metric in list(registry.values()):
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+sent_packets = Counter(
+    "bfbc2_sent_packets_total", "Packets sent to clients", ["service"]
+)
+sent_bytes = Counter(
+    "bfbc2_sent_bytes_total",
+    "Bytes sent to clients (including packet headers)",
+    ["service"],
+)
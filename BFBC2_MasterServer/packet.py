@@ -1,16 +1,29 @@
 import logging
 import re
+from collections.abc import MutableMapping
 from datetime import datetime
 from enum import Enum
-from urllib.parse import quote, unquote
-
-from BFBC2_MasterServer.tools import flatten
+from urllib.parse import unquote
 
 SERVICE_OFFSET, SERVICE_LENGTH = (0x0, 0x4)
 KIND_OFFSET, KIND_LENGTH = (SERVICE_OFFSET + SERVICE_LENGTH, 0x4)
 LENGTH_OFFSET, LENGTH_LENGTH = (KIND_OFFSET + KIND_LENGTH, 0x4)
 HEADER_LENGTH = 0xC
 
+# Characters which urllib.parse.quote never escapes (with "/" being default safe character)
+SAFE_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~/"
+SAFE_VALUE = re.compile(f"[{re.escape(SAFE_CHARACTERS)}]*")
+
+# Encoded form of every UTF-8 byte, EA uses lowercase escapes and leaves spaces unescaped
+ESCAPE_TABLE = tuple(
+    chr(byte)
+    if chr(byte) in SAFE_CHARACTERS
+    else " "
+    if byte == 0x20
+    else f"%{byte:02x}"
+    for byte in range(256)
+)
+
 logger = logging.getLogger("packet")
 
 
@@ -27,6 +40,7 @@ class Packet:
 
     def __init__(self, **kwargs):
         self.__data = {}
+        self.__compiled_data = None
         raw_data = kwargs.get("raw_data", None)
 
         if raw_data is not None:
@@ -42,9 +56,18 @@ class Packet:
             if data:
                 self.__read_data(data, 0)
 
+            # Already encoded transaction data (with NULL terminator), only header is compiled for such packets
+            self.__compiled_data = kwargs.get("compiled_data", None)
+
     def __str__(self):
         length = len(self.compile()) if self.__length == 0 else self.__length
-        return f"{self.service} {hex(self.kind)} ({length} bytes): {self.__data}"
+        data = "(precompiled)" if self.precompiled else self.__data
+        return f"{self.service} {hex(self.kind)} ({length} bytes): {data}"
+
+    @property
+    def precompiled(self):
+        """Whether packet data was already compiled (and cannot be changed anymore)"""
+        return self.__compiled_data is not None
 
     def Get(self, key: str):
         """Get value from packet"""
@@ -56,6 +79,10 @@ class Packet:
 
     def Set(self, key: str, value):
         """Set value in packet"""
+
+        if self.precompiled:
+            raise ValueError(f"Cannot set {key}, packet data is already compiled")
+
         self.__data[key] = value
 
     def __parse_raw_data(self, raw_data: bytes):
@@ -86,175 +113,169 @@ class Packet:
         self.__read_data(raw_data, HEADER_LENGTH)
 
     def __read_data(self, raw_data, offset):
-        transaction_data = raw_data[offset:].decode("utf-8").split("\n")
-
-        # If transaction data is null terminated, remove null terminator before parsing
-        if transaction_data[-1] == "\0":
-            transaction_data = transaction_data[:-1]
+        """Parse transaction data into packet data (in a single pass)"""
 
-        tokens = self.__make_key_value_pairs(transaction_data)
         tree = {}
+        arrays = []
 
-        for key, value in tokens:
-            tree = self.__add_branch(tree, key.split("."), self.__parse_value(value))
+        # Consecutive lines usually share the same parent (e.g. "u.0.s.1.k", "u.0.s.1.v"), so remember last branch
+        last_parent, last_branch = None, tree
 
-        self.ParseTransactionData(tree)
+        # Decode straight from the buffer (without slicing copy), data can also be bytearray or memoryview
+        for line in str(memoryview(raw_data)[offset:], "utf-8").split("\n"):
+            key, separator, value = line.partition("=")
 
-    def __make_key_value_pairs(self, transaction_data):
-        """Make key value pairs from transaction data"""
-        final = []
+            if not separator:
+                # Ignore invalid pairs (and the NULL terminator)
+                continue
 
-        for data in transaction_data:
-            pair = data.split("=", 1)
+            if value.isdigit():
+                value = int(value)
+            elif "%" in value:
+                value = unquote(value)
 
-            if len(pair) != 2:
-                # Ignore invalid pairs
+            parent, dot, leaf = key.rpartition(".")
+
+            if not dot:
+                tree[leaf] = value
+                last_parent = None  # Value could replace the remembered branch
                 continue
 
-            final.append(pair)
+            if parent == last_parent:
+                last_branch[leaf] = value
 
-        return final
+                if leaf == "[]" and "." not in parent:
+                    arrays.append(parent)
 
-    def __add_branch(self, tree, vector, value):
-        key = vector[0]
-        tree[key] = (
-            value
-            if len(vector) == 1
-            else self.__add_branch(tree[key] if key in tree else {}, vector[1:], value)
-        )
-        return tree
+                continue
 
-    def ParseTransactionData(self, data):
-        """Parse transaction data into packet data"""
+            path = parent.split(".")
+            branch = tree
+
+            try:
+                for name in path:
+                    child = branch.get(name)
+
+                    if child is None:
+                        child = branch[name] = {}
+
+                    branch = child
+
+                branch[leaf] = value
+            except (AttributeError, TypeError):
+                raise PacketParseException(
+                    f"Key {key} conflicts with already parsed value"
+                )
+
+            if (path[1] if len(path) > 1 else leaf) == "[]":
+                arrays.append(path[0])
+
+            last_parent, last_branch = parent, branch
+
+        # Only top-level arrays are folded into lists, nested ones stay as dicts
+        for key in arrays:
+            value = tree[key]
 
-        for key, value in data.items():
             if isinstance(value, dict) and "[]" in value:
-                length = value.pop("[]")
-                temp_array = []
+                tree[key] = self.__fold_array(value)
 
-                for item in value:
-                    temp_array.append(value[item])
+        self.__data.update(tree)
 
-                if length != len(temp_array):
-                    logger.warning(
-                        f"Array length does not match (Expected: {length}, Got: {len(temp_array)})"
-                    )
+    def __fold_array(self, value: dict):
+        """Convert array branch (with "[]" length key) into list"""
 
-                self.Set(key, temp_array)
+        length = value.pop("[]")
+        temp_array = list(value.values())
+
+        if length != len(temp_array):
+            logger.warning(
+                f"Array length does not match (Expected: {length}, Got: {len(temp_array)})"
+            )
+
+        return temp_array
+
+    def ParseTransactionData(self, data):
+        """Parse transaction data into packet data"""
+
+        for key, value in data.items():
+            if isinstance(value, dict) and "[]" in value:
+                self.Set(key, self.__fold_array(value))
             else:
                 self.Set(key, value)
 
-    def __parse_value(self, value: str):
-        """Parse value from string"""
-        if value.isdigit():
-            return int(value)
-        else:
-            return unquote(value)
-
     def __encode_string(self, value):
         if isinstance(value, datetime):
-            temp_value = quote(value.strftime("%b-%d-%Y %H:%M:%S UTC"))
+            value = value.strftime("%b-%d-%Y %H:%M:%S UTC")
         else:
-            temp_value = quote(str(value))
+            value = str(value)
 
-        temp_value = temp_value.replace("%20", " ")
+        if SAFE_VALUE.fullmatch(value):
+            # Nothing to quote, send value as it is
+            return value
 
-        if temp_value.find(" ") != -1:
-            temp_value = '"' + temp_value + '"'
+        value = "".join(map(ESCAPE_TABLE.__getitem__, value.encode()))
 
-        return re.sub(r"%[0-9A-F]{2}", lambda pat: pat.group(0).lower(), temp_value)
+        if " " in value:
+            value = '"' + value + '"'
+
+        return value
 
     def compile(self):
-        temp_packet = self.service.encode()
+        temp_packet = bytearray(self.service.encode())
         temp_packet += int.to_bytes(self.kind, 4, byteorder="big")
+        temp_packet += bytes(LENGTH_LENGTH)  # Length is filled once data is written
 
-        temp_data = self.__convert_data()
-
-        temp_packet += int.to_bytes(HEADER_LENGTH + len(temp_data), 4, byteorder="big")
-        temp_packet += temp_data.encode()
+        data_offset = len(temp_packet)
 
-        return temp_packet
+        if self.precompiled:
+            temp_packet += self.__compiled_data
+        else:
+            for key, value in self.__data.items():
+                self.__write_value(temp_packet, key, value)
 
-    def __convert_data(self):
-        final_data = ""
-        temp_data = flatten(self.__data)
+            # EA uses the final NULL delimiter so we set the last char from the data to NULL
+            if len(temp_packet) > data_offset:
+                temp_packet[-1] = 0  # Replace last new line char
+            else:
+                temp_packet.append(0)
 
-        for key in temp_data:
-            value = temp_data[key]
+        temp_packet[data_offset - LENGTH_LENGTH : data_offset] = int.to_bytes(
+            HEADER_LENGTH + len(temp_packet) - data_offset, 4, byteorder="big"
+        )
 
-            if isinstance(value, Enum):
-                final_data += key + "=" + str(value.value) + "\n"
-            elif isinstance(value, list):
-                final_data += key + ".[]=" + str(len(value)) + "\n"
-                final_data += self.__process_dict(key, value)
-            else:
-                final_data += "%s=%s\n" % (key, self.__encode_string(value))
-
-        # EA uses the final NULL delimiter so we set the last char from the data to NULL
-        final_data = final_data[:-1]  # Remove last new line char
-        final_data += "\0"  # Append NULL
-
-        return final_data
-
-    def __process_dict(self, key, values, skip_idx=False):
-        processed_dict = ""
-
-        for x in range(len(values)):
-            if isinstance(values[x], dict):
-                for y in values[x]:
-                    if isinstance(values[x][y], list):
-                        processed_dict += (
-                            f"{key}.{x}.{y}" + ".[]=" + str(len(values[x][y])) + "\n"
-                        )
-                        processed_dict += self.__process_dict(
-                            f"{key}.{x}.{y}", values[x][y]
-                        )
-                    elif isinstance(values[x][y], dict):
-                        processed_dict += self.__process_dict(
-                            f"{key}.{x}.{y}", [values[x][y]], True
-                        )
+        self.__length = len(temp_packet)
+        return bytes(temp_packet)
+
+    def __write_value(self, out: bytearray, key, value):
+        if isinstance(value, MutableMapping):
+            # Nested dicts are flattened into dotted keys
+            for name, item in value.items():
+                self.__write_value(out, key + "." + name, item)
+        elif isinstance(value, Enum):
+            out += f"{key}={str(value.value)}\n".encode()
+        elif isinstance(value, list):
+            out += f"{key}.[]={len(value)}\n".encode()
+            self.__write_list(out, key, value)
+        else:
+            out += f"{key}={self.__encode_string(value)}\n".encode()
+
+    def __write_list(self, out: bytearray, key, values, skip_idx=False):
+        for x, value in enumerate(values):
+            if isinstance(value, dict):
+                for y, item in value.items():
+                    if isinstance(item, list):
+                        out += f"{key}.{x}.{y}.[]={len(item)}\n".encode()
+                        self.__write_list(out, f"{key}.{x}.{y}", item)
+                    elif isinstance(item, dict):
+                        self.__write_list(out, f"{key}.{x}.{y}", [item], True)
+                    elif skip_idx:
+                        out += f"{key}.{y}={self.__encode_string(item)}\n".encode()
                     else:
-                        if skip_idx:
-                            processed_dict += (
-                                key
-                                + "."
-                                + y
-                                + "="
-                                + self.__encode_string(values[x][y])
-                                + "\n"
-                            )
-                        else:
-                            processed_dict += (
-                                key
-                                + "."
-                                + str(x)
-                                + "."
-                                + y
-                                + "="
-                                + self.__encode_string(values[x][y])
-                                + "\n"
-                            )
+                        out += f"{key}.{x}.{y}={self.__encode_string(item)}\n".encode()
+            elif isinstance(value, list):
+                out += f"{key}.{x}.[]={len(value)}\n".encode()
+                self.__write_list(out, f"{key}.{x}", value)
+            elif skip_idx:
+                out += f"{key}={self.__encode_string(value)}\n".encode()
             else:
-                if isinstance(values[x], list):
-                    processed_dict += f"{key}.{x}" + ".[]=" + str(len(values[x])) + "\n"
-                    processed_dict += self.__process_dict(f"{key}.{x}", values[x])
-                elif isinstance(values[x], dict):
-                    processed_dict += self.__process_dict(
-                        f"{key}.{x}", [values[x]], True
-                    )
-                else:
-                    if skip_idx:
-                        processed_dict += (
-                            key + "=" + self.__encode_string(values[x]) + "\n"
-                        )
-                    else:
-                        processed_dict += (
-                            key
-                            + "."
-                            + str(x)
-                            + "="
-                            + self.__encode_string(values[x])
-                            + "\n"
-                        )
-
-        return processed_dict
+                out += f"{key}.{x}={self.__encode_string(value)}\n".encode()
@@ -1,13 +1,39 @@
 from abc import ABC, abstractmethod
+from time import perf_counter
 
+from BFBC2_MasterServer.metrics import Counter, Histogram
+from Plasma.enumerators.ClientType import ClientType
 from Plasma.error import TransactionError
 
+transaction_duration = Histogram(
+    "plasma_transaction_duration_seconds",
+    "Time spent handling transactions started by clients",
+    ["service", "txn", "type"],
+)
+transaction_errors = Counter(
+    "plasma_transaction_errors_total",
+    "Transactions started by clients which ended with an error",
+    ["service", "txn", "type"],
+)
+unscheduled_transaction_duration = Histogram(
+    "plasma_unscheduled_transaction_duration_seconds",
+    "Time spent creating unscheduled transactions (started by server)",
+    ["service", "txn", "type"],
+)
+unscheduled_transaction_errors = Counter(
+    "plasma_unscheduled_transaction_errors_total",
+    "Unscheduled transactions which failed to be created",
+    ["service", "txn", "type"],
+)
+
 
 class Service(ABC):
-    def __init__(self, connection) -> None:
+    """Stateless transaction handlers, one instance is shared by all connections (passed to every handler)"""
+
+    def __init__(self) -> None:
+        self.name = type(self).__name__
         self.resolver_map = {}
         self.creator_map = {}
-        self.connection = connection
 
     @abstractmethod
     def _get_resolver(self, txn):
@@ -17,38 +43,73 @@ class Service(ABC):
     def _get_creator(self, txn):
         raise NotImplementedError("Service must implement __get_creator")
 
-    async def handle(self, data):
+    def get_resolvers(self):
+        """Get all resolvers by transaction name (used to build dispatch tables)"""
+        return {txn.value: resolver for txn, resolver in self.resolver_map.items()}
+
+    async def handle(self, connection, data, resolver=None):
+        """Handle transaction, resolver can be passed when it was already looked up"""
+
         txn = data.Get("TXN")
 
-        try:
-            resolver = self._get_resolver(txn)
-        except KeyError:
-            self.connection.logger.error(
-                f"Invalid transaction {txn} for service {self}"
-            )
-            return TransactionError(TransactionError.Code.SYSTEM_ERROR)
+        if resolver is None:
+            try:
+                resolver = self._get_resolver(txn)
+            except (KeyError, ValueError):
+                connection.logger.error(f"Invalid transaction {txn} for service {self}")
+                return TransactionError(TransactionError.Code.SYSTEM_ERROR)
+
+        start = perf_counter()
 
         try:
-            return await resolver(data)
+            response = await resolver(connection, data)
         except Exception:
-            self.connection.logger.exception(f"Failed to handle transaction {txn}")
-            return TransactionError(TransactionError.Code.SYSTEM_ERROR)
+            connection.logger.exception(f"Failed to handle transaction {txn}")
+            response = TransactionError(TransactionError.Code.SYSTEM_ERROR)
 
-    async def start_transaction(self, txn, data):
+        self.__observe(
+            transaction_duration, transaction_errors, connection, txn, start, response
+        )
+        return response
+
+    async def start_transaction(self, connection, txn, data):
         """Start a scheduled transaction"""
 
         try:
             creator = self._get_creator(txn)
-        except KeyError:
-            self.connection.logger.error(
-                f"Invalid transaction {txn} for service {self}"
-            )
+        except (KeyError, ValueError):
+            connection.logger.error(f"Invalid transaction {txn} for service {self}")
             return TransactionError(TransactionError.Code.SYSTEM_ERROR)
 
+        start = perf_counter()
+
         try:
-            return await creator(data)
+            response = await creator(connection, data)
         except Exception:
-            self.connection.logger.exception(
+            connection.logger.exception(
                 f"Failed to create unscheduled transaction {txn}"
             )
-            return TransactionError(TransactionError.Code.SYSTEM_ERROR)
+            response = TransactionError(TransactionError.Code.SYSTEM_ERROR)
+
+        self.__observe(
+            unscheduled_transaction_duration,
+            unscheduled_transaction_errors,
+            connection,
+            txn,
+            start,
+            response,
+        )
+        return response
+
+    def __observe(self, duration, errors, connection, txn, start, response):
+        """Record transaction latency (and error) in metrics"""
+
+        elapsed = perf_counter() - start
+        client_type = (
+            "server" if connection.clientType == ClientType.SERVER else "client"
+        )
+
+        duration.observe(elapsed, self.name, txn, client_type)
+
+        if isinstance(response, TransactionError):
+            errors.inc(self.name, txn, client_type)
@@ -0,0 +1,151 @@
+import asyncio
+
+from django.conf import settings
+from redis.asyncio import BlockingConnectionPool, Redis
+
+# How long login keys stay valid after disconnect (approximately that's how long the session is valid in original server)
+LOGIN_KEY_EXPIRY = 60 * 60 * 3
+
+# How long a request waits for free connection when the whole pool is in use
+POOL_TIMEOUT = 5
+
+
+class SessionStore:
+    """Login sessions, login keys and presence shared by Plasma and Theater connections
+
+    Uses non-blocking Redis client (with connection pool), so store operations don't stall the event loop
+    """
+
+    def __init__(self, url, max_connections):
+        self.url = url
+        self.max_connections = max_connections
+
+        self.__client = None
+        self.__loop = None
+        self.__scripts = {}
+
+    @property
+    def client(self) -> Redis:
+        loop = asyncio.get_running_loop()
+
+        # Connections are bound to the loop they were opened in
+        if self.__client is None or self.__loop is not loop:
+            pool = BlockingConnectionPool.from_url(
+                self.url,
+                max_connections=self.max_connections,
+                timeout=POOL_TIMEOUT,
+                decode_responses=True,
+            )
+
+            self.__client = Redis(connection_pool=pool)
+            self.__loop = loop
+            self.__scripts = {}
+
+        return self.__client
+
+    def script(self, source):
+        """Get Lua script registered with the client, SHA of the script is computed only once"""
+
+        client = self.client
+        script = self.__scripts.get(source)
+
+        if script is None or script.registered_client is not client:
+            script = self.__scripts[source] = client.register_script(source)
+
+        return script
+
+    async def get_user_login(self, user_id):
+        """Get channel name of active user session and user login key (both can be None)"""
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(f"userSession:{user_id}")
+            pipe.get(f"userLoginKey:{user_id}")
+            return tuple(await pipe.execute())
+
+    async def set_user_login(self, user_id, user_lkey, channel_name=None):
+        """Save user login key (without expiration) and session of the connection user logged in with"""
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            if channel_name is not None:
+                pipe.set(f"userSession:{user_id}", channel_name)
+
+            pipe.set(f"userLoginKey:{user_id}", user_lkey)
+            await pipe.execute()
+
+    async def get_user_session(self, user_id):
+        """Get channel name of connection user is logged in with"""
+        return await self.client.get(f"userSession:{user_id}")
+
+    async def get_persona_login_key(self, user_id):
+        return await self.client.get(f"personaLoginKey:{user_id}")
+
+    async def set_persona_login(self, user_id, persona_id, persona_lkey):
+        """Save persona login key (without expiration) and map it to logged in persona"""
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(f"personaLoginKey:{user_id}", persona_lkey)
+            pipe.set(f"lkeyMap:{persona_lkey}", persona_id)
+            await pipe.execute()
+
+    async def get_persona_id(self, persona_lkey):
+        """Get id of persona the login key belongs to"""
+
+        persona_id = await self.client.get(f"lkeyMap:{persona_lkey}")
+        return int(persona_id) if persona_id is not None else None
+
+    async def get_persona_id_and_ttl(self, persona_lkey):
+        """Get id of persona the login key belongs to and seconds until the key expires (negative if it never does)"""
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.get(f"lkeyMap:{persona_lkey}")
+            pipe.ttl(f"lkeyMap:{persona_lkey}")
+            persona_id, ttl = await pipe.execute()
+
+        return int(persona_id) if persona_id is not None else None, ttl
+
+    async def logout(self, user_id, persona_id=None, persona_lkey=None):
+        """Remove user session (and persona presence), login keys are set to expire"""
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(f"userSession:{user_id}")
+            pipe.expire(f"userLoginKey:{user_id}", LOGIN_KEY_EXPIRY)
+
+            if persona_lkey is not None:
+                pipe.expire(f"personaLoginKey:{user_id}", LOGIN_KEY_EXPIRY)
+                pipe.expire(f"lkeyMap:{persona_lkey}", LOGIN_KEY_EXPIRY)
+                pipe.delete(f"presence:{persona_id}")
+
+            await pipe.execute()
+
+    async def get_theater_session(self, persona_lkey):
+        """Get channel name of Theater connection persona is logged in with"""
+        return await self.client.get(f"theaterSession:{persona_lkey}")
+
+    async def get_theater_sessions(self, persona_lkeys):
+        """Get channel names of Theater connections for multiple personas (in a single round-trip)"""
+
+        if not persona_lkeys:
+            return []
+
+        return await self.client.mget(
+            [f"theaterSession:{persona_lkey}" for persona_lkey in persona_lkeys]
+        )
+
+    async def set_theater_session(self, persona_lkey, channel_name):
+        await self.client.set(f"theaterSession:{persona_lkey}", channel_name)
+
+    async def delete_theater_session(self, persona_lkey):
+        await self.client.delete(f"theaterSession:{persona_lkey}")
+
+    async def get_presence(self, persona_id):
+        """Get (base64 encoded) presence status of persona"""
+        return await self.client.get(f"presence:{persona_id}")
+
+    async def set_presence(self, persona_id, status):
+        await self.client.set(f"presence:{persona_id}", status)
+
+
+session_store = SessionStore(
+    f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+    settings.SESSION_STORE_MAX_CONNECTIONS,
+)
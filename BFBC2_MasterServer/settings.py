@@ -107,6 +107,9 @@ SESSION_CACHE_ALIAS = "default"
 REDIS_HOST = get_config("REDIS_HOST", "redis")
 REDIS_PORT = int(get_config("REDIS_PORT", 6379))
 
+# Pool size of the async session store (logins, login keys and presence are stored outside of django cache)
+SESSION_STORE_MAX_CONNECTIONS = int(get_config("SESSION_STORE_MAX_CONNECTIONS", 32))
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -244,3 +247,27 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
 
 REAL_IP_HEADER = get_config("REAL_IP_HEADER", "X-REAL-IP").upper()
+
+# Bearer token Prometheus has to send to read /easo/metrics, metrics aren't served at all without it
+METRICS_TOKEN = get_config("METRICS_TOKEN", "")
+
+# Process independent (read-only) Plasma transactions of a connection concurrently, responses are still sent in order
+PLASMA_PIPELINING = strtobool(get_config("PLASMA_PIPELINING", "False"))
+PLASMA_PIPELINE_LIMIT = int(get_config("PLASMA_PIPELINE_LIMIT", 4))
+
+# Buffer stat updates in memory and write them in batches, stats are written (at most) STATS_FLUSH_INTERVAL seconds
+# later or once STATS_BUFFER_LIMIT stats are buffered. Updates from that window are lost if the process is killed
+STATS_WRITE_BEHIND = strtobool(get_config("STATS_WRITE_BEHIND", "False"))
+STATS_FLUSH_INTERVAL = float(get_config("STATS_FLUSH_INTERVAL", 5))
+STATS_BUFFER_LIMIT = int(get_config("STATS_BUFFER_LIMIT", 50000))
+
+# How stats are stored, "rows" (row per stat) or "document" (JSONB document per persona), convert with convert_stats
+RANKING_BACKEND = get_config("RANKING_BACKEND", "rows")
+
+# Leaderboards are read from rank snapshot (refreshed by refresh_ranks) when Redis index isn't built,
+# unless the snapshot misses changes older than this many seconds
+RANK_SNAPSHOT_MAX_AGE = float(get_config("RANK_SNAPSHOT_MAX_AGE", 300))
+
+# Share results of identical game lists (GLST) requested within GAME_LIST_CACHE_TTL seconds (and of concurrent ones)
+GAME_LIST_CACHE = strtobool(get_config("GAME_LIST_CACHE", "False"))
+GAME_LIST_CACHE_TTL = float(get_config("GAME_LIST_CACHE_TTL", 2))
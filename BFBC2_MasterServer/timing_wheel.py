@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import math
+import random
+
+logger = logging.getLogger("timing_wheel")
+
+
+class Timer:
+    """Scheduled callback, returned by TimingWheel.schedule"""
+
+    __slots__ = ("callback", "rounds", "slot")
+
+    def __init__(self, callback, rounds, slot):
+        self.callback = callback
+        # How many more times the wheel has to turn before the timer fires
+        self.rounds = rounds
+        self.slot = slot
+
+    def cancel(self):
+        """Cancel the timer (does nothing if timer already fired)"""
+
+        if self.slot is not None:
+            self.slot.pop(self, None)
+            self.slot = None
+
+
+class TimingWheel:
+    """Hashed timing wheel, schedules many (low precision) timers using a single asyncio task
+
+    Scheduling and cancelling a timer is O(1), every tick only visits timers in a single slot
+    """
+
+    def __init__(self, tick=1.0, size=512):
+        self.tick = tick
+        self.size = size
+
+        # Dicts keep insertion order and allow O(1) removal of cancelled timers
+        self.__slots = [{} for _ in range(size)]
+        self.__cursor = 0
+        self.__task = None
+
+        # Running callbacks (tasks have to be referenced until they finish)
+        self.__callbacks = set()
+
+    def schedule(self, delay, callback, jitter=0.0) -> Timer:
+        """Call (async) callback after delay seconds, delayed randomly by up to jitter seconds more"""
+
+        if jitter:
+            delay += random.uniform(0, jitter)
+
+        ticks = max(math.ceil(delay / self.tick), 1)
+        slot = self.__slots[(self.__cursor + ticks) % self.size]
+
+        timer = Timer(callback, (ticks - 1) // self.size, slot)
+        slot[timer] = None
+
+        self.__ensure_running()
+        return timer
+
+    def __ensure_running(self):
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(next_tick - loop.time(), 0))
+
+            # Catch up if the loop was blocked for longer than a tick
+            while True:
+                self.__advance()
+
+                if loop.time() < next_tick + self.tick:
+                    break
+
+                next_tick += self.tick
+
+    def __advance(self):
+        self.__cursor = (self.__cursor + 1) % self.size
+        slot = self.__slots[self.__cursor]
+
+        for timer in list(slot):
+            if timer.rounds > 0:
+                timer.rounds -= 1
+                continue
+
+            del slot[timer]
+            timer.slot = None
+
+            task = asyncio.create_task(timer.callback())
+            task.add_done_callback(self.__callback_done)
+            self.__callbacks.add(task)
+
+    def __callback_done(self, task):
+        self.__callbacks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Timer callback failed", exc_info=task.exception())
+
+
+timing_wheel = TimingWheel()
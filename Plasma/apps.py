@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class PlasmaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Plasma"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from Plasma.identity_cache import identity_cache
+        from Plasma.models import Persona
+
+        # Personas are cached in every process, drop them everywhere when they change
+        post_save.connect(
+            lambda instance, **kwargs: identity_cache.invalidate_persona(instance.id),
+            sender=Persona,
+            weak=False,
+        )
+        post_delete.connect(
+            lambda instance, **kwargs: identity_cache.invalidate_persona(instance.id),
+            sender=Persona,
+            weak=False,
+        )
@@ -0,0 +1,126 @@
+from base64 import b64decode
+from binascii import Error as Base64Error
+
+from BFBC2_MasterServer.globals import MAX_CHUNKED_TRANSACTION_SIZE
+from BFBC2_MasterServer.packet import Packet
+from Plasma.error import TransactionException
+
+
+class ChunkAssembler:
+    """Reassembles chunked transaction of a single connection, decoding chunks as they arrive"""
+
+    def __init__(self, max_size=MAX_CHUNKED_TRANSACTION_SIZE):
+        self.max_size = max_size
+        self.reset()
+
+    def reset(self):
+        """Drop partially assembled transaction"""
+
+        self.__started = False
+        self.__error = None  # First error of failed transaction, its chunks are discarded until the last one
+        self.__buffer = None
+        self.__encoded_size = 0  # Total length of base64 data (announced by client)
+        self.__received_size = 0  # Length of base64 data received so far
+        self.__decoded_size = 0  # Bytes already decoded into the buffer
+        self.__pending = (
+            ""  # Base64 characters which don't form a full (4 char) group yet
+        )
+
+    def feed(self, message: Packet):
+        """Add received chunk, returns assembled data (memoryview) once all chunks were received
+
+        Failed transaction raises TransactionException (once) when its last chunk is received
+        """
+
+        data = message.Get("data")
+        size = message.Get("size")
+
+        if data is None or not isinstance(size, int):
+            if not self.__started:
+                # End of the transaction can't be known, so there is nothing to wait for
+                raise TransactionException("Chunk is missing data or size")
+
+            self.__fail("Chunk is missing data or size")
+            size = self.__encoded_size
+
+        data = (
+            "" if data is None else str(data)
+        )  # Parser could turn all-digit chunk into int
+
+        if not self.__started:
+            # First chunk, allocate buffer for the whole (decoded) transaction
+            decoded_size = message.Get("decodedSize")
+
+            if not isinstance(decoded_size, int):
+                decoded_size = size * 3 // 4
+
+            self.__started = True
+            self.__encoded_size = size
+
+            if decoded_size > self.max_size or size > (self.max_size + 2) // 3 * 4:
+                self.__fail(
+                    f"Chunked transaction is too big ({decoded_size} bytes, max {self.max_size} bytes)"
+                )
+            else:
+                self.__buffer = bytearray(decoded_size)
+        elif size != self.__encoded_size:
+            self.__fail(
+                f"Chunk size changed during transaction (Expected: {self.__encoded_size}, Got: {size})"
+            )
+
+        self.__received_size += len(data)
+
+        if self.__received_size > self.__encoded_size:
+            self.__fail(
+                f"Received more data than announced ({self.__encoded_size} bytes)"
+            )
+
+        finished = self.__received_size >= self.__encoded_size
+
+        if self.__error is None:
+            self.__decode(data, finished)
+
+        if not finished:
+            return None
+
+        if self.__error is not None:
+            error = self.__error
+            self.reset()
+            raise TransactionException(error)
+
+        assembled = memoryview(self.__buffer)[: self.__decoded_size]
+        self.reset()
+
+        return assembled
+
+    def __decode(self, data, finished):
+        encoded = self.__pending + data
+
+        # Only full groups can be decoded, rest is kept for the next chunk
+        decodable = len(encoded) if finished else len(encoded) - len(encoded) % 4
+        self.__pending = encoded[decodable:]
+
+        try:
+            decoded = b64decode(encoded[:decodable])
+        except Base64Error as e:
+            return self.__fail(f"Invalid chunk data ({e})")
+
+        end = self.__decoded_size + len(decoded)
+
+        if end > len(self.__buffer):
+            return self.__fail(
+                f"Decoded data is bigger than announced ({len(self.__buffer)} bytes)"
+            )
+
+        self.__buffer[self.__decoded_size : end] = decoded
+        self.__decoded_size = end
+
+    def __fail(self, error):
+        """Mark transaction as failed, only the first error is reported"""
+
+        if self.__error is None:
+            self.__error = error
+
+        # Rest of the transaction is only counted (to find its end), not decoded
+        self.__buffer = None
+        self.__pending = ""
@@ -1,7 +1,4 @@
-import threading
-
 from channels.layers import get_channel_layer
-from django.core.cache import cache
 from packaging import version
 
 from BFBC2_MasterServer.consumer import BFBC2Consumer
@@ -12,10 +9,14 @@ from BFBC2_MasterServer.globals import (
     SERVER_INITIAL_MEMCHECK_INTERVAL,
     SERVER_MEMCHECK_INTERVAL,
     SERVER_PING_INTERVAL,
+    TIMER_JITTER,
 )
+from BFBC2_MasterServer.session_store import session_store
+from BFBC2_MasterServer.timing_wheel import timing_wheel
 from Plasma.enumerators.ClientLocale import ClientLocale
 from Plasma.enumerators.ClientPlatform import ClientPlatform
 from Plasma.enumerators.ClientType import ClientType
+from Plasma.identity_cache import identity_cache
 from Plasma.models import Persona
 from Plasma.services.connect import TXN as ConnectTXN
 from Plasma.services.playnow import TXN as PlayNowTXN
@@ -34,6 +35,7 @@ class PlasmaConsumer(BFBC2Consumer):
     protocolVersion = None
     fragmentSize: int = None
     initialized = False
+    closed = False
 
     transactor = None
 
@@ -51,8 +53,13 @@ class PlasmaConsumer(BFBC2Consumer):
         self.transactor = Transactor(self)
 
     async def disconnect(self, code):
+        # Timer which already fired (its callback task wasn't run yet) can't be cancelled, callback checks this instead
+        self.closed = True
+
         await super().disconnect(code)
 
+        self.transactor.close()
+
         if self.pingTimer is not None:
             self.pingTimer.cancel()
             self.pingTimer = None
@@ -61,19 +68,21 @@ class PlasmaConsumer(BFBC2Consumer):
             self.memcheckTimer.cancel()
             self.memcheckTimer = None
 
-        if self.loggedUser and self.loggedUserKey:
-            # Remove consumer session from cache
-            cache.delete(f"userSession:{self.loggedUser.id}")
+        hasPersona = self.loggedPersona and self.loggedPersonaKey
 
-            # Set user session to expire in 3 hours (approximitely that's how long the session is valid in original server)
-            cache.touch(f"userLoginKey:{self.loggedUser.id}", 60 * 60 * 3)
+        if self.loggedUser and self.loggedUserKey:
+            # Remove consumer session, login keys (of user and persona) will expire in 3 hours
+            await session_store.logout(
+                self.loggedUser.id,
+                self.loggedPersona.id if hasPersona else None,
+                self.loggedPersonaKey if hasPersona else None,
+            )
 
-        if self.loggedPersona and self.loggedPersonaKey:
-            # Set persona session to expire in 3 hours (approximitely that's how long the session is valid in original server)
-            cache.touch(f"personaLoginKey:{self.loggedPersona.id}", 60 * 60 * 3)
-            cache.touch(f"lkeyMap:{self.loggedPersonaKey}", 60 * 60 * 3)
-            cache.delete(f"presence:{self.loggedPersona.id}")
+            if hasPersona:
+                # Login key is going to expire now
+                await identity_cache.invalidate_login_key(self.loggedPersonaKey)
 
+        if hasPersona:
             owner = await Persona.objects.get_persona_by_id(self.loggedPersona.id)
 
             for userId in self.subscribedTo:
@@ -153,54 +162,60 @@ class PlasmaConsumer(BFBC2Consumer):
 
         if self.memcheckTimer is None and self.pingTimer is None:
             # Activate both ping and memcheck timers
-            self.pingTimer = threading.Timer(
+            self.pingTimer = self.__schedule(
                 CLIENT_PING_INTERVAL
                 if self.clientType == ClientType.CLIENT
                 else SERVER_PING_INTERVAL,
                 self.__ping_client,
             )
-            self.memcheckTimer = threading.Timer(
+            self.memcheckTimer = self.__schedule(
                 CLIENT_INITIAL_MEMCHECK_INTERVAL
                 if self.clientType == ClientType.CLIENT
                 else SERVER_INITIAL_MEMCHECK_INTERVAL,
                 self.__memcheck_client,
             )
 
-            self.pingTimer.start()
-            self.memcheckTimer.start()
+    def __schedule(self, interval, callback):
+        # Jitter spreads pings (and memchecks) of clients which connected at the same time
+        return timing_wheel.schedule(interval, callback, interval * TIMER_JITTER)
 
     async def __memcheck_client(self):
-        await self.transactor.start(
-            TransactionService.ConnectService, ConnectTXN.MemCheck, {}
-        )
+        if self.closed:
+            return
 
-        self.memcheckTimer = threading.Timer(
+        # Schedule next memcheck first, so it's not lost if this one fails
+        self.memcheckTimer = self.__schedule(
             CLIENT_MEMCHECK_INTERVAL
             if self.clientType == ClientType.CLIENT
             else SERVER_MEMCHECK_INTERVAL,
             self.__memcheck_client,
         )
-        self.memcheckTimer.start()
 
-    async def __ping_client(self):
         await self.transactor.start(
-            TransactionService.ConnectService, ConnectTXN.Ping, {}
+            TransactionService.ConnectService, ConnectTXN.MemCheck, {}
         )
 
-        self.pingTimer = threading.Timer(
+    async def __ping_client(self):
+        if self.closed:
+            return
+
+        self.pingTimer = self.__schedule(
             CLIENT_PING_INTERVAL
             if self.clientType == ClientType.CLIENT
             else SERVER_PING_INTERVAL,
             self.__ping_client,
         )
-        self.pingTimer.start()
+
+        await self.transactor.start(
+            TransactionService.ConnectService, ConnectTXN.Ping, {}
+        )
 
     async def external_send(self, event):
         message = event["message"]
         await self.transactor.start(message["service"], message["txn"], message["data"])
 
     async def start_remote_transaction(self, target, serviceStr, txnStr, data):
-        active_session = cache.get(f"userSession:{target}")
+        active_session = await session_store.get_user_session(target)
         channel_layer = get_channel_layer()
 
         if active_session:
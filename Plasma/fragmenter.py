@@ -0,0 +1,57 @@
+from base64 import b64encode
+
+from BFBC2_MasterServer.metrics import Counter
+from BFBC2_MasterServer.packet import HEADER_LENGTH
+
+fragmented_responses = Counter(
+    "plasma_fragmented_responses_total",
+    "Responses too big to be sent in a single packet",
+    ["service"],
+)
+sent_fragments = Counter(
+    "plasma_sent_fragments_total", "Fragment packets sent to clients", ["service"]
+)
+sent_fragment_bytes = Counter(
+    "plasma_sent_fragment_bytes_total",
+    "Bytes sent in fragment packets (including packet headers)",
+    ["service"],
+)
+
+
+def encode_fragments(data, fragment_size: int):
+    """Base64 encode data window by window, yielding fragments of fragment_size characters"""
+
+    # Encode whole base64 groups (3 bytes -> 4 chars) only, so windows can be encoded independently
+    window = max(fragment_size // 4, 1) * 3
+    view = memoryview(data)
+    pending = b""
+
+    for offset in range(0, len(view), window):
+        pending += b64encode(view[offset : offset + window])
+
+        while len(pending) >= fragment_size:
+            yield pending[:fragment_size]
+            pending = pending[fragment_size:]
+
+    if pending:
+        yield pending
+
+
+def compile_fragments(service: str, kind: int, message_bytes: bytes, fragment_size):
+    """Split compiled packet into compiled fragment packets (header of original packet is dropped)"""
+
+    data = memoryview(message_bytes)[HEADER_LENGTH:]
+    decoded_size = len(data)
+    encoded_size = (decoded_size + 2) // 3 * 4
+
+    header = service.encode() + int.to_bytes(kind, 4, byteorder="big")
+    trailer = f"\ndecodedSize={decoded_size}\nsize={encoded_size}\0".encode()
+
+    for fragment in encode_fragments(data, fragment_size):
+        # Base64 characters which have to be escaped in packet values
+        fragment = fragment.replace(b"+", b"%2b").replace(b"=", b"%3d")
+        length = HEADER_LENGTH + len(b"data=") + len(fragment) + len(trailer)
+
+        yield header + int.to_bytes(
+            length, 4, byteorder="big"
+        ) + b"data=" + fragment + trailer
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from BFBC2_MasterServer.metrics import Counter
+from BFBC2_MasterServer.session_store import session_store
+
+# Redis pub/sub channel, every process drops entries announced here
+INVALIDATION_CHANNEL = "identityInvalidation"
+
+# How long to wait before subscribing again when connection to Redis is lost
+RESUBSCRIBE_DELAY = 5
+
+# Entries are loaded again after this many seconds, so an invalidation which couldn't be published isn't missed forever
+ENTRY_TTL = 60
+
+logger = logging.getLogger("identity_cache")
+
+cache_hits = Counter(
+    "plasma_identity_cache_hits_total",
+    "Persona lookups served from in-process cache",
+    ["cache"],
+)
+cache_misses = Counter(
+    "plasma_identity_cache_misses_total",
+    "Persona lookups which had to go to database (or Redis)",
+    ["cache"],
+)
+
+
+class LRUCache:
+    """Bounded mapping which drops least recently used entries first, and entries older than ttl seconds"""
+
+    def __init__(self, name, max_size, ttl):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__entries = OrderedDict()  # Key -> (value, expires at)
+
+    def get(self, key):
+        entry = self.__entries.get(key)
+
+        if entry is None or entry[1] <= monotonic():
+            cache_misses.inc(self.name)
+            return None
+
+        self.__entries.move_to_end(key)
+        cache_hits.inc(self.name)
+        return entry[0]
+
+    def set(self, key, value):
+        self.__entries[key] = (value, monotonic() + self.ttl)
+        self.__entries.move_to_end(key)
+
+        if len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def pop(self, key):
+        self.__entries.pop(key, None)
+
+    def clear(self):
+        self.__entries.clear()
+
+
+class IdentityCache:
+    """Per-process cache of persona id -> (name, account id) and persona login key -> persona id
+
+    Entries are dropped in all processes (over Redis pub/sub) when persona changes or login key is set to expire,
+    cache is bypassed while the invalidation channel isn't subscribed. Entries also expire after ttl seconds, which
+    bounds how long other processes can serve an entry whose invalidation failed to be published
+
+    Caches are only touched from the event loop, invalidations from sync code (signals) are passed to it
+    """
+
+    def __init__(self, max_size=10000, ttl=ENTRY_TTL):
+        self.personas = LRUCache("persona", max_size, ttl)
+        self.login_keys = LRUCache("lkey", max_size, ttl)
+
+        self.__listener = None
+        self.__loop = None
+        self.__subscribed = False
+        # Bumped by every invalidation, entry loaded while it changed could be already outdated and isn't cached
+        self.__generation = 0
+
+    async def get_persona(self, persona_id):
+        """Get name and account id of persona (None if persona doesn't exist)"""
+
+        self.__ensure_listening()
+        persona_id = int(persona_id)
+
+        if self.__subscribed:
+            persona = self.personas.get(persona_id)
+
+            if persona is not None:
+                return persona
+
+        generation = self.__generation
+        persona = await self.__load_persona(persona_id)
+
+        if (
+            persona is not None
+            and self.__subscribed
+            and generation == self.__generation
+        ):
+            self.personas.set(persona_id, persona)
+
+        return persona
+
+    async def get_persona_id(self, persona_lkey):
+        """Get id of persona the login key belongs to (None if key is invalid or expired)"""
+
+        self.__ensure_listening()
+
+        if self.__subscribed:
+            entry = self.login_keys.get(persona_lkey)
+
+            if entry is not None:
+                persona_id, expires_at = entry
+
+                if expires_at is None or monotonic() < expires_at:
+                    return persona_id
+
+                self.login_keys.pop(persona_lkey)
+
+        generation = self.__generation
+        persona_id, ttl = await session_store.get_persona_id_and_ttl(persona_lkey)
+
+        if (
+            persona_id is not None
+            and self.__subscribed
+            and generation == self.__generation
+        ):
+            # Keys without expiration (negative ttl) are valid until invalidated
+            expires_at = monotonic() + ttl if ttl >= 0 else None
+            self.login_keys.set(persona_lkey, (persona_id, expires_at))
+
+        return persona_id
+
+    async def invalidate_login_key(self, persona_lkey):
+        """Drop login key from all processes (it was mapped to another persona or set to expire)"""
+
+        self.__drop_login_key(persona_lkey)
+        await session_store.client.publish(INVALIDATION_CHANNEL, f"lkey:{persona_lkey}")
+
+    def invalidate_persona(self, persona_id):
+        """Drop persona from all processes (persona was changed or removed), can be called from sync code"""
+
+        persona_id = int(persona_id)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self.__loop is None or self.__loop is running_loop:
+            self.__drop_persona(persona_id)
+        elif not self.__loop.is_closed():
+            # Scheduled before the sync call returns to the loop, so it's dropped before the caller continues
+            self.__loop.call_soon_threadsafe(self.__drop_persona, persona_id)
+
+        try:
+            get_redis_connection("default").publish(
+                INVALIDATION_CHANNEL, f"persona:{persona_id}"
+            )
+        except RedisError:
+            # Subscribed processes keep the persona until the entry expires
+            logger.error(
+                f"Failed to publish invalidation of persona {persona_id}, "
+                f"other processes can use the old one for up to {self.personas.ttl} s"
+            )
+
+    @sync_to_async
+    def __load_persona(self, persona_id):
+        from Plasma.models import Persona
+
+        return (
+            Persona.objects.filter(id=persona_id)
+            .values_list("name", "account_id")
+            .first()
+        )
+
+    def __ensure_listening(self):
+        if self.__listener is None or self.__listener.done():
+            self.__loop = asyncio.get_running_loop()
+            self.__listener = self.__loop.create_task(self.__listen())
+
+    async def __listen(self):
+        while True:
+            try:
+                async with session_store.client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+                    # Anything could have changed while we weren't subscribed
+                    self.__generation += 1
+                    self.personas.clear()
+                    self.login_keys.clear()
+                    self.__subscribed = True
+
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.__invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost subscription to identity invalidations")
+            finally:
+                self.__subscribed = False
+
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def __invalidate(self, message):
+        kind, _, key = message.partition(":")
+
+        if kind == "persona":
+            self.__drop_persona(int(key))
+        elif kind == "lkey":
+            self.__drop_login_key(key)
+
+    def __drop_persona(self, persona_id):
+        self.__generation += 1
+        self.personas.pop(persona_id)
+
+    def __drop_login_key(self, persona_lkey):
+        self.__generation += 1
+        self.login_keys.pop(persona_lkey)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,86 @@
+from django_redis import get_redis_connection
+
+from BFBC2_MasterServer.session_store import session_store
+
+# Set by rebuild_leaderboards once the index is complete, until then rankings are computed by database
+BUILT_KEY = "leaderboard:built"
+
+# Rank reported for personas without the stat
+UNRANKED = 250001
+
+
+def get_index_key(stat_key):
+    return f"leaderboard:{stat_key}"
+
+
+class LeaderboardIndex:
+    """Sorted set per stat key with persona ids scored by stat value, ranks are looked up in O(log n)
+
+    All lookups return None when the index wasn't built yet (caller should fall back to database)
+    """
+
+    async def update(self, updates):
+        """Save new stat values, updates are (persona id, stat key, value) tuples"""
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            for persona_id, stat_key, value in updates:
+                pipe.zadd(get_index_key(stat_key), {persona_id: value})
+
+            await pipe.execute()
+
+    def update_sync(self, updates):
+        """Same as update, for sync code (outside of event loop)"""
+
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+
+        for persona_id, stat_key, value in updates:
+            pipe.zadd(get_index_key(stat_key), {persona_id: value})
+
+        pipe.execute()
+
+    async def get_ranked_stat(self, persona_id, stat_key):
+        """Get value and rank (starting at 1) of persona's stat"""
+
+        index_key = get_index_key(stat_key)
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            pipe.exists(BUILT_KEY)
+            pipe.zscore(index_key, persona_id)
+            pipe.zrevrank(index_key, persona_id)
+            built, value, rank = await pipe.execute()
+
+        if not built:
+            return None
+
+        if value is None:
+            return 0.0, UNRANKED
+
+        return value, rank + 1
+
+    async def get_range(self, stat_key, start, stop, exclude_id=None):
+        """Get persona ids between (zero based, inclusive) ranks, ranks are counted as if excluded persona wasn't there"""
+
+        index_key = get_index_key(stat_key)
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            pipe.exists(BUILT_KEY)
+            pipe.zrevrank(index_key, exclude_id if exclude_id is not None else "")
+            # One more entry, in case the excluded persona is in the range (or above it)
+            pipe.zrevrange(index_key, start, stop + 1)
+            built, excluded_rank, members = await pipe.execute()
+
+        if not built:
+            return None
+
+        persona_ids = [int(member) for member in members]
+
+        if exclude_id is not None and exclude_id in persona_ids:
+            persona_ids.remove(exclude_id)
+        elif excluded_rank is not None and excluded_rank < start:
+            # Everyone below the excluded persona moves one rank up
+            persona_ids = persona_ids[1:]
+
+        return persona_ids[: stop - start + 1]
+
+
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,179 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+
+from Plasma.response_cache import response_cache
+
+COUNTRY_LIST_PATH = os.path.join(settings.BASE_DIR, "Plasma/data/CountryList")
+TOS_PATH = os.path.join(settings.BASE_DIR, "Plasma/data/TOS")
+
+RELOAD_CHECK_INTERVAL = 5  # How often (in seconds) data files are checked for changes
+
+logger = logging.getLogger("locale_data")
+
+
+class LocaleData:
+    """Parsed (read-only) country lists and TOS for all locales"""
+
+    def __init__(self, country_lists, country_configs, tos):
+        self.country_lists = MappingProxyType(country_lists)
+        self.country_configs = MappingProxyType(country_configs)
+        self.country_codes = frozenset(
+            row["ISOCode"] for rows in country_lists.values() for row in rows
+        )
+        self.tos = MappingProxyType(tos)
+
+    @classmethod
+    def load(cls):
+        """Parse all files from data directories"""
+
+        with open(os.path.join(COUNTRY_LIST_PATH, "overrides.json"), "r") as file:
+            overrides = json.load(file)
+
+        if settings.DEBUG:
+            overrides["DBG"] = {
+                "allowEmailsDefaultValue": 0,
+                "parentalControlAgeLimit": 18,
+                "registrationAgeLimit": 13,
+            }
+
+        country_lists = {}
+
+        for filename in os.listdir(COUNTRY_LIST_PATH):
+            locale = cls.__get_file_locale(filename, "CountryList", ".csv")
+
+            if locale is False:
+                continue
+
+            rows = []
+
+            with open(os.path.join(COUNTRY_LIST_PATH, filename), "r") as file:
+                for row in csv.DictReader(file):
+                    row.update(overrides.get(row["ISOCode"], {}))
+                    rows.append(MappingProxyType(row))
+
+            country_lists[locale] = tuple(rows)
+
+        tos = {}
+
+        for filename in os.listdir(TOS_PATH):
+            locale = cls.__get_file_locale(filename, "TOS", ".txt")
+
+            if locale is False:
+                continue
+
+            with open(os.path.join(TOS_PATH, filename), "r") as file:
+                tos_content = file.read()
+
+            with open(
+                os.path.join(TOS_PATH, filename.replace(".txt", ".version")), "r"
+            ) as file:
+                tos_version = file.read()
+
+            tos[locale] = (tos_content, tos_version)
+
+        country_configs = {
+            code: MappingProxyType(config) for code, config in overrides.items()
+        }
+
+        return cls(country_lists, country_configs, tos)
+
+    @staticmethod
+    def __get_file_locale(filename, prefix, extension):
+        """Get locale from filename (None for default file, False if file doesn't match)"""
+
+        if not filename.startswith(prefix + ".") or not filename.endswith(extension):
+            return False
+
+        locale = filename[len(prefix) + 1 : -len(extension)]
+        return locale or None
+
+
+class LocaleDataRegistry:
+    """Keeps locale data loaded in memory, and reloads it when data files change"""
+
+    def __init__(self):
+        self.__data = None
+        self.__signature = None
+        self.__watcher = None
+
+    @property
+    def data(self) -> LocaleData:
+        if self.__data is None:
+            self.reload()
+
+        return self.__data
+
+    def get_country_list(self, locale):
+        """Get country list for locale (or default one)"""
+
+        country_lists = self.data.country_lists
+        return country_lists.get(locale, country_lists[None])
+
+    def get_country_config(self, country_code):
+        """Get config overrides (age limits, etc.) for country"""
+        return self.data.country_configs.get(country_code, MappingProxyType({}))
+
+    def is_valid_country_code(self, country_code):
+        return country_code in self.data.country_codes
+
+    def get_tos(self, locale):
+        """Get TOS content and version for locale (or default one)"""
+
+        tos = self.data.tos
+        return tos.get(locale, tos[None])
+
+    def reload(self):
+        """Load data files (again), cached responses built from old data are dropped"""
+
+        signature = self.__get_signature()
+        self.__data = LocaleData.load()
+        self.__signature = signature
+
+        # Data is replaced first, so a response built after the cache is cleared always uses the new data
+        response_cache.clear()
+        logger.info("Locale data loaded")
+
+    def watch(self):
+        """Start background thread which reloads data when files change on disk"""
+
+        if self.__watcher is not None:
+            return
+
+        self.__watcher = threading.Thread(
+            target=self.__watch, name="locale-data-watcher", daemon=True
+        )
+        self.__watcher.start()
+
+    def __watch(self):
+        while True:
+            time.sleep(RELOAD_CHECK_INTERVAL)
+
+            try:
+                if self.__get_signature() != self.__signature:
+                    self.reload()
+            except Exception:
+                # Keep serving previous data (file might be only partially written)
+                logger.exception("Failed to reload locale data")
+
+    def __get_signature(self):
+        """Modification times and sizes of all data files"""
+
+        signature = []
+
+        for path in (COUNTRY_LIST_PATH, TOS_PATH):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    stat = entry.stat()
+                    signature.append((entry.path, stat.st_mtime_ns, stat.st_size))
+
+        return sorted(signature)
+
+
+locale_data = LocaleDataRegistry()
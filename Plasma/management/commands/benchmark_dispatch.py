@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from BFBC2_MasterServer.packet import Packet
+from Plasma.enumerators.ClientLocale import ClientLocale
+from Plasma.enumerators.ClientType import ClientType
+from Plasma.transactor import TransactionKind, Transactor
+
+
+class BenchmarkConnection:
+    """Bare minimum of PlasmaConsumer needed to route transactions"""
+
+    clientType = ClientType.CLIENT
+    locale = ClientLocale.English
+    fragmentSize = 8096
+    initialized = True
+
+    loggedUser, loggedUserKey = None, None
+
+    def __init__(self):
+        self.logger = logging.LoggerAdapter(
+            logging.getLogger("consumer"), {"path": "benchmark", "address": "-"}
+        )
+
+
+class Command(BaseCommand):
+    help = "Measure Plasma connection setup and transaction dispatch overhead"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100000,
+            help="How many connections/transactions should be processed",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        self.__report(
+            "connection setup (Transactor)",
+            iterations,
+            lambda: Transactor(BenchmarkConnection()),
+        )
+
+        asyncio.run(self.__dispatch(iterations, "fsys", "Ping"))
+        asyncio.run(self.__dispatch(iterations, "fsys", "GetPingSites"))
+
+    async def __dispatch(self, iterations, service, txn):
+        transactor = Transactor(BenchmarkConnection())
+
+        message = Packet(service=service, kind=TransactionKind.Simple.value)
+        message.Set("TXN", txn)
+
+        start = perf_counter()
+
+        for _ in range(iterations):
+            message.kind = TransactionKind.Simple.value | transactor.tid
+            service_type, _, _, _ = await transactor.verify_transaction(message)
+            await transactor.get_response(service_type, message)
+
+        self.__write(f"dispatch {service} {txn}", iterations, perf_counter() - start)
+
+    def __report(self, name, iterations, func):
+        start = perf_counter()
+
+        for _ in range(iterations):
+            func()
+
+        self.__write(name, iterations, perf_counter() - start)
+
+    def __write(self, name, iterations, elapsed):
+        self.stdout.write(f"{name}: {elapsed / iterations * 1000000:.3f} us/op")
@@ -0,0 +1,320 @@
+import csv
+import os
+import re
+from datetime import datetime, timedelta
+from enum import Enum
+from time import perf_counter
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from BFBC2_MasterServer.packet import HEADER_LENGTH, Packet
+from BFBC2_MasterServer.tools import flatten
+
+
+def legacy_encode_string(value):
+    if isinstance(value, datetime):
+        temp_value = quote(value.strftime("%b-%d-%Y %H:%M:%S UTC"))
+    else:
+        temp_value = quote(str(value))
+
+    temp_value = temp_value.replace("%20", " ")
+
+    if temp_value.find(" ") != -1:
+        temp_value = '"' + temp_value + '"'
+
+    return re.sub(r"%[0-9A-F]{2}", lambda pat: pat.group(0).lower(), temp_value)
+
+
+def legacy_process_dict(key, values, skip_idx=False):
+    processed_dict = ""
+
+    for x in range(len(values)):
+        if isinstance(values[x], dict):
+            for y in values[x]:
+                if isinstance(values[x][y], list):
+                    processed_dict += (
+                        f"{key}.{x}.{y}" + ".[]=" + str(len(values[x][y])) + "\n"
+                    )
+                    processed_dict += legacy_process_dict(
+                        f"{key}.{x}.{y}", values[x][y]
+                    )
+                elif isinstance(values[x][y], dict):
+                    processed_dict += legacy_process_dict(
+                        f"{key}.{x}.{y}", [values[x][y]], True
+                    )
+                elif skip_idx:
+                    processed_dict += (
+                        key + "." + y + "=" + legacy_encode_string(values[x][y]) + "\n"
+                    )
+                else:
+                    processed_dict += (
+                        key
+                        + "."
+                        + str(x)
+                        + "."
+                        + y
+                        + "="
+                        + legacy_encode_string(values[x][y])
+                        + "\n"
+                    )
+        elif isinstance(values[x], list):
+            processed_dict += f"{key}.{x}" + ".[]=" + str(len(values[x])) + "\n"
+            processed_dict += legacy_process_dict(f"{key}.{x}", values[x])
+        elif skip_idx:
+            processed_dict += key + "=" + legacy_encode_string(values[x]) + "\n"
+        else:
+            processed_dict += (
+                key + "." + str(x) + "=" + legacy_encode_string(values[x]) + "\n"
+            )
+
+    return processed_dict
+
+
+def legacy_compile(packet):
+    """Previous (string concatenation based) Packet.compile, used as a baseline"""
+
+    final_data = ""
+    temp_data = flatten({key: packet.Get(key) for key in packet.GetKeys()})
+
+    for key in temp_data:
+        value = temp_data[key]
+
+        if isinstance(value, Enum):
+            final_data += key + "=" + str(value.value) + "\n"
+        elif isinstance(value, list):
+            final_data += key + ".[]=" + str(len(value)) + "\n"
+            final_data += legacy_process_dict(key, value)
+        else:
+            final_data += "%s=%s\n" % (key, legacy_encode_string(value))
+
+    final_data = final_data[:-1] + "\0"
+
+    temp_packet = packet.service.encode()
+    temp_packet += int.to_bytes(packet.kind, 4, byteorder="big")
+    temp_packet += int.to_bytes(HEADER_LENGTH + len(final_data), 4, byteorder="big")
+    temp_packet += final_data.encode()
+
+    return temp_packet
+
+
+def build_update_stats(players=32, stats=150):
+    """UpdateStats sent by game server at the end of the round (full server)"""
+
+    packet = Packet(service="rank", kind=0xC0000001)
+    packet.Set("TXN", "UpdateStats")
+    packet.Set(
+        "u",
+        [
+            {
+                "o": 1000 + player,
+                "ot": 1,
+                "s": [
+                    {"k": f"c_stat{stat:03}__sa", "ut": 3, "v": f"{stat}.0000", "pt": 0}
+                    for stat in range(stats)
+                ],
+            }
+            for player in range(players)
+        ],
+    )
+
+    return packet
+
+
+def build_get_entitlements(entitlements=500):
+    """NuGetEntitlements response, big enough to be always sent in fragments"""
+
+    now = datetime(2010, 3, 2, 12, 0, 0)
+
+    packet = Packet(service="acct", kind=0x80000001)
+    packet.Set("TXN", "NuGetEntitlements")
+    packet.Set(
+        "entitlements",
+        [
+            {
+                "grantDate": now,
+                "groupName": "BFBC2PC",
+                "userId": 1,
+                "entitlementTag": f"BFBC2:PC:ENTITLEMENT{i}",
+                "version": 0,
+                "terminationDate": now + timedelta(days=i),
+                "productId": f"DR:{156691300 + i}",
+                "entitlementId": i,
+                "status": "ACTIVE",
+            }
+            for i in range(entitlements)
+        ],
+    )
+
+    return packet
+
+
+def build_country_list():
+    """GetCountryList response (German locale, the biggest one with escaped values)"""
+
+    with open(
+        os.path.join(settings.BASE_DIR, "Plasma/data/CountryList/CountryList.de.csv"),
+        "r",
+    ) as file:
+        countryList = list(csv.DictReader(file))
+
+    packet = Packet(service="acct", kind=0x80000001)
+    packet.Set("TXN", "GetCountryList")
+    packet.Set("countryList", countryList)
+
+    return packet
+
+
+def build_get_stats_for_owners(players=32, stats=150):
+    """GetStatsForOwners response sent to game server for full server"""
+
+    packet = Packet(service="rank", kind=0x80000001)
+    packet.Set("TXN", "GetStatsForOwners")
+    packet.Set(
+        "stats",
+        [
+            {
+                "stats": [
+                    {"key": f"c_stat{stat:03}__sa", "value": float(stat)}
+                    for stat in range(stats)
+                ],
+                "ownerId": 1000 + player,
+                "ownerType": 1,
+            }
+            for player in range(players)
+        ],
+    )
+
+    return packet
+
+
+def build_game_data(gid):
+    """Single GDAT packet, GLST sends one of these for every listed game"""
+
+    packet = Packet(service="GDAT", kind=0x00000000)
+    game_data = {
+        "LID": 1,
+        "GID": gid,
+        "N": f"[EU] Rush Server #{gid} - All Maps",
+        "AP": 24,
+        "JP": 0,
+        "QP": 0,
+        "MP": 32,
+        "F": 0,
+        "NF": 0,
+        "HU": 2,
+        "HN": "bfbc2.server.p",
+        "I": "192.168.0.1",
+        "P": 19567,
+        "J": "O",
+        "PL": "PC",
+        "PW": 0,
+        "V": "2.0",
+        "TYPE": "G",
+        "B-numObservers": 0,
+        "B-maxObservers": 0,
+        "B-version": "ROMEPC795745",
+        "B-U-region": "EU",
+        "B-U-level": "levels/mp_005gr",
+        "B-U-elo": 1000,
+        "B-U-Softcore": 0,
+        "B-U-Hardcore": 1,
+        "B-U-EA": 0,
+        "B-U-HasPassword": 0,
+        "B-U-public": 1,
+        "B-U-QueueLength": 0,
+        "B-U-gameMod": "BC2",
+        "B-U-gamemode": "RUSH",
+        "B-U-sguid": "0",
+        "B-U-Provider": "",
+        "B-U-Time": "T:0.02 S: 9.81 L: 0.00",
+        "B-U-hash": "2AC3F219-3614-F46A-843B-A02E03E849E1",
+        "B-U-Punkbuster": 1,
+        "B-U-PunkBusterVersion": "v1.905 | A1386 C2.279",
+        "TID": 5,
+    }
+
+    for key in game_data:
+        packet.Set(key, game_data[key])
+
+    return packet
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure Packet parse and compile throughput on realistic (large) transactions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="How many times each payload should be processed",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        update_stats = build_update_stats().compile()
+        entitlements = build_get_entitlements().compile()
+
+        self.__report(
+            "parse UpdateStats (32 players, 150 stats)",
+            len(update_stats),
+            iterations,
+            lambda: Packet(raw_data=update_stats),
+        )
+
+        # Chunked transactions are parsed from already reassembled (base64 decoded) body
+        entitlements_body = entitlements[HEADER_LENGTH:]
+
+        self.__report(
+            "parse chunked NuGetEntitlements (500 entitlements)",
+            len(entitlements_body),
+            iterations,
+            lambda: Packet(service="acct", kind=0xF0000001, data=entitlements_body),
+        )
+
+        self.__compare("compile GetCountryList", iterations, [build_country_list()])
+        self.__compare(
+            "compile GetStatsForOwners (32 players, 150 stats)",
+            iterations,
+            [build_get_stats_for_owners()],
+        )
+        self.__compare(
+            "compile GLST flood (1000 GDAT packets)",
+            max(iterations // 10, 1),
+            [build_game_data(gid) for gid in range(1000)],
+        )
+
+    def __compare(self, name, iterations, packets):
+        for packet in packets:
+            if packet.compile() != legacy_compile(packet):
+                raise CommandError(f"{name}: output differs from legacy encoder")
+
+        size = sum(len(packet.compile()) for packet in packets)
+
+        def compile_legacy():
+            for packet in packets:
+                legacy_compile(packet)
+
+        def compile_current():
+            for packet in packets:
+                packet.compile()
+
+        self.__report(f"{name} [legacy]", size, iterations, compile_legacy)
+        self.__report(f"{name} [current]", size, iterations, compile_current)
+
+    def __report(self, name, size, iterations, func):
+        start = perf_counter()
+
+        for _ in range(iterations):
+            func()
+
+        elapsed = (perf_counter() - start) / iterations
+
+        self.stdout.write(
+            f"{name}: {size} bytes, {elapsed * 1000:.3f} ms/op, {size / elapsed / 1024 / 1024:.2f} MiB/s"
+        )
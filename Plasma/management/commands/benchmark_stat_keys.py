@@ -0,0 +1,110 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# Both layouts of Ranking table, created as temporary tables (dropped once the benchmark is done)
+LAYOUTS = {
+    "key names": """
+        CREATE TEMPORARY TABLE benchmark_stats (
+            id bigserial PRIMARY KEY,
+            persona_id integer NOT NULL,
+            key varchar(255) NOT NULL,
+            value double precision NOT NULL,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz NOT NULL,
+            UNIQUE (persona_id, key)
+        ) ON COMMIT DROP;
+        CREATE INDEX ON benchmark_stats (persona_id);
+    """,
+    "interned keys": """
+        CREATE TEMPORARY TABLE benchmark_stats (
+            id bigserial PRIMARY KEY,
+            persona_id integer NOT NULL,
+            key_id smallint NOT NULL,
+            value double precision NOT NULL,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz NOT NULL,
+            UNIQUE (persona_id, key_id)
+        ) ON COMMIT DROP;
+        CREATE INDEX ON benchmark_stats (persona_id);
+    """,
+}
+
+
+def get_key_name(i):
+    # Similar to real keys (like c_wM16A2__kw_g)
+    return f"c_stat{i:03}__kw_g"
+
+
+class Command(BaseCommand):
+    help = "Compare size and lookup time of stats stored with key names and with interned key ids (on generated data)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--personas", type=int, default=1000000)
+        parser.add_argument("--keys", type=int, default=20, help="Stats per persona")
+        parser.add_argument(
+            "--lookups",
+            type=int,
+            default=1000,
+            help="How many reads (of all stats of 32 personas) should be timed",
+        )
+
+    def handle(self, *args, **options):
+        personas, keys = options["personas"], options["keys"]
+        self.stdout.write(f"Generating {personas * keys} stats for both layouts")
+
+        for name, schema in LAYOUTS.items():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(schema)
+                self.__fill(cursor, name, personas, keys)
+                self.__report(cursor, name, personas, keys, options["lookups"])
+
+    def __fill(self, cursor, name, personas, keys):
+        if name == "key names":
+            key_column = "key"
+            key_value = "'c_stat' || lpad(k::text, 3, '0') || '__kw_g'"
+        else:
+            key_column = "key_id"
+            key_value = "k"
+
+        cursor.execute(
+            f"""
+            INSERT INTO benchmark_stats (persona_id, {key_column}, value, created_at, updated_at)
+            SELECT p, {key_value}, random() * 1000, now(), now()
+            FROM generate_series(1, %s) AS p, generate_series(1, %s) AS k
+            """,
+            [personas, keys],
+        )
+        cursor.execute("ANALYZE benchmark_stats")
+
+    def __report(self, cursor, name, personas, keys, lookups):
+        cursor.execute(
+            """
+            SELECT pg_table_size('benchmark_stats'), pg_indexes_size('benchmark_stats')
+            """
+        )
+        table_size, indexes_size = cursor.fetchone()
+
+        # Same shape as GetStatsForOwners (all players of a server), interned keys are looked up by their (cached) ids
+        if name == "key names":
+            query = "SELECT persona_id, key, value FROM benchmark_stats WHERE persona_id = ANY(%s) AND key = ANY(%s)"
+            key_params = [get_key_name(k) for k in range(1, keys + 1)]
+        else:
+            query = "SELECT persona_id, key_id, value FROM benchmark_stats WHERE persona_id = ANY(%s) AND key_id = ANY(%s)"
+            key_params = list(range(1, keys + 1))
+
+        rng = random.Random(0)
+        start = perf_counter()
+
+        for _ in range(lookups):
+            cursor.execute(query, [rng.sample(range(1, personas + 1), 32), key_params])
+            cursor.fetchall()
+
+        elapsed = perf_counter() - start
+
+        self.stdout.write(
+            f"{name}: table {table_size / 2**20:.1f} MiB, indexes {indexes_size / 2**20:.1f} MiB, "
+            f"{elapsed / lookups * 1000:.2f} ms/lookup"
+        )
@@ -0,0 +1,128 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from BFBC2_MasterServer.packet import Packet
+from Plasma.enumerators.StatUpdateType import StatUpdateType
+from Plasma.management.commands.benchmark_packet import build_update_stats
+from Plasma.models import Account, Persona, Ranking
+from Plasma.stat_keys import stat_keys
+
+BENCHMARK_NUID = "benchmark@update.stats"
+
+
+def get_updates(packet):
+    """Stat updates from UpdateStats packet, as they are passed to RankingManager.update_stats"""
+
+    updates = []
+
+    for userData in packet.Get("u"):
+        for statID, statData in userData["s"].items():
+            if statID == "[]":
+                continue
+
+            updates.append(
+                (
+                    userData["o"],
+                    statData["k"],
+                    float(statData["v"]),
+                    StatUpdateType(statData["ut"]) == StatUpdateType.RelativeValue,
+                )
+            )
+
+    return updates
+
+
+def legacy_update_stats(updates):
+    """Previous UpdateStats handling (read and write of every stat separately), used as a baseline"""
+
+    for ownerId, statKey, statValue, relative in updates:
+        if relative:
+            try:
+                statValue += Ranking.objects.get(
+                    persona__id=ownerId, key__name=statKey
+                ).value
+            except Ranking.DoesNotExist:
+                pass
+
+        persona = Persona.objects.get(id=ownerId)
+        Ranking.objects.update_or_create(
+            persona=persona,
+            key_id=stat_keys.get_ids([statKey], create=True)[statKey],
+            defaults={"value": statValue},
+        )
+
+
+class Command(BaseCommand):
+    help = "Replay UpdateStats of a full server round end against database (with temporary personas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=32)
+        parser.add_argument("--stats", type=int, default=150)
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="How many times the round end should be replayed",
+        )
+
+    def handle(self, *args, **options):
+        players, rounds = options["players"], options["rounds"]
+
+        if Account.objects.filter(nuid=BENCHMARK_NUID).exists():
+            raise CommandError(
+                f"Account {BENCHMARK_NUID} already exists (left from interrupted run?)"
+            )
+
+        account = Account.objects.create(nuid=BENCHMARK_NUID)
+
+        try:
+            personas = Persona.objects.bulk_create(
+                Persona(account=account, name=f"benchmark{i:03}")
+                for i in range(players)
+            )
+
+            packet = build_update_stats(players, options["stats"])
+
+            # Game server reports its players by persona ids, stats are sent as relative values
+            for userData, persona in zip(packet.Get("u"), personas):
+                userData["o"] = persona.id
+
+            updates = get_updates(Packet(raw_data=packet.compile()))
+
+            self.__report("legacy", rounds, len(updates), legacy_update_stats, updates)
+            self.__report(
+                "bulk upsert",
+                rounds,
+                len(updates),
+                Ranking.objects.upsert_stats,
+                updates,
+            )
+        finally:
+            account.delete()
+
+    def __report(self, name, rounds, size, func, updates):
+        # Both variants start from empty stats (first round inserts them, following rounds update them)
+        Ranking.objects.filter(persona__account__nuid=BENCHMARK_NUID).delete()
+
+        elapsed = 0
+        queries = 0
+
+        def count_queries(execute, *args):
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        with connection.execute_wrapper(count_queries):
+            for _ in range(rounds):
+                start = perf_counter()
+
+                with transaction.atomic():
+                    func(updates)
+
+                elapsed += perf_counter() - start
+
+        self.stdout.write(
+            f"UpdateStats {name}: {size} stats, {elapsed / rounds * 1000:.1f} ms/round, {queries / rounds:.0f} queries/round"
+        )
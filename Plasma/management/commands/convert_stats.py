@@ -0,0 +1,65 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from Plasma.models import Ranking, StatDocument, StatKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy all stats to the other storage layout (row per stat or document per persona), "
+        "stats already stored in the target layout are replaced. Server should be stopped while converting"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "layout",
+            choices=["rows", "document"],
+            help="Layout stats are converted to (RANKING_BACKEND to switch to afterwards)",
+        )
+
+    def handle(self, *args, **options):
+        rankings = Ranking._meta.db_table
+        documents = StatDocument._meta.db_table
+        stat_keys = StatKey._meta.db_table
+
+        start = perf_counter()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options["layout"] == "document":
+                cursor.execute(f'DELETE FROM "{documents}"')
+                cursor.execute(
+                    f"""
+                    INSERT INTO "{documents}" (persona_id, stats, updated_at)
+                    SELECT ranking.persona_id, jsonb_object_agg(stat_key.name, ranking.value), max(ranking.updated_at)
+                    FROM "{rankings}" AS ranking
+                    JOIN "{stat_keys}" AS stat_key ON stat_key.id = ranking.key_id
+                    GROUP BY ranking.persona_id
+                    """
+                )
+            else:
+                cursor.execute(f'DELETE FROM "{rankings}"')
+                # Keys already in the catalog keep their ids (they can be cached by running processes)
+                cursor.execute(
+                    f"""
+                    INSERT INTO "{stat_keys}" (name)
+                    SELECT DISTINCT jsonb_object_keys(stats) FROM "{documents}"
+                    ON CONFLICT (name) DO NOTHING
+                    """
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO "{rankings}" (persona_id, key_id, value, created_at, updated_at)
+                    SELECT document.persona_id, stat_key.id, stat.value::double precision, document.updated_at, document.updated_at
+                    FROM "{documents}" AS document
+                    CROSS JOIN jsonb_each_text(document.stats) AS stat
+                    JOIN "{stat_keys}" AS stat_key ON stat_key.name = stat.key
+                    """
+                )
+
+            converted = cursor.rowcount
+
+        self.stdout.write(
+            f"Converted stats to {options['layout']} layout ({converted} rows, {perf_counter() - start:.2f} s)"
+        )
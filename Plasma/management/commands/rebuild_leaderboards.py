@@ -0,0 +1,100 @@
+from datetime import timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from Plasma.leaderboard import BUILT_KEY, get_index_key
+from Plasma.models import Ranking
+
+BATCH_SIZE = 5000
+
+# Stats updated since this long before the rebuild started are written again once it's done (covers transactions
+# which started before the rebuild, but were committed after their stats were read)
+REPLAY_MARGIN = timedelta(seconds=60)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild leaderboard index (Redis sorted sets) from stats stored in database. Leaderboards are replaced "
+        "with ones built from a snapshot, stats updated during the rebuild are written to them again afterwards"
+    )
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection("default")
+        start = perf_counter()
+        updated_since = timezone.now() - REPLAY_MARGIN
+
+        # Ordered by key so every leaderboard is written at once
+        stats = Ranking.objects.iter_stats(BATCH_SIZE)
+
+        built_keys = set()
+        current_key, scores = None, {}
+        total = 0
+
+        for key, persona_id, value in stats:
+            if key != current_key:
+                self.__write(redis, current_key, scores, built_keys)
+                current_key, scores = key, {}
+
+            scores[persona_id] = value
+            total += 1
+
+        self.__write(redis, current_key, scores, built_keys)
+
+        # Remove leaderboards of keys which are not in database anymore
+        stale_keys = [
+            index_key
+            for index_key in redis.scan_iter(match=get_index_key("*"), count=1000)
+            if index_key.decode() not in built_keys and index_key.decode() != BUILT_KEY
+        ]
+
+        if stale_keys:
+            redis.delete(*stale_keys)
+
+        # Updates made during the rebuild went to the leaderboards which were replaced since
+        replayed = self.__replay(redis, updated_since)
+
+        redis.set(BUILT_KEY, 1)
+
+        self.stdout.write(
+            f"Indexed {total} stats in {len(built_keys)} leaderboards, "
+            f"replayed {replayed} updated stats ({perf_counter() - start:.2f} s)"
+        )
+
+    def __replay(self, redis, updated_since):
+        pipe = redis.pipeline(transaction=False)
+        replayed = 0
+
+        for key, persona_id, value in Ranking.objects.iter_stats(
+            BATCH_SIZE, updated_since
+        ):
+            pipe.zadd(get_index_key(key), {persona_id: value})
+            replayed += 1
+
+            if replayed % BATCH_SIZE == 0:
+                pipe.execute()
+
+        pipe.execute()
+        return replayed
+
+    def __write(self, redis, key, scores, built_keys):
+        if key is None:
+            return
+
+        index_key = get_index_key(key)
+        temp_key = index_key + ":rebuild"
+
+        # Leaderboard is built aside and swapped in at once, so readers never see it half-written
+        items = list(scores.items())
+        pipe = redis.pipeline(transaction=False)
+        pipe.delete(temp_key)
+
+        for i in range(0, len(items), BATCH_SIZE):
+            pipe.zadd(temp_key, dict(items[i : i + BATCH_SIZE]))
+
+        pipe.rename(temp_key, index_key)
+        pipe.execute()
+
+        built_keys.add(index_key)
@@ -0,0 +1,240 @@
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from Plasma.models import Ranking, StatRank
+from Plasma.rank_snapshot import rank_snapshot
+from Plasma.stat_keys import stat_keys
+
+# Binary COPY format, see https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER = COPY_SIGNATURE + b"\x00\x00\x00\x00" + b"\x00\x00\x00\x00"
+COPY_TRAILER = b"\xff\xff"
+
+# Every tuple is prefixed by field count and every field by its length (all fields are fixed size and not null)
+STAT_RECORD = np.dtype(
+    [
+        ("fields", ">i2"),
+        ("key_length", ">i4"),
+        ("key_id", ">i2"),
+        ("persona_length", ">i4"),
+        ("persona_id", ">i8"),
+        ("value_length", ">i4"),
+        ("value", ">f8"),
+    ]
+)
+RANK_RECORD = np.dtype(
+    [
+        ("fields", ">i2"),
+        ("key_length", ">i4"),
+        ("key_id", ">i2"),
+        ("persona_length", ">i4"),
+        ("persona_id", ">i8"),
+        ("value_length", ">i4"),
+        ("value", ">f8"),
+        ("rank_length", ">i4"),
+        ("rank", ">i4"),
+        ("position_length", ">i4"),
+        ("position", ">i4"),
+    ]
+)
+
+# How many bytes are parsed (or sent) at once
+CHUNK_SIZE = 1 << 24
+
+
+class StatReader:
+    """File-like target of COPY TO, parses received stats into arrays as they come"""
+
+    def __init__(self):
+        self.__buffer = bytearray()
+        self.__header_read = False
+        self.__chunks = []
+
+    def write(self, data):
+        self.__buffer += data
+
+        if len(self.__buffer) >= CHUNK_SIZE:
+            self.__parse()
+
+    def get_arrays(self):
+        """Get (key ids, persona ids, values) of all received stats"""
+
+        self.__parse()
+
+        if bytes(self.__buffer) != COPY_TRAILER:
+            raise CommandError("Unexpected end of COPY data")
+
+        records = (
+            np.concatenate(self.__chunks)
+            if self.__chunks
+            else np.empty(0, dtype=STAT_RECORD)
+        )
+
+        return (
+            records["key_id"].astype(np.int16),
+            records["persona_id"].astype(np.int64),
+            records["value"].astype(np.float64),
+        )
+
+    def __parse(self):
+        if not self.__header_read:
+            if len(self.__buffer) < len(COPY_HEADER):
+                return
+
+            if not self.__buffer.startswith(COPY_SIGNATURE):
+                raise CommandError("Unexpected COPY format")
+
+            del self.__buffer[: len(COPY_HEADER)]
+            self.__header_read = True
+
+        count = len(self.__buffer) // STAT_RECORD.itemsize
+
+        # Trailer (two bytes) can't be mistaken for a record, records are longer
+        if count:
+            size = count * STAT_RECORD.itemsize
+            self.__chunks.append(
+                np.frombuffer(bytes(self.__buffer[:size]), dtype=STAT_RECORD)
+            )
+            del self.__buffer[:size]
+
+
+class RankWriter:
+    """File-like source of COPY FROM, encodes ranks chunk by chunk (so the whole table isn't held as bytes)"""
+
+    def __init__(self, key_ids, persona_ids, values, ranks, positions):
+        self.__arrays = (key_ids, persona_ids, values, ranks, positions)
+        self.__position = 0
+        self.__pending = bytearray(COPY_HEADER)
+        self.__done = False
+
+    def read(self, size=-1):
+        while not self.__done and (size < 0 or len(self.__pending) < size):
+            self.__encode_chunk()
+
+        if size < 0:
+            size = len(self.__pending)
+
+        data = bytes(self.__pending[:size])
+        del self.__pending[:size]
+
+        return data
+
+    def __encode_chunk(self):
+        key_ids, persona_ids, values, ranks, positions = self.__arrays
+        start = self.__position
+        stop = min(start + CHUNK_SIZE // RANK_RECORD.itemsize, len(key_ids))
+
+        if start >= stop:
+            self.__pending += COPY_TRAILER
+            self.__done = True
+            return
+
+        records = np.empty(stop - start, dtype=RANK_RECORD)
+        records["fields"] = 5
+        records["key_length"] = 2
+        records["key_id"] = key_ids[start:stop]
+        records["persona_length"] = 8
+        records["persona_id"] = persona_ids[start:stop]
+        records["value_length"] = 8
+        records["value"] = values[start:stop]
+        records["rank_length"] = 4
+        records["rank"] = ranks[start:stop]
+        records["position_length"] = 4
+        records["position"] = positions[start:stop]
+
+        self.__pending += records.tobytes()
+        self.__position = stop
+
+
+def compute_ranks(key_ids, persona_ids, values):
+    """Sort stats by key, value (descending) and persona
+
+    Returns the order, dense rank and leaderboard position (both starting at 1) of sorted stats
+    """
+
+    # Last key is the primary one
+    order = np.lexsort((persona_ids, -values, key_ids))
+    sorted_keys = key_ids[order]
+    sorted_values = values[order]
+
+    key_starts = np.ones(len(order), dtype=bool)
+    key_starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+
+    # Rank goes up with every new value, and starts again with every key
+    value_changes = key_starts.copy()
+    value_changes[1:] |= sorted_values[1:] != sorted_values[:-1]
+
+    counter = np.cumsum(value_changes)
+    key_index = np.cumsum(key_starts) - 1
+    ranks = counter - counter[key_starts][key_index] + 1
+
+    # Position goes up with every stat
+    indexes = np.arange(len(order))
+    positions = indexes - np.flatnonzero(key_starts)[key_index] + 1
+
+    return order, ranks, positions
+
+
+class Command(BaseCommand):
+    help = "Recompute ranks of all stats (in memory, with NumPy) and replace the rank snapshot with them"
+
+    def handle(self, *args, **options):
+        if settings.RANKING_BACKEND != "rows":
+            raise CommandError("Ranks can only be computed from stats stored as rows")
+
+        # Every change made before reading stats will be in the snapshot
+        rank_snapshot.take_changed()
+        start = perf_counter()
+
+        with connection.cursor() as cursor:
+            reader = StatReader()
+            cursor.copy_expert(
+                f"""
+                COPY (SELECT key_id, persona_id::bigint, value FROM "{Ranking._meta.db_table}")
+                TO STDOUT WITH (FORMAT binary)
+                """,
+                reader,
+            )
+            key_ids, persona_ids, values = reader.get_arrays()
+
+        total = len(key_ids)
+        read_time = perf_counter() - start
+        self.__report("Read", total, read_time)
+
+        start = perf_counter()
+        order, ranks, positions = compute_ranks(key_ids, persona_ids, values)
+        rank_time = perf_counter() - start
+        self.__report("Ranked", total, rank_time)
+
+        start = perf_counter()
+
+        # Table is locked until new ranks are committed, readers never see it half-written
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE "{StatRank._meta.db_table}"')
+            cursor.copy_expert(
+                f"""
+                COPY "{StatRank._meta.db_table}" (key_id, persona_id, value, rank, position)
+                FROM STDIN WITH (FORMAT binary)
+                """,
+                RankWriter(
+                    key_ids[order], persona_ids[order], values[order], ranks, positions
+                ),
+            )
+
+        rank_snapshot.mark_refreshed(
+            list(stat_keys.get_names(np.unique(key_ids).tolist()).values()),
+            replace=True,
+        )
+
+        write_time = perf_counter() - start
+        self.__report("Wrote", total, write_time)
+        self.__report("Rebuilt ranks of", total, read_time + rank_time + write_time)
+
+    def __report(self, step, total, elapsed):
+        self.stdout.write(
+            f"{step} {total} stats in {elapsed:.2f} s ({total / max(elapsed, 1e-9):.0f} rows/s)"
+        )
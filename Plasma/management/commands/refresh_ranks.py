@@ -0,0 +1,44 @@
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Plasma.models import StatRank
+from Plasma.rank_snapshot import rank_snapshot
+
+
+class Command(BaseCommand):
+    help = "Refresh rank snapshot of stat keys which changed since the last refresh"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running and refresh every given number of seconds",
+        )
+
+    def handle(self, *args, **options):
+        if settings.RANKING_BACKEND != "rows":
+            raise CommandError("Ranks can only be computed from stats stored as rows")
+
+        while True:
+            self.__refresh()
+
+            if options["interval"] is None:
+                break
+
+            sleep(options["interval"])
+
+    def __refresh(self):
+        keys = rank_snapshot.take_changed()
+
+        if not keys:
+            return
+
+        start = perf_counter()
+        total = StatRank.objects.refresh(keys)
+        rank_snapshot.mark_refreshed(keys)
+
+        self.stdout.write(
+            f"Refreshed ranks of {len(keys)} keys ({total} stats, {perf_counter() - start:.2f} s)"
+        )
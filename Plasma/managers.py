@@ -1,8 +1,10 @@
+import json
 from datetime import timedelta
 
 from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import F
 from django.db.models.expressions import Window
 from django.db.models.functions import RowNumber
@@ -10,6 +12,27 @@ from django.utils import timezone
 
 from Plasma.enumerators.ActivationResult import ActivationResult
 
+# How many stats are written by a single statement (every stat takes 3 query parameters)
+UPSERT_BATCH_SIZE = 5000
+
+
+def merge_stat_updates(merged, updates):
+    """Merge (persona id, key, value, relative) updates into merged dict of (persona id, key) -> (value, relative)
+
+    Absolute value replaces everything before it, relative values are added to whatever was there
+    """
+
+    for persona_id, key, value, is_relative in updates:
+        stat = (int(persona_id), key)
+
+        if is_relative and stat in merged:
+            merged_value, merged_relative = merged[stat]
+            merged[stat] = (merged_value + value, merged_relative)
+        else:
+            merged[stat] = (value, is_relative)
+
+    return merged
+
 
 class UserManager(BaseUserManager):
     @sync_to_async
@@ -249,15 +272,17 @@ class PersonaManager(models.Manager):
     def get_persona(self, account, name):
         return self.filter(account=account, name=name).first()
 
-    @sync_to_async
-    def get_persona_by_id(self, persona_id):
-        persona = self.filter(id=persona_id).first()
-        return {"name": persona.name, "id": persona.id, "type": 0}
+    async def get_persona_by_id(self, persona_id):
+        from Plasma.identity_cache import identity_cache
 
-    @sync_to_async
-    def get_user_id_by_persona_id(self, pid):
-        persona = self.filter(id=pid).first()
-        return persona.account.id
+        name, _ = await identity_cache.get_persona(persona_id)
+        return {"name": name, "id": int(persona_id), "type": 0}
+
+    async def get_user_id_by_persona_id(self, pid):
+        from Plasma.identity_cache import identity_cache
+
+        _, account_id = await identity_cache.get_persona(pid)
+        return account_id
 
     @sync_to_async
     def search_personas(self, account, name):
@@ -501,45 +526,73 @@ class MessageManager(models.Manager):
 
 
 class RankingManager(models.Manager):
-    @sync_to_async
-    def get_stat(self, persona, key):
-        from Plasma.models import Ranking
+    async def get_stat(self, persona, key):
+        return await self.get_stat_by_id(persona.id, key)
 
-        try:
-            return self.get(persona=persona, key=key).value
-        except Ranking.DoesNotExist:
-            return 0.0
+    async def get_stat_by_id(self, persona_id, key):
+        stats = await self.get_stats_by_ids([persona_id], [key])
+        return stats[(int(persona_id), key)]
 
     @sync_to_async
-    def get_stat_by_id(self, persona_id, key):
-        from Plasma.models import Ranking
+    def get_stats_by_ids(self, persona_ids, keys):
+        """Get values of keys of all personas in a single query, returns dict of (persona id, key) -> value
 
-        try:
-            return self.get(persona__id=persona_id, key=key).value
-        except Ranking.DoesNotExist:
-            return 0.0
+        Stats which don't exist are returned as 0.0
+        """
 
-    @sync_to_async
-    def get_ranked_stat(self, persona, key):
-        from Plasma.models import Ranking
+        from Plasma.stat_keys import stat_keys
 
-        filtered = self.filter(key=key)
-        ranked = filtered.annotate(
-            rank=Window(expression=RowNumber(), order_by=F("value").desc())
+        persona_ids = [int(persona_id) for persona_id in persona_ids]
+        documents = self.__get_documents()
+
+        if documents is not None:
+            return documents.get_stats_by_ids(persona_ids, keys)
+
+        stats = dict.fromkeys(
+            ((persona_id, key) for persona_id in persona_ids for key in keys), 0.0
         )
 
-        try:
-            stat = ranked.get(persona=persona)
-        except Ranking.DoesNotExist:
-            return 0.0, 250001
+        # Keys which were never written have no stats at all
+        key_ids = stat_keys.get_ids(keys)
 
-        return stat.value, stat.rank
+        if not persona_ids or not key_ids:
+            return stats
+
+        names = {key_id: key for key, key_id in key_ids.items()}
+
+        stats.update(
+            ((persona_id, names[key_id]), value)
+            for persona_id, key_id, value in self.filter(
+                persona_id__in=persona_ids, key_id__in=names
+            ).values_list("persona_id", "key_id", "value")
+        )
+
+        return stats
+
+    async def get_ranked_stat(self, persona, key):
+        return await self.get_ranked_stat_by_id(persona.id, key)
+
+    async def get_ranked_stat_by_id(self, persona_id, key):
+        from Plasma.leaderboard import leaderboard_index
+
+        ranked_stat = await leaderboard_index.get_ranked_stat(persona_id, key)
+
+        if ranked_stat is None:
+            # Leaderboards weren't indexed yet
+            ranked_stat = await self.__rank_stat(persona_id, key)
+
+        return ranked_stat
 
     @sync_to_async
-    def get_ranked_stat_by_id(self, persona_id, key):
+    def __rank_stat(self, persona_id, key):
         from Plasma.models import Ranking
 
-        filtered = self.filter(key=key)
+        documents = self.__get_documents()
+
+        if documents is not None:
+            return documents.rank_stat(persona_id, key)
+
+        filtered = self.filter(key__name=key)
         ranked = filtered.annotate(
             rank=Window(expression=RowNumber(), order_by=F("value").desc())
         )
@@ -551,9 +604,60 @@ class RankingManager(models.Manager):
 
         return stat.value, stat.rank
 
+    async def get_leaderboard_users(
+        self, baseKey, minRank, maxRank, excludePersona=None
+    ):
+        from Plasma.leaderboard import leaderboard_index
+        from Plasma.models import StatRank
+        from Plasma.rank_snapshot import rank_snapshot
+
+        excludeId = excludePersona.id if excludePersona is not None else None
+        persona_ids = await leaderboard_index.get_range(
+            baseKey, minRank - 1, maxRank, excludeId
+        )
+
+        if persona_ids is None and await rank_snapshot.is_fresh(baseKey):
+            # Leaderboards weren't indexed yet, but ranks snapshot is recent enough
+            persona_ids = await StatRank.objects.get_range(
+                baseKey, minRank - 1, maxRank, excludeId
+            )
+
+        if persona_ids is None:
+            return await self.__rank_leaderboard_users(
+                baseKey, minRank, maxRank, excludePersona
+            )
+
+        return await self.__get_leaderboard_users(persona_ids, minRank)
+
+    @sync_to_async
+    def __get_leaderboard_users(self, persona_ids, minRank):
+        from Plasma.models import Persona
+
+        names = dict(
+            Persona.objects.filter(id__in=persona_ids).values_list("id", "name")
+        )
+
+        # Personas which were deleted (but are still indexed) are skipped, ranks are counted without them
+        persona_ids = [persona_id for persona_id in persona_ids if persona_id in names]
+
+        return [
+            {"owner": persona_id, "name": names[persona_id], "rank": minRank + i}
+            for i, persona_id in enumerate(persona_ids)
+        ]
+
     @sync_to_async
-    def get_leaderboard_users(self, baseKey, minRank, maxRank, excludePersona=None):
-        filtered = self.filter(key=baseKey).exclude(persona=excludePersona)
+    def __rank_leaderboard_users(self, baseKey, minRank, maxRank, excludePersona):
+        documents = self.__get_documents()
+
+        if documents is not None:
+            return documents.rank_leaderboard_users(
+                baseKey,
+                minRank,
+                maxRank,
+                excludePersona.id if excludePersona is not None else None,
+            )
+
+        filtered = self.filter(key__name=baseKey).exclude(persona=excludePersona)
         ranked = filtered.annotate(
             rank=Window(expression=RowNumber(), order_by=F("value").desc())
         )
@@ -572,12 +676,343 @@ class RankingManager(models.Manager):
 
         return personas
 
-    @sync_to_async
-    def update_stat(self, personaId, key, value):
+    async def update_stats(self, updates):
+        """Apply stat updates, updates are (persona id, key, value, relative) tuples in order they were sent"""
+
+        stats = await sync_to_async(self.upsert_stats)(updates)
+        await self.index_stats(stats)
+
+    async def index_stats(self, stats):
+        """Save new (persona id, key, value) of stats to leaderboard index and mark their rank snapshots outdated"""
+
+        from Plasma.leaderboard import leaderboard_index
+        from Plasma.rank_snapshot import rank_snapshot
+
+        await leaderboard_index.update(stats)
+        await rank_snapshot.mark_changed({key for _, key, _ in stats})
+
+    def index_stats_sync(self, stats):
+        """Same as index_stats, for sync code (outside of event loop)"""
+
+        from Plasma.leaderboard import leaderboard_index
+        from Plasma.rank_snapshot import rank_snapshot
+
+        leaderboard_index.update_sync(stats)
+        rank_snapshot.mark_changed_sync({key for _, key, _ in stats})
+
+    def upsert_stats(self, updates):
+        """Write stat updates (in a single transaction), returns new (persona id, key, value) of updated stats
+
+        Relative values are added in database, stats of unknown personas are ignored
+        """
+
+        from Plasma.models import Persona
+        from Plasma.stat_keys import stat_keys
+
+        merged = merge_stat_updates({}, updates)
+        documents = self.__get_documents()
+
+        if documents is not None:
+            return documents.upsert_stats(merged)
+
+        # Stats are stored with ids of their keys, new keys are added to the catalog first
+        key_ids = stat_keys.get_ids({key for _, key in merged}, create=True)
+        names = {key_id: key for key, key_id in key_ids.items()}
+
+        # Updates of the same stat are merged first, row can be changed only once per statement
+        absolute, relative = {}, {}
+
+        for (persona_id, key), (value, is_relative) in merged.items():
+            stat = (persona_id, key_ids[key])
+
+            if is_relative:
+                relative[stat] = value
+            else:
+                absolute[stat] = value
+
+        stats = []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for values, new_value in (
+                (absolute, "EXCLUDED.value"),
+                (relative, "stat.value + EXCLUDED.value"),
+            ):
+                rows = [(*stat, value) for stat, value in values.items()]
+
+                for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                    batch = rows[i : i + UPSERT_BATCH_SIZE]
+
+                    cursor.execute(
+                        f"""
+                        INSERT INTO "{self.model._meta.db_table}" AS stat (persona_id, key_id, value, created_at, updated_at)
+                        SELECT incoming.persona_id, incoming.key_id, incoming.value, now(), now()
+                        FROM (VALUES {", ".join(["(%s, %s, %s::double precision)"] * len(batch))}) AS incoming (persona_id, key_id, value)
+                        WHERE incoming.persona_id IN (SELECT id FROM "{Persona._meta.db_table}")
+                        ON CONFLICT (persona_id, key_id) DO UPDATE SET value = {new_value}, updated_at = EXCLUDED.updated_at
+                        RETURNING stat.persona_id, stat.key_id, stat.value
+                        """,
+                        [param for row in batch for param in row],
+                    )
+
+                    stats.extend(
+                        (persona_id, names[key_id], value)
+                        for persona_id, key_id, value in cursor.fetchall()
+                    )
+
+        return stats
+
+    def iter_stats(self, chunk_size, updated_since=None):
+        """Iterate (key, persona id, value) of all stats (or only those updated since given time) ordered by key"""
+
+        documents = self.__get_documents()
+
+        if documents is not None:
+            return documents.iter_stats(chunk_size, updated_since)
+
+        stats = self.all()
+
+        if updated_since is not None:
+            stats = stats.filter(updated_at__gte=updated_since)
+
+        return (
+            stats.order_by("key_id")
+            .values_list("key__name", "persona_id", "value")
+            .iterator(chunk_size=chunk_size)
+        )
+
+    def __get_documents(self):
+        # Stats are kept in per-persona documents instead of rows
+        if settings.RANKING_BACKEND == "document":
+            from Plasma.models import StatDocument
+
+            return StatDocument.objects
+
+        return None
+
+
+class StatDocumentManager(models.Manager):
+    """Stats stored as a single JSONB document per persona, used by RankingManager when RANKING_BACKEND is "document"
+
+    Methods are sync, they are called from RankingManager (which takes care of leaving the event loop)
+    """
+
+    def get_stats_by_ids(self, persona_ids, keys):
+        stats = dict.fromkeys(
+            ((persona_id, key) for persona_id in persona_ids for key in keys), 0.0
+        )
+
+        # Only requested keys are read from the documents
+        keys = list(dict.fromkeys(keys))
+
+        if not persona_ids or not keys:
+            return stats
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT persona_id, {", ".join(["stats ->> %s"] * len(keys))}
+                FROM "{self.model._meta.db_table}"
+                WHERE persona_id = ANY(%s)
+                """,
+                [*keys, persona_ids],
+            )
+
+            for persona_id, *values in cursor.fetchall():
+                for key, value in zip(keys, values):
+                    if value is not None:
+                        stats[(persona_id, key)] = float(value)
+
+        return stats
+
+    def upsert_stats(self, merged):
+        """Write merged stat updates (in a single transaction), returns new (persona id, key, value) of updated stats
+
+        Every document is changed by a single statement, relative values are added in database
+        """
+
         from Plasma.models import Persona
 
-        persona = Persona.objects.get(id=personaId)
-        self.update_or_create(persona=persona, key=key, value=value)
+        # Persona id -> (absolute values, relative values)
+        changes = {}
+
+        for (persona_id, key), (value, is_relative) in merged.items():
+            absolute, relative = changes.setdefault(int(persona_id), ({}, {}))
+
+            if is_relative:
+                relative[key] = value
+            else:
+                absolute[key] = value
+
+        rows = [
+            (persona_id, json.dumps(absolute), json.dumps(relative))
+            for persona_id, (absolute, relative) in sorted(changes.items())
+        ]
+        stats = []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[i : i + UPSERT_BATCH_SIZE]
+
+                # Personas without stats get an empty document first, unknown personas are ignored
+                cursor.execute(
+                    f"""
+                    INSERT INTO "{self.model._meta.db_table}" (persona_id, stats, updated_at)
+                    SELECT id, '{{}}'::jsonb, now() FROM "{Persona._meta.db_table}"
+                    WHERE id = ANY(%s)
+                    ON CONFLICT (persona_id) DO NOTHING
+                    """,
+                    [[row[0] for row in batch]],
+                )
+
+                cursor.execute(
+                    f"""
+                    UPDATE "{self.model._meta.db_table}" AS document
+                    SET stats = document.stats || incoming.absolute || (
+                        SELECT coalesce(jsonb_object_agg(
+                            delta.key, coalesce((document.stats ->> delta.key)::double precision, 0) + delta.value::double precision
+                        ), '{{}}'::jsonb)
+                        FROM jsonb_each_text(incoming.relative) AS delta
+                    ), updated_at = now()
+                    FROM (VALUES {", ".join(["(%s::integer, %s::jsonb, %s::jsonb)"] * len(batch))}) AS incoming (persona_id, absolute, relative)
+                    WHERE document.persona_id = incoming.persona_id
+                    RETURNING document.persona_id, (
+                        SELECT jsonb_object_agg(changed.key, document.stats -> changed.key)
+                        FROM jsonb_object_keys(incoming.absolute || incoming.relative) AS changed (key)
+                    )::text
+                    """,
+                    [param for row in batch for param in row],
+                )
+
+                for persona_id, changed in cursor.fetchall():
+                    stats.extend(
+                        (persona_id, key, float(value))
+                        for key, value in json.loads(changed).items()
+                    )
+
+        return stats
+
+    def rank_stat(self, persona_id, key):
+        from Plasma.leaderboard import UNRANKED
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT value, rank FROM (
+                    SELECT persona_id, (stats ->> %s)::double precision AS value,
+                        row_number() OVER (ORDER BY (stats ->> %s)::double precision DESC) AS rank
+                    FROM "{self.model._meta.db_table}"
+                    WHERE stats ? %s
+                ) AS ranked
+                WHERE persona_id = %s
+                """,
+                [key, key, key, persona_id],
+            )
+
+            ranked_stat = cursor.fetchone()
+
+        return ranked_stat if ranked_stat is not None else (0.0, UNRANKED)
+
+    def rank_leaderboard_users(self, baseKey, minRank, maxRank, exclude_id):
+        from Plasma.models import Persona
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT ranked.persona_id, persona.name, ranked.rank FROM (
+                    SELECT persona_id, row_number() OVER (ORDER BY (stats ->> %s)::double precision DESC) AS rank
+                    FROM "{self.model._meta.db_table}"
+                    WHERE stats ? %s AND persona_id IS DISTINCT FROM %s
+                ) AS ranked
+                JOIN "{Persona._meta.db_table}" AS persona ON persona.id = ranked.persona_id
+                ORDER BY ranked.rank
+                OFFSET %s LIMIT %s
+                """,
+                [baseKey, baseKey, exclude_id, minRank - 1, maxRank - minRank + 2],
+            )
+
+            return [
+                {"owner": persona_id, "name": name, "rank": rank}
+                for persona_id, name, rank in cursor.fetchall()
+            ]
+
+    def iter_stats(self, chunk_size, updated_since=None):
+        # Documents are updated as a whole, so all stats of recently updated persona are returned
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT stat.key, document.persona_id, stat.value::double precision
+                FROM "{self.model._meta.db_table}" AS document, jsonb_each_text(document.stats) AS stat
+                WHERE %s::timestamptz IS NULL OR document.updated_at >= %s
+                ORDER BY stat.key
+                """,
+                [updated_since, updated_since],
+            )
+
+            while rows := cursor.fetchmany(chunk_size):
+                yield from rows
+
+
+class StatRankManager(models.Manager):
+    @sync_to_async
+    def get_range(self, key, start, stop, exclude_id=None):
+        """Get persona ids between (zero based, inclusive) positions, positions are counted as if excluded persona wasn't there"""
+
+        from Plasma.stat_keys import stat_keys
+
+        key_id = stat_keys.get_ids([key]).get(key)
+
+        if key_id is None:
+            return []
+
+        ranks = self.filter(key_id=key_id)
+
+        # One more entry, in case the excluded persona is in the range (or above it)
+        persona_ids = list(
+            ranks.filter(position__range=(start + 1, stop + 2))
+            .order_by("position")
+            .values_list("persona_id", flat=True)
+        )
+
+        if exclude_id is not None and exclude_id in persona_ids:
+            persona_ids.remove(exclude_id)
+        elif (
+            exclude_id is not None
+            and ranks.filter(persona_id=exclude_id, position__lte=start).exists()
+        ):
+            # Everyone below the excluded persona moves one position up
+            persona_ids = persona_ids[1:]
+
+        return persona_ids[: stop - start + 1]
+
+    def refresh(self, keys):
+        """Recompute snapshot of keys from current stats (in a single transaction), returns number of ranked stats
+
+        All keys are ranked by a single query (so stats are read only once)
+        """
+
+        from Plasma.models import Ranking
+        from Plasma.stat_keys import stat_keys
+
+        key_ids = list(stat_keys.get_ids(keys).values())
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{self.model._meta.db_table}" WHERE key_id = ANY(%s)',
+                [key_ids],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO "{self.model._meta.db_table}" (key_id, persona_id, value, rank, position)
+                SELECT key_id, persona_id, value,
+                    dense_rank() OVER (PARTITION BY key_id ORDER BY value DESC),
+                    row_number() OVER (PARTITION BY key_id ORDER BY value DESC, persona_id)
+                FROM "{Ranking._meta.db_table}"
+                WHERE key_id = ANY(%s)
+                """,
+                [key_ids],
+            )
+
+            return cursor.rowcount
 
 
 class RecordManager(models.Manager):
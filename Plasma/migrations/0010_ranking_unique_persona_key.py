@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Plasma", "0009_entitlementtarget_remove_serialkey_targets_and_more"),
+    ]
+
+    operations = [
+        # Stats used to be saved with value in the lookup, so every change created a new row, keep only the latest one
+        migrations.RunSQL(
+            """
+            DELETE FROM "Plasma_ranking" AS stale
+            USING "Plasma_ranking" AS latest
+            WHERE stale.persona_id = latest.persona_id
+              AND stale.key = latest.key
+              AND (stale.updated_at, stale.id) < (latest.updated_at, latest.id)
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="ranking",
+            constraint=models.UniqueConstraint(
+                fields=("persona", "key"), name="unique_ranking_persona_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Plasma", "0010_ranking_unique_persona_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatKey",
+            fields=[
+                ("id", models.SmallAutoField(primary_key=True, serialize=False)),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Key of the stat.",
+                        max_length=255,
+                        unique=True,
+                        verbose_name="Name",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="ranking",
+            name="stat_key",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="Plasma.statkey",
+            ),
+        ),
+        # Every distinct key is stored once, rankings are pointed to it
+        migrations.RunSQL(
+            """
+            INSERT INTO "Plasma_statkey" (name)
+            SELECT DISTINCT key FROM "Plasma_ranking"
+            ORDER BY key;
+
+            UPDATE "Plasma_ranking" AS ranking
+            SET stat_key_id = stat_key.id
+            FROM "Plasma_statkey" AS stat_key
+            WHERE stat_key.name = ranking.key;
+            """,
+            """
+            UPDATE "Plasma_ranking" AS ranking
+            SET key = stat_key.name
+            FROM "Plasma_statkey" AS stat_key
+            WHERE stat_key.id = ranking.stat_key_id;
+            """,
+        ),
+        migrations.RemoveConstraint(
+            model_name="ranking",
+            name="unique_ranking_persona_key",
+        ),
+        migrations.RemoveField(
+            model_name="ranking",
+            name="key",
+        ),
+        migrations.RenameField(
+            model_name="ranking",
+            old_name="stat_key",
+            new_name="key",
+        ),
+        migrations.AlterField(
+            model_name="ranking",
+            name="key",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="Key of the ranking.",
+                on_delete=django.db.models.deletion.PROTECT,
+                to="Plasma.statkey",
+                verbose_name="Key",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ranking",
+            constraint=models.UniqueConstraint(
+                fields=("persona", "key"), name="unique_ranking_persona_key"
+            ),
+        ),
+    ]
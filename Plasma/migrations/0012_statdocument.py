@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Plasma", "0011_statkey_ranking_key_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatDocument",
+            fields=[
+                (
+                    "persona",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="Plasma.persona",
+                    ),
+                ),
+                (
+                    "stats",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Stat values by their keys.",
+                        verbose_name="Stats",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Plasma", "0012_statdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatRank",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.FloatField()),
+                ("rank", models.PositiveIntegerField()),
+                (
+                    "key",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="Plasma.statkey",
+                    ),
+                ),
+                (
+                    "persona",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="Plasma.persona",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["key", "rank"], name="stat_rank_key_rank")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("key", "persona"), name="unique_stat_rank_key_persona"
+                    )
+                ],
+            },
+        ),
+    ]
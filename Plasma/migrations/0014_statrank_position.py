@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Plasma", "0013_statrank"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="statrank",
+            name="stat_rank_key_rank",
+        ),
+        # Snapshot is derived data, it's filled again by rebuild_ranks
+        migrations.RunSQL('TRUNCATE "Plasma_statrank"', migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name="statrank",
+            name="position",
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="statrank",
+            index=models.Index(
+                fields=["key", "position"], name="stat_rank_key_position"
+            ),
+        ),
+    ]
@@ -8,6 +8,8 @@ from Plasma.managers import (
     PersonaManager,
     RankingManager,
     RecordManager,
+    StatDocumentManager,
+    StatRankManager,
     UserManager,
 )
 
@@ -361,11 +363,28 @@ class Message(models.Model):
         ordering = ("id",)
 
 
+class StatKey(models.Model):
+    """Stat keys are stored once here, rankings reference them by (small) id"""
+
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(
+        max_length=255, unique=True, verbose_name="Name", help_text="Key of the stat."
+    )
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Ranking(models.Model):
     persona = models.ForeignKey(Persona, on_delete=models.CASCADE)
 
-    key = models.CharField(
-        max_length=255, verbose_name="Key", help_text="Key of the ranking."
+    # Stats are always looked up together with persona, separate index on key isn't needed
+    key = models.ForeignKey(
+        StatKey,
+        on_delete=models.PROTECT,
+        db_index=False,
+        verbose_name="Key",
+        help_text="Key of the ranking.",
     )
     value = models.FloatField(verbose_name="Value", help_text="Value of the ranking.")
 
@@ -377,6 +396,65 @@ class Ranking(models.Model):
     def __str__(self) -> str:
         return f"{str(self.persona)} - {self.key}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["persona", "key"], name="unique_ranking_persona_key"
+            )
+        ]
+
+
+class StatRank(models.Model):
+    """Snapshot of ranks of every stat, computed in bulk by rebuild_ranks and refreshed by refresh_ranks
+
+    Rank is dense (equal values share a rank), position is the place on leaderboard (equal values ordered by persona)
+    """
+
+    # Ranks are derived from rankings (and written in bulk), database doesn't have to check every row again
+    key = models.ForeignKey(
+        StatKey, on_delete=models.CASCADE, db_index=False, db_constraint=False
+    )
+    persona = models.ForeignKey(
+        Persona, on_delete=models.CASCADE, db_index=False, db_constraint=False
+    )
+
+    value = models.FloatField()
+    rank = models.PositiveIntegerField()
+    position = models.PositiveIntegerField()
+
+    objects = StatRankManager()
+
+    def __str__(self) -> str:
+        return f"{str(self.persona)} - {self.key} - {self.position}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key", "persona"], name="unique_stat_rank_key_persona"
+            )
+        ]
+        # Leaderboard pages are read by position
+        indexes = [
+            models.Index(fields=["key", "position"], name="stat_rank_key_position")
+        ]
+
+
+class StatDocument(models.Model):
+    """All stats of a persona in a single document (used instead of Ranking by "document" RANKING_BACKEND)"""
+
+    persona = models.OneToOneField(Persona, on_delete=models.CASCADE, primary_key=True)
+
+    stats = models.JSONField(
+        default=dict, verbose_name="Stats", help_text="Stat values by their keys."
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StatDocumentManager()
+
+    def __str__(self) -> str:
+        return str(self.persona)
+
 
 class RecordName(models.TextChoices):
     Clan = "clan", "Clan"
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from Plasma.error import TransactionError
+
+logger = logging.getLogger("pipeline")
+
+
+class TransactionPipeline:
+    """Runs independent transactions of a single connection concurrently, while responses are still sent in TID order"""
+
+    def __init__(self, limit: int):
+        self.__slots = asyncio.Semaphore(limit)
+        self.__tasks = set()
+        self.__last = (
+            None  # Every transaction sends its response only after the previous one
+        )
+
+    async def submit(self, resolve, send):
+        """Start transaction, waits (holding up the connection) while there are too many transactions in progress
+
+        resolve is awaited to get the response (concurrently), send is awaited with that response (in order)
+        """
+
+        await self.__slots.acquire()
+
+        task = asyncio.create_task(self.__run(self.__last, resolve, send))
+        task.add_done_callback(self.__tasks.discard)
+
+        self.__tasks.add(task)
+        self.__last = task
+
+    async def drain(self):
+        """Wait until all started transactions sent their responses"""
+
+        if self.__last is not None and not self.__last.done():
+            await asyncio.wait([self.__last])
+
+    def cancel(self):
+        """Cancel all transactions in progress (connection was closed)"""
+
+        for task in self.__tasks:
+            task.cancel()
+
+    async def __run(self, previous, resolve, send):
+        try:
+            try:
+                response = await resolve()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Client waits for response to every TID (and later responses wait for this one), so send an error
+                logger.exception("Failed to resolve pipelined transaction")
+                response = TransactionError(TransactionError.Code.SYSTEM_ERROR)
+
+            if previous is not None:
+                await asyncio.wait([previous])
+
+            await send(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to finish pipelined transaction")
+        finally:
+            self.__slots.release()
@@ -0,0 +1,98 @@
+from time import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from BFBC2_MasterServer.session_store import session_store
+
+# Stat key -> time of the first change which isn't in the snapshot yet
+CHANGED_KEY = "rankSnapshot:changed"
+# Changes taken by refresh which is running (or failed), kept until the snapshot is written
+REFRESHING_KEY = "rankSnapshot:refreshing"
+# Stat keys which have a snapshot
+BUILT_KEY = "rankSnapshot:built"
+
+# Changes are moved to refreshing ones (keeping the older time), so changes made during refresh aren't lost
+TAKE_CHANGED_SCRIPT = """
+local changed = redis.call("HGETALL", KEYS[1])
+
+for i = 1, #changed, 2 do
+    local since = redis.call("HGET", KEYS[2], changed[i])
+
+    if not since or tonumber(changed[i + 1]) < tonumber(since) then
+        redis.call("HSET", KEYS[2], changed[i], changed[i + 1])
+    end
+end
+
+redis.call("DEL", KEYS[1])
+return redis.call("HKEYS", KEYS[2])
+"""
+
+
+class RankSnapshot:
+    """Tracks which leaderboards changed since their ranks were snapshotted (StatRank) and how outdated they are
+
+    Snapshot of a key is used as long as its oldest unrefreshed change isn't older than RANK_SNAPSHOT_MAX_AGE
+    """
+
+    async def mark_changed(self, keys):
+        changed_at = time()
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hsetnx(CHANGED_KEY, key, changed_at)
+
+            await pipe.execute()
+
+    def mark_changed_sync(self, keys):
+        """Same as mark_changed, for sync code (outside of event loop)"""
+
+        changed_at = time()
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+
+        for key in keys:
+            pipe.hsetnx(CHANGED_KEY, key, changed_at)
+
+        pipe.execute()
+
+    async def is_fresh(self, key):
+        """Check whether snapshot of key can be used"""
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            pipe.sismember(BUILT_KEY, key)
+            pipe.hget(CHANGED_KEY, key)
+            pipe.hget(REFRESHING_KEY, key)
+            built, *changes = await pipe.execute()
+
+        if not built:
+            return False
+
+        changes = [float(since) for since in changes if since is not None]
+        return not changes or time() - min(changes) <= settings.RANK_SNAPSHOT_MAX_AGE
+
+    def take_changed(self):
+        """Get keys changed since the last refresh (from sync code), they are refreshing until marked as refreshed"""
+
+        redis = get_redis_connection("default")
+        keys = redis.register_script(TAKE_CHANGED_SCRIPT)(
+            keys=[CHANGED_KEY, REFRESHING_KEY]
+        )
+
+        return [key.decode() for key in keys]
+
+    def mark_refreshed(self, keys, replace=False):
+        """Mark snapshots of keys as written (from sync code), with replace other keys don't have a snapshot anymore"""
+
+        pipe = get_redis_connection("default").pipeline()
+
+        if replace:
+            pipe.delete(BUILT_KEY)
+
+        if keys:
+            pipe.sadd(BUILT_KEY, *keys)
+            pipe.hdel(REFRESHING_KEY, *keys)
+
+        pipe.execute()
+
+
+rank_snapshot = RankSnapshot()
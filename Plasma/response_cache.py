@@ -0,0 +1,40 @@
+from BFBC2_MasterServer.packet import HEADER_LENGTH, Packet
+
+
+class ResponseCache:
+    """Compiled responses of transactions which never change (or only vary by locale)
+
+    Only transaction data (including TXN) is cached, header (service, kind and TID) is compiled for every response
+    """
+
+    def __init__(self):
+        self.__responses = {}
+        # Part of the key, so a response built from old data (while clear runs in another thread) is never used
+        self.__version = 0
+
+    def get(self, message: Packet, locale, builder):
+        """Get cached response for the message, builder is called (once) to create the response if not cached yet"""
+
+        txn = message.Get("TXN")
+        key = (message.service, txn, locale, self.__version)
+        compiled_data = self.__responses.get(key)
+
+        if compiled_data is None:
+            response = builder()
+            response.service = message.service
+            response.kind = 0  # Header is not cached, so kind doesn't matter here
+            response.Set("TXN", txn)
+
+            compiled_data = response.compile()[HEADER_LENGTH:]
+            self.__responses[key] = compiled_data
+
+        return Packet(compiled_data=compiled_data)
+
+    def clear(self):
+        """Drop all cached responses (e.g. when data files were changed), can be called from any thread"""
+
+        self.__version += 1
+        self.__responses.clear()
+
+
+response_cache = ResponseCache()
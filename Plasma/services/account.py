@@ -1,12 +1,8 @@
-import csv
-import json
-import os
 import random
 import string
 from base64 import b64decode, b64encode
 from datetime import date
 from enum import Enum
-from pathlib import Path
 
 from asgiref.sync import sync_to_async
 from channels.auth import database_sync_to_async, get_user, login
@@ -14,17 +10,20 @@ from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.models import update_last_login
 from django.contrib.auth.password_validation import validate_password
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from email_validator import EmailNotValidError, validate_email
 
 from BFBC2_MasterServer.packet import Packet
 from BFBC2_MasterServer.service import Service
+from BFBC2_MasterServer.session_store import session_store
 from BFBC2_MasterServer.tools import legacy_b64encode
 from Plasma.enumerators.ActivationResult import ActivationResult
 from Plasma.enumerators.ClientType import ClientType
 from Plasma.error import TransactionError
+from Plasma.identity_cache import identity_cache
+from Plasma.locale_data import locale_data
 from Plasma.models import Account, Entitlement, Persona
+from Plasma.response_cache import response_cache
 
 
 class TXN(Enum):
@@ -63,14 +62,8 @@ class TXN(Enum):
 class AccountService(Service):
     ENCRYPTED_PREFIX = "Ciyvab0tregdVsBtboIpeChe4G6uzC1v5_-SIxmvSL"
 
-    countryListPath = os.path.join(settings.BASE_DIR, "Plasma/data/CountryList")
-    tosPath = os.path.join(settings.BASE_DIR, "Plasma/data/TOS")
-
-    countryConfigOverrides = {}
-    validCountryCodes = []
-
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.resolver_map[TXN.NuLogin] = self.__handle_login
         self.resolver_map[TXN.NuAddAccount] = self.__handle_add_account
@@ -117,37 +110,15 @@ class AccountService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    def __get_locale(self):
-        locale = self.connection.locale.value
+    def __get_locale(self, connection):
+        locale = connection.locale.value
 
         if settings.DEBUG:
             locale = "test"
 
         return locale
 
-    def __get_tos(self):
-        """Get TOS"""
-
-        locale = self.__get_locale()
-
-        tosFilename = "TOS.txt"
-
-        if Path(
-            os.path.join(self.tosPath, tosFilename.replace(".", f".{locale}."))
-        ).exists():
-            tosFilename = tosFilename.replace(".", f".{locale}.")
-
-        finalPath = os.path.join(self.tosPath, tosFilename)
-
-        with open(finalPath, "r") as file:
-            tos_content = file.read()
-
-        with open(finalPath.replace(".txt", ".version"), "r") as file:
-            tos_version = file.read()
-
-        return tos_content, tos_version
-
-    async def __internal_login(self, data: Packet, allow_unentitled=False):
+    async def __internal_login(self, connection, data: Packet, allow_unentitled=False):
         """Internal login handler"""
 
         nuid = data.Get("nuid")
@@ -182,11 +153,13 @@ class AccountService(Service):
         else:
             # Authentication successful, check if user logged to server account and if so check if client is server
 
-            if user.isServerAccount and self.connection.clientType != ClientType.SERVER:
+            if user.isServerAccount and connection.clientType != ClientType.SERVER:
                 return TransactionError(TransactionError.Code.USER_NOT_FOUND)
 
         await sync_to_async(update_last_login)(None, user)
 
+        active_session, user_lkey = await session_store.get_user_login(user.id)
+
         if not user.isServerAccount:
             # This is normal user, check whether user is entitled an accepted latest TOS
             tosVersion = data.Get("tosVersion")
@@ -195,35 +168,29 @@ class AccountService(Service):
             if tosVersion:
                 await umodel.objects.accept_tos(user, tosVersion)
 
-            _, tos_version = self.__get_tos()
+            _, tos_version = locale_data.get_tos(self.__get_locale(connection))
 
             if tos_version != user.tosVersion:
                 return TransactionError(TransactionError.Code.TOS_OUT_OF_DATE)
 
             is_entitled = await Entitlement.objects.is_entitled_for_game(
-                user, self.connection.clientString
+                user, connection.clientString
             )
 
             if not is_entitled:
                 if not allow_unentitled:
                     return TransactionError(TransactionError.Code.NOT_ENTITLED_TO_GAME)
 
-            active_session = cache.get(f"userSession:{user.id}")
-
             if active_session:
-                if active_session != self.connection.channel_name:
-                    self.connection.logger.warning(
+                if active_session != connection.channel_name:
+                    connection.logger.warning(
                         f"User {user.id} has active session, destroying it"
                     )
 
-                    await self.connection.start_remote_transaction(
+                    await connection.start_remote_transaction(
                         user.id, "fsys", "Goodbye", {"reason": 2}
                     )
 
-            cache.set(
-                f"userSession:{user.id}", self.connection.channel_name, timeout=None
-            )
-
         encryptedLoginInfo = None
 
         if data.Get("returnEncryptedInfo"):
@@ -236,8 +203,6 @@ class AccountService(Service):
 
             encryptedLoginInfo = loginInfo
 
-        user_lkey = cache.get(f"userLoginKey:{user.id}")
-
         if not user_lkey:
             # Generate new login key, because user doesn't have one (or previous one expired)
             user_lkey = (
@@ -248,22 +213,23 @@ class AccountService(Service):
                 + "."
             )
 
-            # Save login key that never expires (we set expiration time when user logs out)
-            cache.set(f"userLoginKey:{user.id}", user_lkey, timeout=None)
-        else:
-            # User already has login key, so we need to delete it from cache
-            cache.touch(f"userLoginKey:{user.id}", timeout=None)
+        # Save login key that never expires (we set expiration time when user logs out)
+        await session_store.set_user_login(
+            user.id,
+            user_lkey,
+            None if user.isServerAccount else connection.channel_name,
+        )
 
-        self.connection.loggedUser = user
-        self.connection.loggedUserKey = user_lkey
+        connection.loggedUser = user
+        connection.loggedUserKey = user_lkey
 
-        await login(self.connection.scope, user)
-        await database_sync_to_async(self.connection.scope["session"].save)()
+        await login(connection.scope, user)
+        await database_sync_to_async(connection.scope["session"].save)()
 
         return user, user_lkey, encryptedLoginInfo
 
-    async def __handle_login(self, data):
-        response_data = await self.__internal_login(data)
+    async def __handle_login(self, connection, data):
+        response_data = await self.__internal_login(connection, data)
 
         if isinstance(response_data, TransactionError):
             return response_data
@@ -289,7 +255,7 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_add_account(self, data):
+    async def __handle_add_account(self, connection, data):
         """Add a new account"""
 
         errContainer = []
@@ -306,7 +272,7 @@ class AccountService(Service):
             validation = validate_email(nuid, check_deliverability=True)
             nuid = validation.email
         except EmailNotValidError as e:
-            self.connection.logger.error(f"-- Not a valid email address. ({e})")
+            connection.logger.error(f"-- Not a valid email address. ({e})")
 
             errContainer.append(
                 {
@@ -323,7 +289,7 @@ class AccountService(Service):
         try:
             validate_password(password)
         except ValidationError as e:
-            self.connection.logger.error(f"-- Not a valid password. ({e})")
+            connection.logger.error(f"-- Not a valid password. ({e})")
 
             errContainer.append(
                 {
@@ -349,7 +315,7 @@ class AccountService(Service):
             - ((dateToday.month, dateToday.day) < (dateOfBirth.month, dateOfBirth.day))
         )
 
-        countryConfig = self.countryConfigOverrides.get(data.Get("country"), {})
+        countryConfig = locale_data.get_country_config(data.Get("country"))
         errContainer = []
 
         if countryConfig.get("registrationAgeLimit", 13) > age:
@@ -393,10 +359,10 @@ class AccountService(Service):
         response = Packet()
         return response
 
-    async def __handle_add_persona(self, data):
+    async def __handle_add_persona(self, connection, data):
         """Add a new persona"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
         name = data.Get("name")
 
         if not name:
@@ -410,10 +376,10 @@ class AccountService(Service):
         response = Packet()
         return response
 
-    async def __handle_disable_persona(self, data):
+    async def __handle_disable_persona(self, connection, data):
         """Remove a persona"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
         name = data.Get("name")
 
         if not name:
@@ -427,45 +393,18 @@ class AccountService(Service):
             response = Packet()
             return response
 
-    async def __handle_get_country_list(self, data):
+    async def __handle_get_country_list(self, connection, data):
         """Get the list of countries"""
 
-        locale = self.__get_locale()
-
-        countryList = []
-        countryListFilename = "CountryList.csv"
-
-        if Path(
-            os.path.join(
-                self.countryListPath, countryListFilename.replace(".", f".{locale}.")
-            )
-        ).exists():
-            countryListFilename = countryListFilename.replace(".", f".{locale}.")
-
-        with open(os.path.join(self.countryListPath, "overrides.json"), "r") as file:
-            overrides = json.load(file)
-
-            if settings.DEBUG:
-                overrides["DBG"] = {
-                    "allowEmailsDefaultValue": 0,
-                    "parentalControlAgeLimit": 18,
-                    "registrationAgeLimit": 13,
-                }
-
-            self.countryConfigOverrides = overrides
-
-        with open(os.path.join(self.countryListPath, countryListFilename), "r") as file:
-            reader = csv.DictReader(file)
-
-            for row in reader:
-                iso_code = row["ISOCode"]
+        locale = self.__get_locale(connection)
+        return response_cache.get(
+            data, locale, lambda: self.__build_country_list(locale)
+        )
 
-                if iso_code in overrides:
-                    for key in overrides[iso_code]:
-                        row[key] = overrides[iso_code][key]
+    def __build_country_list(self, locale):
+        """Build GetCountryList response for the locale"""
 
-                self.validCountryCodes.append(iso_code)
-                countryList.append(row)
+        countryList = [dict(row) for row in locale_data.get_country_list(locale)]
 
         # This is simple packet, example country looks like this:
         # {
@@ -487,14 +426,13 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_tos(self, data):
+    async def __handle_get_tos(self, connection, data):
         """Get the Terms of Service"""
 
         selected_country_code = data.Get("countryCode")
 
-        if (
-            selected_country_code is not None
-            and selected_country_code not in self.validCountryCodes
+        if selected_country_code is not None and not locale_data.is_valid_country_code(
+            selected_country_code
         ):
             raise ValueError(
                 f"{selected_country_code} is not valid country code for NuGetTos."
@@ -503,7 +441,13 @@ class AccountService(Service):
         # In theory everything shows that here we should send the TOS for the selected country code.
         # However, this doesn't seem to be the case. Original server sends the same TOS for every country code, only (game) language seems to have any effect.
 
-        tos_content, tos_version = self.__get_tos()
+        locale = self.__get_locale(connection)
+        return response_cache.get(data, locale, lambda: self.__build_tos(locale))
+
+    def __build_tos(self, locale):
+        """Build NuGetTos response for the locale"""
+
+        tos_content, tos_version = locale_data.get_tos(locale)
 
         response = Packet()
         response.Set("tos", tos_content)
@@ -511,7 +455,7 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_create_encrypted_token(self, data):
+    async def __handle_create_encrypted_token(self, connection, data):
         """Create an encrypted token (?)"""
 
         # Is this ever called from the client?
@@ -531,7 +475,7 @@ class AccountService(Service):
         # Couldn't find any response for this transaction in my poor RE effort
         raise NotImplementedError("NuCreateEncryptedToken is not implemented")
 
-    async def __handle_suggest_personas(self, data):
+    async def __handle_suggest_personas(self, connection, data):
         """Suggest personas"""
 
         # Is this ever called from the client?
@@ -551,7 +495,7 @@ class AccountService(Service):
         # }
 
         # Not sure what "name" is here, but let's say it's the currently logged persona name
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         keywords = data.Get("keywords")
         max_suggestions = data.Get("maxSuggestions")
@@ -568,10 +512,10 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_login_persona(self, data):
+    async def __handle_login_persona(self, connection, data):
         """Login a persona"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
         name = data.Get("name")
 
         if not name:
@@ -582,7 +526,7 @@ class AccountService(Service):
         if persona is None:
             return TransactionError(TransactionError.Code.USER_NOT_FOUND)
 
-        persona_lkey = cache.get(f"personaLoginKey:{user.id}")
+        persona_lkey = await session_store.get_persona_login_key(user.id)
 
         if not persona_lkey:
             # Generate new login key, because user doesn't have one (or previous one expired)
@@ -594,16 +538,14 @@ class AccountService(Service):
                 + "."
             )
 
-            # Save login key that never expires (we set expiration time when user logs out)
-            cache.set(f"personaLoginKey:{user.id}", persona_lkey, timeout=None)
-            cache.set(f"lkeyMap:{persona_lkey}", persona.id, timeout=None)
-        else:
-            # User already has login key, so we need to delete it from cache
-            cache.touch(f"personaLoginKey:{user.id}", timeout=None)
-            cache.touch(f"lkeyMap:{persona_lkey}", timeout=None)
+        # Save login key that never expires (we set expiration time when user logs out)
+        await session_store.set_persona_login(user.id, persona.id, persona_lkey)
 
-        self.connection.loggedPersona = persona
-        self.connection.loggedPersonaKey = persona_lkey
+        # Key could have been mapped to another persona of the user (and cached with expiration time)
+        await identity_cache.invalidate_login_key(persona_lkey)
+
+        connection.loggedPersona = persona
+        connection.loggedPersonaKey = persona_lkey
 
         response = Packet()
         response.Set("lkey", persona_lkey)
@@ -614,15 +556,15 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_update_password(self, data):
+    async def __handle_update_password(self, connection, data):
         """Update a user's password"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         data.Set("nuid", user.nuid)  # Add nuid so we can test login
         new_password = data.Get("newPassword")
 
-        login_data = await self.__internal_login(data)
+        login_data = await self.__internal_login(connection, data)
 
         if isinstance(login_data, TransactionError):
             return login_data
@@ -630,7 +572,7 @@ class AccountService(Service):
         try:
             validate_password(new_password)
         except ValidationError as e:
-            self.connection.logger.error(f"-- Not a valid password. ({e})")
+            connection.logger.error(f"-- Not a valid password. ({e})")
 
             errContainer = [
                 {
@@ -647,7 +589,7 @@ class AccountService(Service):
         user.set_password(new_password)
         data.Set("password", new_password)  # Overwrite password with new password
 
-        login_data = await self.__internal_login(data)
+        login_data = await self.__internal_login(connection, data)
 
         if isinstance(login_data, TransactionError):
             return login_data
@@ -661,11 +603,11 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_account(self, data, nuid=None):
+    async def __handle_get_account(self, connection, data, nuid=None):
         """Get a user's account information"""
 
         if nuid is None:
-            user = await get_user(self.connection.scope)
+            user = await get_user(connection.scope)
         else:
             umodel = get_user_model()
             user = await umodel.objects.get_user_by_nuid(nuid)
@@ -718,7 +660,7 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_account_by_nuid(self, data):
+    async def __handle_get_account_by_nuid(self, connection, data):
         """Get a user's account information by nuid"""
 
         nuid = data.Get("nuid")
@@ -730,14 +672,14 @@ class AccountService(Service):
         # But it looks like security risk to me, so if nuid is not equal to current user's nuid, we return error
         # Else, we return account info of current user
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         if nuid != user.nuid:
             return TransactionError(TransactionError.Code.TRANSACTION_DATA_NOT_FOUND)
 
-        return await self.__handle_get_account(data, nuid)
+        return await self.__handle_get_account(connection, data, nuid)
 
-    async def __handle_get_account_by_ps3_ticket(self, data):
+    async def __handle_get_account_by_ps3_ticket(self, connection, data):
         """Get a user's account information by ps3 ticket"""
 
         # {
@@ -748,10 +690,10 @@ class AccountService(Service):
             "NuGetAccountByPs3Ticket is PS3 specific transaction, it's not supported by this server implementation"
         )
 
-    async def __handle_get_personas(self, data):
+    async def __handle_get_personas(self, connection, data):
         """Get the list of personas"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
         personas = await Persona.objects.list_personas(user)
 
         response = Packet()
@@ -759,10 +701,10 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_update_account(self, data):
+    async def __handle_update_account(self, connection, data):
         """Update a user's account information"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         nuid = data.Get("nuid")
         password = data.Get("password")
@@ -823,7 +765,7 @@ class AccountService(Service):
         await user.save()
         return Packet()
 
-    async def __handle_gamespy_preauth(self, data):
+    async def __handle_gamespy_preauth(self, connection, data):
         """Gamespy preauth"""
 
         # {}
@@ -832,7 +774,7 @@ class AccountService(Service):
             "NuGamespyPreauth is Gamespy specific transaction, it's not supported by this server implementation"
         )
 
-    async def __handle_xbl360_login(self, data):
+    async def __handle_xbl360_login(self, connection, data):
         """Xbox (Live) 360 login"""
 
         # {
@@ -845,13 +787,13 @@ class AccountService(Service):
             "NuXbl360Login is Xbox 360 specific transaction, it's not supported by this server implementation"
         )
 
-    async def __handle_xbl360_add_account(self, data):
+    async def __handle_xbl360_add_account(self, connection, data):
         """Xbox (Live) 360 add account"""
 
         # Seems to be identical to NuAddAccount
-        return await self.__handle_add_account(data)
+        return await self.__handle_add_account(connection, data)
 
-    async def __handle_ps3_login(self, data):
+    async def __handle_ps3_login(self, connection, data):
         """Playstation 3 login"""
 
         # {
@@ -865,20 +807,20 @@ class AccountService(Service):
             "NuPs3Login is PS3 specific transaction, it's not supported by this server implementation"
         )
 
-    async def __handle_ps3_add_account(self, data):
+    async def __handle_ps3_add_account(self, connection, data):
         """Playstation 3 add account"""
 
         # Seems to be identical to NuAddAccount
-        return await self.__handle_add_account(data)
+        return await self.__handle_add_account(connection, data)
 
-    async def __handle_transaction_exception(self, data):
+    async def __handle_transaction_exception(self, connection, data):
         """Transaction exception"""
 
         raise NotImplementedError(
             "TransactionException is not supported by this server implementation"
         )
 
-    async def __handle_lookup_user_info(self, data):
+    async def __handle_lookup_user_info(self, connection, data):
         """Lookup user info"""
 
         users_to_lookup = data.Get("userInfo")
@@ -903,10 +845,10 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_search_owners(self, data):
+    async def __handle_search_owners(self, connection, data):
         """Friend search"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         screenName = data.Get("screenName")
 
@@ -921,11 +863,20 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_telemetry_token(self, data):
+    async def __handle_get_telemetry_token(self, connection, data):
         """Get telemetry token"""
+
+        locale = connection.locale.value
+        return response_cache.get(
+            data, locale, lambda: self.__build_telemetry_token(locale)
+        )
+
+    def __build_telemetry_token(self, locale):
+        """Build GetTelemetryToken response for the locale"""
+
         token = "0.0.0.0,9946,"
 
-        locale = str(self.connection.locale.value).replace("_", "")
+        locale = str(locale).replace("_", "")
 
         if len(locale) == 2:
             locale = locale + locale.upper()
@@ -951,17 +902,17 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_entitlements(self, data):
+    async def __handle_get_entitlements(self, connection, data):
         """Get the list of entitlements"""
 
         groupName = data.Get("groupName")
         entitlementTag = data.Get("entitlementTag")
 
-        if self.connection.clientType == ClientType.SERVER:
+        if connection.clientType == ClientType.SERVER:
             uid = data.Get("masterUserId")
             user = await Account.objects.get_user_by_id(uid)
         else:
-            user = await get_user(self.connection.scope)
+            user = await get_user(connection.scope)
 
         entitlements = await Entitlement.objects.list_entitlements(
             user, groupName=groupName, entitlementTag=entitlementTag
@@ -972,10 +923,10 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_get_entitlement_count(self, data):
+    async def __handle_get_entitlement_count(self, connection, data):
         """Get the count of entitlements"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         filter_data = {
             "entitlementId": data.Get("entitlementId"),
@@ -1001,10 +952,12 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_entitle_game(self, data):
+    async def __handle_entitle_game(self, connection, data):
         """Entitle game (user enters game key while login)"""
 
-        response_data = await self.__internal_login(data, allow_unentitled=True)
+        response_data = await self.__internal_login(
+            connection, data, allow_unentitled=True
+        )
 
         if isinstance(response_data, TransactionError):
             return response_data
@@ -1030,10 +983,10 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_entitle_user(self, data):
+    async def __handle_entitle_user(self, connection, data):
         """User enters key"""
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
         key = data.Get("key")
 
         activation_result, activated_products = await Entitlement.objects.activate_key(
@@ -1050,7 +1003,7 @@ class AccountService(Service):
 
         return response
 
-    async def __handle_grant_entitlement(self, data):
+    async def __handle_grant_entitlement(self, connection, data):
         """Grant entitlement"""
 
         # Is this ever called from client?
@@ -1071,10 +1024,10 @@ class AccountService(Service):
         #     "personaId": "string",
         # }
 
-        if self.connection.clientType != ClientType.SERVER:
+        if connection.clientType != ClientType.SERVER:
             return TransactionError(TransactionError.Code.SESSION_NOT_AUTHORIZED)
 
-        user = await get_user(self.connection.scope)
+        user = await get_user(connection.scope)
 
         await Entitlement.objects.add_entitlement(
             user,
@@ -1087,7 +1040,7 @@ class AccountService(Service):
 
         return Packet()
 
-    async def __handle_get_locker_url(self, data):
+    async def __handle_get_locker_url(self, connection, data):
         """Get locker URL"""
 
         # Original server URL is http://bfbc2.gos.ea.com/easo/fileupload/locker2.jsp
@@ -19,8 +19,8 @@ class TXN(Enum):
 
 
 class AssociationService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.creator_map[
             TXN.NotifyAssociationUpdate
@@ -52,7 +52,7 @@ class AssociationService(Service):
 
         return None
 
-    async def __handle_add_associations(self, data):
+    async def __handle_add_associations(self, connection, data):
         """Add associations between two objects."""
 
         domainPartition = data.Get("domainPartition")
@@ -71,7 +71,7 @@ class AssociationService(Service):
         addRequests = data.Get("addRequests")
 
         assoUsr = await Assocation.objects.get_user_assocations(
-            self.connection.loggedPersona, assoType
+            connection.loggedPersona, assoType
         )
         maxAssocations = 20 if assoType != AssociationType.RECENT_PLAYERS else 100
 
@@ -81,7 +81,7 @@ class AssociationService(Service):
             outcome = 0
 
             assoLen = await Assocation.objects.get_user_assocations_count(
-                self.connection.loggedPersona, assoType
+                connection.loggedPersona, assoType
             )
 
             if listFullBehavior == ListFullBehavior.ReturnError:
@@ -98,22 +98,22 @@ class AssociationService(Service):
 
             # Add new member
             member = await Assocation.objects.add_assocation(
-                self.connection.loggedPersona, assoType, addRequest["member"]["id"]
+                connection.loggedPersona, assoType, addRequest["member"]["id"]
             )
 
             assoLen = await Assocation.objects.get_user_assocations_count(
-                self.connection.loggedPersona, assoType
+                connection.loggedPersona, assoType
             )
 
             uid = await Persona.objects.get_user_id_by_persona_id(member["id"])
 
             owner = {
-                "id": self.connection.loggedPersona.id,
-                "name": self.connection.loggedPersona.name,
+                "id": connection.loggedPersona.id,
+                "name": connection.loggedPersona.name,
                 "type": 1,
             }
 
-            await self.connection.start_remote_transaction(
+            await connection.start_remote_transaction(
                 uid,
                 "asso",
                 TXN.NotifyAssociationUpdate.value,
@@ -148,7 +148,7 @@ class AssociationService(Service):
 
         return response
 
-    async def __handle_delete_associations(self, data):
+    async def __handle_delete_associations(self, connection, data):
         """Delete associations between two objects."""
 
         domainPartition = data.Get("domainPartition")
@@ -158,7 +158,7 @@ class AssociationService(Service):
             return TransactionError(TransactionError.Code.PARAMETERS_ERROR)
 
         await Assocation.objects.get_user_assocations(
-            self.connection.loggedPersona, assoType
+            connection.loggedPersona, assoType
         )
 
         deleteRequests = data.Get("deleteRequests")
@@ -171,22 +171,22 @@ class AssociationService(Service):
 
             # Remove member
             member = await Assocation.objects.remove_assocation(
-                self.connection.loggedPersona, assoType, deleteRequest["member"]["id"]
+                connection.loggedPersona, assoType, deleteRequest["member"]["id"]
             )
 
             owner = {
-                "id": self.connection.loggedPersona.id,
-                "name": self.connection.loggedPersona.name,
+                "id": connection.loggedPersona.id,
+                "name": connection.loggedPersona.name,
                 "type": 1,
             }
 
             assoLen = await Assocation.objects.get_user_assocations_count(
-                self.connection.loggedPersona, assoType
+                connection.loggedPersona, assoType
             )
 
             uid = await Persona.objects.get_user_id_by_persona_id(member["id"])
 
-            await self.connection.start_remote_transaction(
+            await connection.start_remote_transaction(
                 uid,
                 "asso",
                 TXN.NotifyAssociationUpdate.value,
@@ -221,7 +221,7 @@ class AssociationService(Service):
 
         return response
 
-    async def __handle_get_associations(self, data):
+    async def __handle_get_associations(self, connection, data):
         """Get associations between two objects."""
 
         domainPartition = data.Get("domainPartition")
@@ -231,12 +231,12 @@ class AssociationService(Service):
             return TransactionError(TransactionError.Code.PARAMETERS_ERROR)
 
         assocationMembers = await Assocation.objects.get_user_assocations_dict(
-            self.connection.loggedPersona, assoType
+            connection.loggedPersona, assoType
         )
 
         owner = {
-            "id": self.connection.loggedPersona.id,
-            "name": self.connection.loggedPersona.name,
+            "id": connection.loggedPersona.id,
+            "name": connection.loggedPersona.name,
             "type": 1,
         }
 
@@ -251,7 +251,7 @@ class AssociationService(Service):
 
         return response
 
-    async def __handle_get_association_count(self, data):
+    async def __handle_get_association_count(self, connection, data):
         """Get the number of associations between two objects."""
 
         domainPartition = data.Get("domainPartition")
@@ -261,14 +261,14 @@ class AssociationService(Service):
             return TransactionError(TransactionError.Code.PARAMETERS_ERROR)
 
         assocationMembers = await Assocation.objects.get_user_assocations_dict(
-            self.connection.loggedPersona, assoType
+            connection.loggedPersona, assoType
         )
 
         maxAssocations = 20 if assoType != AssociationType.RECENT_PLAYERS else 100
 
         owner = {
-            "id": self.connection.loggedPersona.id,
-            "name": self.connection.loggedPersona.name,
+            "id": connection.loggedPersona.id,
+            "name": connection.loggedPersona.name,
             "type": 1,
         }
 
@@ -280,7 +280,7 @@ class AssociationService(Service):
 
         return response
 
-    async def __create_notify_association_update(self, data):
+    async def __create_notify_association_update(self, connection, data):
         """Create a notify association update packet."""
 
         response = Packet()
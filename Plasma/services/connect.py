@@ -15,6 +15,7 @@ from BFBC2_MasterServer.packet import Packet
 from BFBC2_MasterServer.service import Service
 from Plasma.enumerators.ClientType import ClientType
 from Plasma.error import TransactionError, TransactionSkip
+from Plasma.response_cache import response_cache
 
 
 class TXN(Enum):
@@ -27,8 +28,8 @@ class TXN(Enum):
 
 
 class ConnectService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.creator_map[TXN.Ping] = self.__create_ping
         self.creator_map[TXN.MemCheck] = self.__create_memcheck
@@ -47,13 +48,13 @@ class ConnectService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __create_ping(self, data):
+    async def __create_ping(self, connection, data):
         """Create a Ping packet"""
 
         response = Packet()
         return response
 
-    async def __create_memcheck(self, data):
+    async def __create_memcheck(self, connection, data):
         """Create a MemCheck packet"""
 
         response = Packet()
@@ -72,7 +73,7 @@ class ConnectService(Service):
 
         return response
 
-    async def __create_goodbye(self, data):
+    async def __create_goodbye(self, connection, data):
         response = Packet()
 
         for key in data:
@@ -80,10 +81,10 @@ class ConnectService(Service):
 
         return response
 
-    async def __handle_hello(self, data):
+    async def __handle_hello(self, connection, data):
         """Initial packet sent by client, used to determine client type, and other connection details"""
 
-        if self.connection.initialized:
+        if connection.initialized:
             raise TransactionError(TransactionError.Code.SYSTEM_ERROR)
 
         client_data = {
@@ -100,17 +101,17 @@ class ConnectService(Service):
 
         # Check if all required fields were provided by client
         if any(map(lambda x: x is None, client_data.values())):
-            self.connection.logger.error("Client sent invalid Hello packet")
+            connection.logger.error("Client sent invalid Hello packet")
             return TransactionError(TransactionError.Code.PARAMETERS_ERROR)
 
-        await self.connection.initialize_connection(client_data)
+        await connection.initialize_connection(client_data)
 
         domainPartition = {
             "domain": "eagames",
             "subDomain": "BFBC2",
         }
 
-        if self.connection.clientType == ClientType.CLIENT:
+        if connection.clientType == ClientType.CLIENT:
             theater_ip = THEATER_CLIENT_IP
             theater_port = THEATER_CLIENT_PORT
         else:
@@ -137,22 +138,22 @@ class ConnectService(Service):
 
         return response
 
-    async def __handle_ping(self, data):
+    async def __handle_ping(self, connection, data):
         """Handle a Ping packet"""
 
         # Ignore
         return TransactionSkip()
 
-    async def __handle_goodbye(self, data):
+    async def __handle_goodbye(self, connection, data):
         """Handle a Goodbye packet (sent by client when disconnecting)"""
 
         # Just log why client disconnected
-        self.connection.logger.info(
+        connection.logger.info(
             f"Client disconnected (Reason: {data.Get('reason')}, Message: {data.Get('message')})"
         )
         return TransactionSkip()
 
-    async def __handle_suicide(self, data):
+    async def __handle_suicide(self, connection, data):
         """Handle Suicide packet"""
 
         # This packet only contains TXN, no idea what it's supposed to do
@@ -162,15 +163,20 @@ class ConnectService(Service):
 
         return TransactionSkip()
 
-    async def __handle_memcheck(self, data):
+    async def __handle_memcheck(self, connection, data):
         """Handle a MemCheck packet"""
 
         # Ignore
         return TransactionSkip()
 
-    async def __get_ping_sites(self, data):
+    async def __get_ping_sites(self, connection, data):
         """Get a list of ping sites"""
 
+        return response_cache.get(data, None, self.__build_ping_sites)
+
+    def __build_ping_sites(self):
+        """Build GetPingSites response (same for every client)"""
+
         # Original server always sends 4 ping sites
         # {
         #    "name": "nrt",
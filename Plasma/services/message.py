@@ -19,8 +19,8 @@ class TXN(Enum):
 
 
 class ExtensibleMessageService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.creator_map[TXN.AsyncMessageEvent] = self.__create_async_message_event
         self.creator_map[TXN.AsyncPurgedEvent] = self.__create_async_purged_event
@@ -40,9 +40,9 @@ class ExtensibleMessageService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __handle_send_message(self, data):
+    async def __handle_send_message(self, connection, data):
         receivers, messageId = await Message.objects.send_message(
-            self.connection.loggedPersona, data
+            connection.loggedPersona, data
         )
 
         statuses = []
@@ -51,7 +51,7 @@ class ExtensibleMessageService(Service):
 
             uid = await Persona.objects.get_user_id_by_persona_id(receiver.id)
 
-            await self.connection.start_remote_transaction(
+            await connection.start_remote_transaction(
                 uid,
                 "xmsg",
                 TXN.AsyncMessageEvent.value,
@@ -66,10 +66,10 @@ class ExtensibleMessageService(Service):
 
         return response
 
-    async def __handle_get_messages(self, data):
+    async def __handle_get_messages(self, connection, data):
         attachmentTypes = data.Get("attachmentTypes")
         messages = await Message.objects.get_messages(
-            self.connection.loggedPersona, attachmentTypes
+            connection.loggedPersona, attachmentTypes
         )
 
         response = Packet()
@@ -77,7 +77,7 @@ class ExtensibleMessageService(Service):
 
         return response
 
-    async def __handle_get_message_attachments(self, data):
+    async def __handle_get_message_attachments(self, connection, data):
         # {
         #    "messageId": int,
         #    "keys.[]": int,
@@ -86,7 +86,7 @@ class ExtensibleMessageService(Service):
 
         return Packet()
 
-    async def __handle_delete_messages(self, data):
+    async def __handle_delete_messages(self, connection, data):
         messageIds = data.Get("messageIds")
 
         for messageId in messageIds:
@@ -94,7 +94,7 @@ class ExtensibleMessageService(Service):
             senderId = await Message.objects.get_sender_id_from_message(message)
             uid = await Persona.objects.get_user_id_by_persona_id(senderId)
 
-            await self.connection.start_remote_transaction(
+            await connection.start_remote_transaction(
                 uid,
                 "xmsg",
                 TXN.AsyncPurgedEvent.value,
@@ -107,11 +107,11 @@ class ExtensibleMessageService(Service):
 
         return Packet()
 
-    async def __handle_purge_messages(self, data):
+    async def __handle_purge_messages(self, connection, data):
         # Seems to be the same as DeleteMessages
-        return await self.__handle_delete_messages(data)
+        return await self.__handle_delete_messages(connection, data)
 
-    async def __handle_modify_settings(self, data):
+    async def __handle_modify_settings(self, connection, data):
         # Seems to be always called by client, not sure what it does because it doesn't seem to do anything
 
         # {
@@ -123,7 +123,7 @@ class ExtensibleMessageService(Service):
         # Send acknowledge packet
         return Packet()
 
-    async def __create_async_message_event(self, data):
+    async def __create_async_message_event(self, connection, data):
         messageId = data.get("messageId")
         messageData = await Message.objects.get_message(messageId)
 
@@ -134,7 +134,7 @@ class ExtensibleMessageService(Service):
 
         return response
 
-    async def __create_async_purged_event(self, data):
+    async def __create_async_purged_event(self, connection, data):
         messageIds = data.get("messageIds")
 
         response = Packet()
@@ -14,8 +14,8 @@ class TXN(Enum):
 
 
 class PlayNowService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.resolver_map[TXN.Start] = self.__handle_start
         self.creator_map[TXN.Status] = self.__create_status
@@ -26,16 +26,16 @@ class PlayNowService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __handle_start(self, data):
+    async def __handle_start(self, connection, data):
         cache.get_or_set("matchmakingId", 0, timeout=None)
-        self.connection.matchmakingId = cache.incr("matchmakingId")
+        connection.matchmakingId = cache.incr("matchmakingId")
 
         response = Packet()
 
         response.Set(
             "id",
             {
-                "id": self.connection.matchmakingId,
+                "id": connection.matchmakingId,
                 "partition": "/eagames/BFBC2",
             },
         )
@@ -44,12 +44,12 @@ class PlayNowService(Service):
         matchmaking_settings = players[0]
 
         asyncio.get_running_loop().create_task(
-            self.connection.start_matchmaking(matchmaking_settings["props"])
+            connection.start_matchmaking(matchmaking_settings["props"])
         )
         return response
 
-    async def __create_status(self, data):
-        if not self.connection.matchmakingId:
+    async def __create_status(self, connection, data):
+        if not connection.matchmakingId:
             raise TransactionError(TransactionError.Code.SYSTEM_ERROR)
 
         await asyncio.sleep(1)
@@ -59,12 +59,12 @@ class PlayNowService(Service):
         response.Set(
             "id",
             {
-                "id": self.connection.matchmakingId,
+                "id": connection.matchmakingId,
                 "partition": "/eagames/BFBC2",
             },
         )
 
-        self.connection.matchmakingId = None
+        connection.matchmakingId = None
 
         response.Set("sessionState", "COMPLETE")
 
@@ -3,10 +3,9 @@ import json
 from base64 import b64decode, b64encode
 from enum import Enum
 
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
 from BFBC2_MasterServer.service import Service
+from BFBC2_MasterServer.session_store import session_store
 from Plasma.error import TransactionError
 from Plasma.models import Persona
 
@@ -19,8 +18,8 @@ class TXN(Enum):
 
 
 class PresenceService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.creator_map[
             TXN.AsyncPresenceStatusEvent
@@ -36,7 +35,7 @@ class PresenceService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __handle_presence_subscribe(self, data):
+    async def __handle_presence_subscribe(self, connection, data):
         requests = data.Get("requests")
 
         responses = []
@@ -45,18 +44,18 @@ class PresenceService(Service):
             userId = request["userId"]
 
             # Add the user to the list of subscribed users (if not already subscribed)
-            if userId not in self.connection.subscribedTo:
-                self.connection.subscribedTo.append(userId)
+            if userId not in connection.subscribedTo:
+                connection.subscribedTo.append(userId)
 
             owner = await Persona.objects.get_persona_by_id(userId)
 
             responses.append({"owner": owner, "outcome": 0})
 
-            currPres = cache.get(f"presence:{userId}")
+            currPres = await session_store.get_presence(userId)
 
             if currPres:
                 asyncio.ensure_future(
-                    self.connection.transactor.start(
+                    connection.transactor.start(
                         "pres",
                         TXN.AsyncPresenceStatusEvent,
                         {"initial": True, "owner": owner, "status": currPres},
@@ -68,7 +67,7 @@ class PresenceService(Service):
 
         return response
 
-    async def __handle_presence_unsubscribe(self, data):
+    async def __handle_presence_unsubscribe(self, connection, data):
         requests = data.Get("requests")
 
         responses = []
@@ -77,8 +76,8 @@ class PresenceService(Service):
             userId = request["userId"]
 
             # Remove the user from the list of subscribed users (if subscribed)
-            if userId in self.connection.subscribedTo:
-                self.connection.subscribedTo.remove(userId)
+            if userId in connection.subscribedTo:
+                connection.subscribedTo.remove(userId)
 
             owner = await Persona.objects.get_persona_by_id(userId)
 
@@ -89,23 +88,21 @@ class PresenceService(Service):
 
         return response
 
-    async def __handle_set_presence_status(self, data):
+    async def __handle_set_presence_status(self, connection, data):
         status = data.Get("status")
 
         # Encode the status as a JSON string, base64 encoded, and store it in the cache
         statusJSON = json.dumps(status)
         statusEncoded = b64encode(statusJSON.encode("utf-8"))
 
-        cache.set(f"presence:{self.connection.loggedPersona.id}", statusEncoded)
+        await session_store.set_presence(connection.loggedPersona.id, statusEncoded)
 
-        owner = await Persona.objects.get_persona_by_id(
-            self.connection.loggedPersona.id
-        )
+        owner = await Persona.objects.get_persona_by_id(connection.loggedPersona.id)
 
-        for userId in self.connection.subscribedTo:
+        for userId in connection.subscribedTo:
             # I'm assuming here that if client A is subscribed to client B, client B is also subscribed to client A
             # (Because the clients should be friends with each other)
-            await self.connection.start_remote_transaction(
+            await connection.start_remote_transaction(
                 userId,
                 "pres",
                 TXN.AsyncPresenceStatusEvent.value,
@@ -114,7 +111,7 @@ class PresenceService(Service):
 
         return Packet()
 
-    async def __create_async_presence_status_event(self, data):
+    async def __create_async_presence_status_event(self, connection, data):
         isInitial = data.get("initial", False)
         owner = data.get("owner")
 
@@ -126,8 +123,8 @@ class PresenceService(Service):
         response.Set("owner", owner)
 
         if (
-            owner["id"] == self.connection.loggedPersona.id
-            or owner["id"] in self.connection.subscribedTo
+            owner["id"] == connection.loggedPersona.id
+            or owner["id"] in connection.subscribedTo
         ):
             status = data.get("status")
 
@@ -1,9 +1,12 @@
 from enum import Enum
 
+from django.conf import settings
+
 from BFBC2_MasterServer.packet import Packet
 from BFBC2_MasterServer.service import Service
 from Plasma.enumerators.StatUpdateType import StatUpdateType
 from Plasma.models import Ranking
+from Plasma.stat_buffer import stat_buffer
 
 
 class TXN(Enum):
@@ -20,8 +23,8 @@ class TXN(Enum):
 
 
 class RankingService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.resolver_map[TXN.UpdateStats] = self.__handle_update_stats
         self.resolver_map[TXN.GetStats] = self.__handle_get_stats
@@ -29,7 +32,7 @@ class RankingService(Service):
         self.resolver_map[TXN.GetRankedStats] = self.__handle_get_ranked_stats
         self.resolver_map[
             TXN.GetRankedStatsForOwners
-        ] = self.__handle_get_stats_for_owners
+        ] = self.__handle_get_ranked_stats_for_owners
         self.resolver_map[TXN.GetTopN] = self.__handle_get_top_n
         self.resolver_map[TXN.GetTopNAndMe] = self.__handle_get_top_n_and_me
         self.resolver_map[TXN.GetTopNAndStats] = self.__handle_get_top_n_and_stats
@@ -41,9 +44,11 @@ class RankingService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __handle_update_stats(self, data):
+    async def __handle_update_stats(self, connection, data):
         """Update stats"""
 
+        updates = []
+
         for userData in data.Get("u"):
             ownerId = userData["o"]
             stats = userData["s"]
@@ -58,45 +63,53 @@ class RankingService(Service):
                 statKey = statData["k"]
                 statValue = float(statData["v"])
 
-                if updateType == StatUpdateType.RelativeValue:
-                    oldValue = await Ranking.objects.get_stat_by_id(ownerId, statKey)
-                    statValue = oldValue + statValue
-
-                await Ranking.objects.update_stat(ownerId, statKey, statValue)
+                updates.append(
+                    (
+                        ownerId,
+                        statKey,
+                        statValue,
+                        updateType == StatUpdateType.RelativeValue,
+                    )
+                )
+
+        if settings.STATS_WRITE_BEHIND:
+            stat_buffer.add(updates)
+        else:
+            # All stats from the packet are written at once
+            await Ranking.objects.update_stats(updates)
 
         return Packet()
 
-    async def __handle_get_stats(self, data):
+    async def __handle_get_stats(self, connection, data):
         """Get stats for a current persona"""
         keys = data.Get("keys")
+        personaId = connection.loggedPersona.id
 
-        stats = []
-
-        for key in keys:
-            value = await Ranking.objects.get_stat(self.connection.loggedPersona, key)
-            stat = {"key": key, "value": value}
-            stats.append(stat)
+        values = await stat_buffer.get_stats([personaId], keys)
+        stats = [{"key": key, "value": values[(personaId, key)]} for key in keys]
 
         response = Packet()
         response.Set("stats", stats)
 
         return response
 
-    async def __handle_get_stats_for_owners(self, data):
+    async def __handle_get_stats_for_owners(self, connection, data):
         """Get stats for a list of personas"""
         owners = data.Get("owners")
         keys = data.Get("keys")
 
+        # Stats of all owners are read at once
+        values = await stat_buffer.get_stats(
+            [owner["ownerId"] for owner in owners], keys
+        )
+
         stats = []
 
         for owner in owners:
             ownerId = owner["ownerId"]
-            ownerStats = []
-
-            for key in keys:
-                value = await Ranking.objects.get_stat_by_id(ownerId, key)
-                stat = {"key": key, "value": value}
-                ownerStats.append(stat)
+            ownerStats = [
+                {"key": key, "value": values[(int(ownerId), key)]} for key in keys
+            ]
 
             stats.append(
                 {
@@ -111,7 +124,7 @@ class RankingService(Service):
 
         return response
 
-    async def __handle_get_ranked_stats(self, data):
+    async def __handle_get_ranked_stats(self, connection, data):
         """Get ranked stats for a current persona"""
 
         keys = data.Get("keys")
@@ -120,7 +133,7 @@ class RankingService(Service):
 
         for key in keys:
             value, rank = await Ranking.objects.get_ranked_stat(
-                self.connection.loggedPersona, key
+                connection.loggedPersona, key
             )
 
             stat = {"key": key, "rank": rank, "value": value}
@@ -131,7 +144,7 @@ class RankingService(Service):
 
         return response
 
-    async def __handle_get_stats_for_owners(self, data):
+    async def __handle_get_ranked_stats_for_owners(self, connection, data):
         """Get ranked stats for a list of personas"""
 
         owners = data.Get("owners")
@@ -161,7 +174,7 @@ class RankingService(Service):
         response.Set("rankedStats", stats)
         return response
 
-    async def __handle_get_top_n(self, data):
+    async def __handle_get_top_n(self, connection, data):
         """Leaderboards (without current player?)"""
 
         key = data.Get("key")
@@ -169,7 +182,7 @@ class RankingService(Service):
         maxRank = data.Get("maxRank")
 
         leaderboardUsers = await Ranking.objects.get_leaderboard_users(
-            key, minRank, maxRank, self.connection.loggedPersona
+            key, minRank, maxRank, connection.loggedPersona
         )
 
         response = Packet()
@@ -177,7 +190,7 @@ class RankingService(Service):
 
         return response
 
-    async def __handle_get_top_n_and_me(self, data):
+    async def __handle_get_top_n_and_me(self, connection, data):
         """Leaderboards (with current player?)"""
 
         key = data.Get("key")
@@ -193,7 +206,7 @@ class RankingService(Service):
 
         return response
 
-    async def __handle_get_top_n_and_stats(self, data):
+    async def __handle_get_top_n_and_stats(self, connection, data):
         """Leaderboards and stats"""
 
         key = data.Get("key")
@@ -205,19 +218,21 @@ class RankingService(Service):
             key, minRank, maxRank
         )
 
-        for i, user in enumerate(leaderboardUsers):
-            leaderboardUsers[i]["addStats"] = []
+        values = await stat_buffer.get_stats(
+            [user["owner"] for user in leaderboardUsers], keys
+        )
 
-            for key in keys:
-                value = await Ranking.objects.get_stat_by_id(user["owner"], key)
-                leaderboardUsers[i]["addStats"] = {"key": key, "value": value}
+        for user in leaderboardUsers:
+            user["addStats"] = [
+                {"key": key, "value": values[(user["owner"], key)]} for key in keys
+            ]
 
         response = Packet()
         response.Set("stats", leaderboardUsers)
 
         return response
 
-    async def __handle_get_date_range(self, data):
+    async def __handle_get_date_range(self, connection, data):
         # Not sure what this does, is it even called by game?
 
         # Input:
@@ -18,8 +18,8 @@ class TXN(Enum):
 
 
 class RecordService(Service):
-    def __init__(self, connection) -> None:
-        super().__init__(connection)
+    def __init__(self) -> None:
+        super().__init__()
 
         self.resolver_map[TXN.AddRecord] = self.__handle_add_record
         self.resolver_map[TXN.GetRecord] = self.__handle_get_record
@@ -34,7 +34,7 @@ class RecordService(Service):
     def _get_creator(self, txn):
         return self.creator_map[TXN(txn)]
 
-    async def __handle_add_record(self, data):
+    async def __handle_add_record(self, connection, data):
         """Add a record (clan, dogtags) to the database"""
 
         recordName = data.Get("recordName")
@@ -50,12 +50,12 @@ class RecordService(Service):
             value = valueData["value"]
 
             await Record.objects.add_records(
-                self.connection.loggedPersona, recordName, key, value
+                connection.loggedPersona, recordName, key, value
             )
 
         return Packet()
 
-    async def __handle_get_record(self, data):
+    async def __handle_get_record(self, connection, data):
         """Get a record (clan, dogtags) from the database"""
 
         recordName = data.Get("recordName")
@@ -68,9 +68,7 @@ class RecordService(Service):
         response = Packet()
 
         values = []
-        records = await Record.objects.get_records(
-            self.connection.loggedPersona, recordName
-        )
+        records = await Record.objects.get_records(connection.loggedPersona, recordName)
 
         if not records:
             return TransactionError(TransactionError.Code.RECORD_NOT_FOUND)
@@ -82,7 +80,7 @@ class RecordService(Service):
 
         return response
 
-    async def __handle_update_record(self, data):
+    async def __handle_update_record(self, connection, data):
         """Update a record (clan, dogtags) in the database"""
 
         recordName = data.Get("recordName")
@@ -98,12 +96,12 @@ class RecordService(Service):
             value = valueData["value"]
 
             await Record.objects.update_records(
-                self.connection.loggedPersona, recordName, key, value
+                connection.loggedPersona, recordName, key, value
             )
 
         return Packet()
 
-    async def __handle_add_record_as_map(self, data):
+    async def __handle_add_record_as_map(self, connection, data):
         """Add a record (clan, dogtags) to the database (in map format)"""
 
         recordName = data.Get("recordName")
@@ -124,12 +122,12 @@ class RecordService(Service):
                 value = data.Get(key)
 
                 await Record.objects.add_records(
-                    self.connection.loggedPersona, recordName, key_value, value
+                    connection.loggedPersona, recordName, key_value, value
                 )
 
         return Packet()
 
-    async def __handle_get_record_as_map(self, data):
+    async def __handle_get_record_as_map(self, connection, data):
         """Get a record (clan, dogtags) from the database (in map format)"""
 
         recordName = data.Get("recordName")
@@ -139,9 +137,7 @@ class RecordService(Service):
 
         recordName = RecordName(recordName)
 
-        records = await Record.objects.get_records(
-            self.connection.loggedPersona, recordName
-        )
+        records = await Record.objects.get_records(connection.loggedPersona, recordName)
 
         if not records:
             return TransactionError(TransactionError.Code.RECORD_NOT_FOUND)
@@ -161,7 +157,7 @@ class RecordService(Service):
 
         return response
 
-    async def __handle_update_record_as_map(self, data):
+    async def __handle_update_record_as_map(self, connection, data):
         """Update a record (clan, dogtags) in the database (in map format)"""
 
         recordName = data.Get("recordName")
@@ -182,7 +178,7 @@ class RecordService(Service):
                 value = data.Get(key)
 
                 await Record.objects.update_records(
-                    self.connection.loggedPersona, recordName, key_value, value
+                    connection.loggedPersona, recordName, key_value, value
                 )
 
         return Packet()
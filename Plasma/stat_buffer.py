@@ -0,0 +1,186 @@
+import asyncio
+import atexit
+import logging
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from BFBC2_MasterServer.metrics import Counter, Gauge, Histogram
+from BFBC2_MasterServer.timing_wheel import timing_wheel
+from Plasma.managers import merge_stat_updates
+
+logger = logging.getLogger("stat_buffer")
+
+pending_stats = Gauge(
+    "plasma_stat_buffer_pending", "Stats waiting in write-behind buffer"
+)
+flush_duration = Histogram(
+    "plasma_stat_buffer_flush_duration_seconds",
+    "Time taken to write buffered stats to database",
+)
+flushed_stats = Counter(
+    "plasma_stat_buffer_flushed_total", "Stats written from write-behind buffer"
+)
+flush_failures = Counter(
+    "plasma_stat_buffer_flush_failures_total",
+    "Failed flushes of write-behind buffer (stats are kept for the next one)",
+)
+
+
+class StatBuffer:
+    """Per-process write-behind buffer of stat updates, merged per (persona, key) and written in periodic batches
+
+    Reads wait for running flush and apply pending updates on top of stored values, so written stats are seen at once.
+    Updates are written at most interval seconds after they were made (or once max_pending stats are buffered),
+    this is also how much can be lost when the process is killed (buffer is flushed on normal exit)
+    """
+
+    def __init__(self, interval, max_pending):
+        self.interval = interval
+        self.max_pending = max_pending
+
+        # (persona id, key) -> (value, relative)
+        self.__pending = {}
+        self.__timer = None
+        self.__flush_task = None
+        self.__exit_registered = False
+
+        # Reads and flushes exclude each other (stats being written could be counted twice or not at all)
+        self.__condition = asyncio.Condition()
+        self.__readers = 0
+        self.__flushing = False
+
+    def add(self, updates):
+        """Buffer stat updates, updates are (persona id, key, value, relative) tuples in order they were sent"""
+
+        merge_stat_updates(self.__pending, updates)
+        pending_stats.set(len(self.__pending))
+
+        if not self.__exit_registered:
+            atexit.register(self.flush_sync)
+            self.__exit_registered = True
+
+        if len(self.__pending) >= self.max_pending:
+            if self.__flush_task is None or self.__flush_task.done():
+                self.__flush_task = asyncio.get_running_loop().create_task(self.flush())
+        elif self.__timer is None:
+            self.__timer = timing_wheel.schedule(self.interval, self.flush)
+
+    async def get_stats(self, persona_ids, keys):
+        """Get stat values including buffered updates, returns dict of (persona id, key) -> value"""
+
+        from Plasma.models import Ranking
+
+        async with self.__reading():
+            stats = await Ranking.objects.get_stats_by_ids(persona_ids, keys)
+
+            if self.__pending:
+                for stat, value in stats.items():
+                    update = self.__pending.get(stat)
+
+                    if update is not None:
+                        update_value, relative = update
+                        stats[stat] = value + update_value if relative else update_value
+
+            return stats
+
+    async def flush(self):
+        """Write all buffered updates to database"""
+
+        from Plasma.models import Ranking
+
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+        async with self.__condition:
+            await self.__condition.wait_for(lambda: not self.__flushing)
+
+            if not self.__pending:
+                return
+
+            # New reads wait from now on, so continuous reads can't hold off the flush
+            self.__flushing = True
+            await self.__condition.wait_for(lambda: self.__readers == 0)
+
+            updates = self.__take()
+
+        start = perf_counter()
+
+        try:
+            stats = await sync_to_async(Ranking.objects.upsert_stats)(updates)
+        except Exception:
+            logger.exception(f"Failed to write {len(updates)} buffered stats")
+            flush_failures.inc()
+
+            # Updates made in the meantime have to be applied after the failed ones
+            self.__pending = merge_stat_updates(
+                merge_stat_updates({}, updates), self.__take()
+            )
+        else:
+            flushed_stats.inc(amount=len(updates))
+
+            try:
+                await Ranking.objects.index_stats(stats)
+            except Exception:
+                # Stats are already stored, leaderboards are fixed by the next rebuild
+                logger.exception("Failed to update leaderboards with buffered stats")
+        finally:
+            flush_duration.observe(perf_counter() - start)
+
+            async with self.__condition:
+                self.__flushing = False
+                self.__condition.notify_all()
+
+            pending_stats.set(len(self.__pending))
+
+            if self.__pending and self.__timer is None:
+                self.__timer = timing_wheel.schedule(self.interval, self.flush)
+
+    def flush_sync(self):
+        """Write buffered updates from sync code, used on exit (when event loop isn't running anymore)"""
+
+        from Plasma.models import Ranking
+
+        if not self.__pending:
+            return
+
+        updates = self.__take()
+
+        try:
+            stats = Ranking.objects.upsert_stats(updates)
+        except Exception:
+            logger.exception(f"Failed to write {len(updates)} buffered stats on exit")
+            return
+
+        try:
+            Ranking.objects.index_stats_sync(stats)
+        except Exception:
+            logger.exception("Failed to update leaderboards with buffered stats")
+
+    @asynccontextmanager
+    async def __reading(self):
+        async with self.__condition:
+            await self.__condition.wait_for(lambda: not self.__flushing)
+            self.__readers += 1
+
+        try:
+            yield
+        finally:
+            async with self.__condition:
+                self.__readers -= 1
+                self.__condition.notify_all()
+
+    def __take(self):
+        updates = [
+            (persona_id, key, value, relative)
+            for (persona_id, key), (value, relative) in self.__pending.items()
+        ]
+        self.__pending = {}
+
+        return updates
+
+
+stat_buffer = StatBuffer(settings.STATS_FLUSH_INTERVAL, settings.STATS_BUFFER_LIMIT)
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from time import monotonic
+
+# Names which don't exist are looked up again after this many seconds (they could be created by another process)
+MISSING_TTL = 10
+# At most this many missing names are remembered (clients can ask for any name), oldest ones are dropped first
+MISSING_MAX_SIZE = 10000
+
+
+class StatKeyCache:
+    """Per-process mapping between stat key names and their ids
+
+    Keys are never renamed or removed, so cached entries can't get stale. Names which don't exist yet are
+    remembered for MISSING_TTL seconds, so reads of stats nobody has written don't query the catalog every time
+    """
+
+    def __init__(self):
+        self.__ids = {}
+        self.__names = {}
+        # Name -> when it should be looked up again, ordered by that time (TTL is the same for all names)
+        self.__missing = OrderedDict()
+
+    def get_ids(self, names, create=False):
+        """Get dict of key name -> id (from sync code), unknown keys are left out unless they should be created"""
+
+        from Plasma.models import StatKey
+
+        now = monotonic()
+        missing = {
+            name
+            for name in names
+            if name not in self.__ids and (create or self.__missing.get(name, 0) <= now)
+        }
+
+        if missing:
+            if create:
+                StatKey.objects.bulk_create(
+                    [StatKey(name=name) for name in missing], ignore_conflicts=True
+                )
+
+            self.__add(StatKey.objects.filter(name__in=missing))
+
+            self.__remember_missing(
+                [name for name in missing if name not in self.__ids], now
+            )
+
+        return {name: self.__ids[name] for name in names if name in self.__ids}
+
+    def get_names(self, key_ids):
+        """Get dict of key id -> name (from sync code)"""
+
+        from Plasma.models import StatKey
+
+        missing = {key_id for key_id in key_ids if key_id not in self.__names}
+
+        if missing:
+            self.__add(StatKey.objects.filter(id__in=missing))
+
+        return {
+            key_id: self.__names[key_id] for key_id in key_ids if key_id in self.__names
+        }
+
+    def __remember_missing(self, names, now):
+        for name in names:
+            self.__missing[name] = now + MISSING_TTL
+            self.__missing.move_to_end(name)
+
+        while self.__missing and (
+            len(self.__missing) > MISSING_MAX_SIZE
+            or next(iter(self.__missing.values())) <= now
+        ):
+            self.__missing.popitem(last=False)
+
+    def __add(self, stat_keys):
+        for key_id, name in stat_keys.values_list("id", "name"):
+            self.__ids[name] = key_id
+            self.__names[key_id] = name
+            self.__missing.pop(name, None)
+
+
+stat_keys = StatKeyCache()
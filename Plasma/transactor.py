@@ -1,9 +1,17 @@
-import gc
-from base64 import b64decode, b64encode
 from enum import Enum
 
-from BFBC2_MasterServer.packet import HEADER_LENGTH, Packet
+from django.conf import settings
+
+from BFBC2_MasterServer.packet import Packet
+from Plasma.chunk_assembler import ChunkAssembler
 from Plasma.error import TransactionError, TransactionException, TransactionSkip
+from Plasma.fragmenter import (
+    compile_fragments,
+    fragmented_responses,
+    sent_fragment_bytes,
+    sent_fragments,
+)
+from Plasma.pipeline import TransactionPipeline
 from Plasma.services.account import AccountService
 from Plasma.services.account import TXN as AccountTXN
 from Plasma.services.association import AssociationService
@@ -16,7 +24,9 @@ from Plasma.services.playnow import PlayNowService
 from Plasma.services.playnow import TXN as PlayNowTXN
 from Plasma.services.presence import PresenceService
 from Plasma.services.presence import TXN as PresenceTXN
+from Plasma.services.ranking import TXN as RankingTXN
 from Plasma.services.ranking import RankingService
+from Plasma.services.record import TXN as RecordTXN
 from Plasma.services.record import RecordService
 
 
@@ -39,11 +49,33 @@ class TransactionKind(Enum):
     ChunkedResponse = 0xB0000000
 
 
+# Services don't keep any per-connection state (connection is passed to handlers), so they are created once per process
+services = {
+    TransactionService.ConnectService: ConnectService(),
+    TransactionService.AccountService: AccountService(),
+    TransactionService.AssociationService: AssociationService(),
+    TransactionService.ExtensibleMessageService: ExtensibleMessageService(),
+    TransactionService.PlayNowService: PlayNowService(),
+    TransactionService.PresenceService: PresenceService(),
+    TransactionService.RankingService: RankingService(),
+    TransactionService.RecordService: RecordService(),
+}
+
+# (service, TXN) -> (service, resolver), so routing a transaction is a single lookup
+dispatch_table = {
+    (service_type.value, txn): (service, resolver)
+    for service_type, service in services.items()
+    for txn, resolver in service.get_resolvers().items()
+}
+
+# Plain dicts are much cheaper than Enum lookups by value
+services_by_code = {service.value: service for service in TransactionService}
+kinds_by_code = {kind.value: kind for kind in TransactionKind}
+
+
 class Transactor:
-    incoming_queue = []
     tid = 0  # Transaction ID
 
-    services = {}
     allowed_unscheduled_transactions = [
         ConnectTXN.MemCheck.value,
         ConnectTXN.Ping.value,
@@ -63,50 +95,71 @@ class Transactor:
         AccountTXN.NuGetTos.value,
         AccountTXN.NuEntitleGame.value,
     ]
+    pipelined_transactions = [
+        # Read-only transactions which don't depend on each other (processed concurrently if pipelining is enabled)
+        (TransactionService.RankingService, RankingTXN.GetStats.value),
+        (TransactionService.RankingService, RankingTXN.GetStatsForOwners.value),
+        (TransactionService.RankingService, RankingTXN.GetRankedStats.value),
+        (TransactionService.RankingService, RankingTXN.GetRankedStatsForOwners.value),
+        (TransactionService.RankingService, RankingTXN.GetTopN.value),
+        (TransactionService.RankingService, RankingTXN.GetTopNAndMe.value),
+        (TransactionService.RankingService, RankingTXN.GetTopNAndStats.value),
+        (TransactionService.RankingService, RankingTXN.GetDateRange.value),
+        (TransactionService.RecordService, RecordTXN.GetRecord.value),
+        (TransactionService.RecordService, RecordTXN.GetRecordAsMap.value),
+        (TransactionService.AssociationService, AssocationTXN.GetAssociations.value),
+        (
+            TransactionService.AssociationService,
+            AssocationTXN.GetAssociationCount.value,
+        ),
+    ]
+    unordered_transactions = [
+        # Unscheduled responses from client which never send anything back (don't have to wait for pipelined ones)
+        ConnectTXN.Ping.value,
+        ConnectTXN.MemCheck.value,
+    ]
 
     def __init__(self, connection):
         self.connection = connection
+        self.chunk_assembler = ChunkAssembler()
+        self.pipeline = None
 
-        # Init services
-        self.services[TransactionService.ConnectService] = ConnectService(connection)
-        self.services[TransactionService.AccountService] = AccountService(connection)
-        self.services[TransactionService.AssociationService] = AssociationService(
-            connection
-        )
-        self.services[
-            TransactionService.ExtensibleMessageService
-        ] = ExtensibleMessageService(connection)
-        self.services[TransactionService.PlayNowService] = PlayNowService(connection)
-        self.services[TransactionService.PresenceService] = PresenceService(connection)
-        self.services[TransactionService.RankingService] = RankingService(connection)
-        self.services[TransactionService.RecordService] = RecordService(connection)
+        if settings.PLASMA_PIPELINING:
+            self.pipeline = TransactionPipeline(settings.PLASMA_PIPELINE_LIMIT)
+
+    def close(self):
+        """Stop transactions in progress (connection was closed)"""
+
+        if self.pipeline is not None:
+            self.pipeline.cancel()
 
     async def get_response(self, service, message):
         """Get response from a transaction"""
 
-        if not self.connection.loggedUser and not self.connection.loggedUserKey:
-            # User is not logged in, check if the transaction is allowed without auth
+        txn = message.Get("TXN")
 
-            if (
-                service == TransactionService.ConnectService
-                or message.Get("TXN") in self.allowed_transactions_without_auth
-            ):
-                # Transaction is allowed without auth
-                transaction_response = await self.services[service].handle(message)
-            else:
-                # Transaction is not allowed without auth
-                self.connection.logger.error(
-                    f"Transaction {message.Get('TXN')} not allowed without auth"
-                )
+        if (
+            not self.connection.loggedUser
+            and not self.connection.loggedUserKey
+            and service != TransactionService.ConnectService
+            and txn not in self.allowed_transactions_without_auth
+        ):
+            # User is not logged in, and transaction is not allowed without auth
+            self.connection.logger.error(f"Transaction {txn} not allowed without auth")
 
-                transaction_response = TransactionError(
-                    TransactionError.Code.SESSION_NOT_AUTHORIZED
-                )
-        else:
-            # User is logged in
-            transaction_response = await self.services[service].handle(message)
+            return TransactionError(TransactionError.Code.SESSION_NOT_AUTHORIZED)
+
+        handler = dispatch_table.get((service.value, txn))
 
-        return transaction_response
+        if handler is None:
+            self.connection.logger.error(
+                f"Invalid transaction {txn} for service {service.value}"
+            )
+
+            return TransactionError(TransactionError.Code.SYSTEM_ERROR)
+
+        service_handler, resolver = handler
+        return await service_handler.handle(self.connection, message, resolver)
 
     async def start(
         self, service: TransactionService | str, txn: Enum | str, data: dict
@@ -123,7 +176,9 @@ class Transactor:
 
         # Unscheduled transactions are always "SimpleResponse" kind, and have no transaction ID
 
-        packet_to_send = await self.services[service].start_transaction(txnVal, data)
+        packet_to_send = await services[service].start_transaction(
+            self.connection, txnVal, data
+        )
 
         if isinstance(packet_to_send, TransactionError):
             packet = Packet()
@@ -145,27 +200,25 @@ class Transactor:
         # Verify that the service is valid
         error = False
 
-        try:
-            service = TransactionService(message.service)
-        except ValueError:
+        service = services_by_code.get(message.service)
+
+        if service is None:
             self.connection.logger.error(
                 f"Invalid transaction service {message.service}"
             )
 
-            service = None
             error = True
 
         # Verify that the transaction kind is valid
         transaction_kind_int = message.kind & 0xFF000000
 
-        try:
-            transaction_kind = TransactionKind(transaction_kind_int)
-        except ValueError:
+        transaction_kind = kinds_by_code.get(transaction_kind_int)
+
+        if transaction_kind is None:
             self.connection.logger.error(
                 f"Invalid transaction type {hex(transaction_kind_int)}"
             )
 
-            transaction_kind = None
             error = True
 
         # Verify that the transaction id is valid
@@ -207,6 +260,30 @@ class Transactor:
             verifyError,
         ) = await self.verify_transaction(message)
 
+        if self.pipeline is not None:
+            if (
+                not verifyError
+                and self.connection.initialized
+                and transaction_kind == TransactionKind.Simple
+                and (service, message.Get("TXN")) in self.pipelined_transactions
+            ):
+                tid = self.tid
+                self.tid += 1  # Next transaction can be verified (and started) before this one is finished
+
+                await self.pipeline.submit(
+                    lambda: self.get_response(service, message),
+                    lambda response: self.__send_response(
+                        service, message, response, tid
+                    ),
+                )
+                return
+            elif (
+                transaction_kind != TransactionKind.SimpleResponse
+                or message.Get("TXN") not in self.unordered_transactions
+            ):
+                # Responses are sent in order, so wait for all transactions started before this one
+                await self.pipeline.drain()
+
         if verifyError:
             transaction_response = TransactionError(TransactionError.Code.SYSTEM_ERROR)
         else:
@@ -226,38 +303,40 @@ class Transactor:
             ):
                 transaction_response = await self.get_response(service, message)
             elif transaction_kind == TransactionKind.Chunked:
-                self.incoming_queue.append(message)
-
-                received_length = 0
-
-                for incoming_message in self.incoming_queue:
-                    received_length += len(incoming_message.Get("data"))
-
-                if received_length == message.Get("size"):
-                    # We have received all chunks, process the transaction
-                    encoded_data = ""
-
-                    for incoming_message in self.incoming_queue:
-                        encoded_data += incoming_message.Get("data")
-
-                    self.incoming_queue.clear()
-
-                    decoded_data = b64decode(encoded_data)
+                try:
+                    decoded_data = self.chunk_assembler.feed(message)
+                except TransactionException as e:
+                    self.connection.logger.error(f"Invalid chunked transaction: {e}")
+                    transaction_response = TransactionError(
+                        TransactionError.Code.PARAMETERS_ERROR
+                    )
+                else:
+                    if decoded_data is None:
+                        # We haven't received all chunks yet
+                        return
 
+                    # We have received all chunks, process the transaction (parsed straight from assembled buffer)
                     message = Packet(
                         service=service.value, kind=message.kind, data=decoded_data
                     )
 
                     transaction_response = await self.get_response(service, message)
-                else:
-                    # We haven't received all chunks yet
-                    return
             else:
                 self.connection.logger.error(
                     f"Invalid transaction kind {hex(transaction_kind_int)}"
                 )
                 return
 
+        await self.__send_response(service, message, transaction_response, self.tid)
+
+        if transaction_response is not None and not isinstance(
+            transaction_response, TransactionSkip
+        ):
+            self.tid += 1
+
+    async def __send_response(self, service, message, transaction_response, tid):
+        """Send response of transaction started by client"""
+
         if transaction_response is None:
             self.connection.logger.error("Transaction service didn't return a response")
             return
@@ -273,17 +352,21 @@ class Transactor:
 
             if not self.connection.initialized:
                 packet.kind = TransactionKind.InitialError.value
-                packet.Set("TID", self.tid)
+                packet.Set("TID", tid)
 
             packet.Set("errorCode", transaction_response.errorCode)
             packet.Set("localizedMessage", transaction_response.localizedMessage)
             packet.Set("errorContainer", transaction_response.errorContainer)
 
-            await self.connection.send_packet(packet, self.tid)
+            await self.connection.send_packet(packet, tid)
         else:
             transaction_response.service = service.value
             transaction_response.kind = TransactionKind.SimpleResponse.value
-            transaction_response.Set("TXN", message.Get("TXN"))
+
+            if not transaction_response.precompiled:
+                # Cached responses already contain TXN, only header is compiled for them
+                transaction_response.Set("TXN", message.Get("TXN"))
+
             message_bytes = transaction_response.compile()
 
             if (
@@ -291,30 +374,22 @@ class Transactor:
                 and self.connection.fragmentSize != -1
             ):
                 # Packet is too big, we need to base64 encode it and split it into fragments
-                message_bytes = message_bytes[HEADER_LENGTH:]  # Get rid of the header
-
-                decoded_message_size = len(message_bytes)
-                message_bytes = b64encode(message_bytes).decode()
-                encoded_message_size = len(message_bytes)
+                kind = TransactionKind.ChunkedResponse.value | tid
+                fragment_count = 0
 
-                fragments = [
-                    message_bytes[i : i + self.connection.fragmentSize]
-                    for i in range(0, len(message_bytes), self.connection.fragmentSize)
-                ]
+                for fragment in compile_fragments(
+                    service.value, kind, message_bytes, self.connection.fragmentSize
+                ):
+                    await self.connection.send_compiled(service.value, fragment)
 
-                for fragment in fragments:
-                    fragment_packet = Packet()
-                    fragment_packet.service = service.value
-                    fragment_packet.kind = TransactionKind.ChunkedResponse.value
+                    fragment_count += 1
+                    sent_fragments.inc(service.value)
+                    sent_fragment_bytes.inc(service.value, amount=len(fragment))
 
-                    fragment_packet.Set("data", fragment)
-                    fragment_packet.Set("decodedSize", decoded_message_size)
-                    fragment_packet.Set("size", encoded_message_size)
+                fragmented_responses.inc(service.value)
 
-                    await self.connection.send_packet(fragment_packet, self.tid)
-
-                    gc.collect()
+                self.connection.logger.debug(
+                    f"-> {transaction_response} (sent in {fragment_count} fragments)"
+                )
             else:
-                await self.connection.send_packet(transaction_response, self.tid)
-
-        self.tid += 1
+                await self.connection.send_packet(transaction_response, tid)
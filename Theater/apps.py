@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class TheaterConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Theater"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from Theater.game_data_cache import game_data_cache
+        from Theater.models import Game
+
+        # Encoded game data is dropped whenever game changes (every UGAM/UGDE key is saved), so GLST never lists old data
+        post_save.connect(
+            lambda instance, **kwargs: game_data_cache.invalidate(instance.id),
+            sender=Game,
+            weak=False,
+        )
+        post_delete.connect(
+            lambda instance, **kwargs: game_data_cache.invalidate(instance.id),
+            sender=Game,
+            weak=False,
+        )
@@ -1,10 +1,13 @@
+import asyncio
+
 from channels.layers import get_channel_layer
-from django.core.cache import cache
 from packaging import version
 
 from BFBC2_MasterServer.consumer import BFBC2Consumer
+from BFBC2_MasterServer.session_store import session_store
 from Plasma.enumerators.ClientLocale import ClientLocale
 from Plasma.enumerators.ClientPlatform import ClientPlatform
+from Theater.game_session import GameSession
 from Theater.transactor import Transactor
 
 
@@ -36,13 +39,12 @@ class TheaterConsumer(BFBC2Consumer):
         if self.game:
             from Theater.models import Game
 
-            cache.delete(f"gameSession:{self.game.id}")
-            cache.delete(f"queue:{self.game.id}")
-            cache.delete(f"nextServerPlayerID:{self.game.id}")
+            await GameSession(self.game.id).delete()
 
             await Game.objects.delete_game(self.game)
 
-        cache.delete(f"theaterSession:{self.lkey}")
+        if self.lkey:
+            await session_store.delete_theater_session(self.lkey)
 
     async def receive(self, text_data=None, bytes_data=None):
         message = await super().receive(text_data, bytes_data)
@@ -99,7 +101,7 @@ class TheaterConsumer(BFBC2Consumer):
         await self.transactor.start(message["service"], message["data"])
 
     async def send_remote_message(self, target, serviceStr, data):
-        active_session = cache.get(f"theaterSession:{target}")
+        active_session = await session_store.get_theater_session(target)
         channel_layer = get_channel_layer()
 
         if active_session:
@@ -113,3 +115,28 @@ class TheaterConsumer(BFBC2Consumer):
                     },
                 },
             )
+
+    async def send_remote_messages(self, serviceStr, messages):
+        """Send message to multiple targets at once, messages are (target, data) pairs"""
+
+        sessions = await session_store.get_theater_sessions(
+            [target for target, _ in messages]
+        )
+        channel_layer = get_channel_layer()
+
+        await asyncio.gather(
+            *(
+                channel_layer.send(
+                    active_session,
+                    {
+                        "type": "external.send",
+                        "message": {
+                            "service": serviceStr,
+                            "data": data,
+                        },
+                    },
+                )
+                for active_session, (_, data) in zip(sessions, messages)
+                if active_session
+            )
+        )
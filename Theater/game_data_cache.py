@@ -0,0 +1,69 @@
+from BFBC2_MasterServer.metrics import Counter
+from BFBC2_MasterServer.packet import HEADER_LENGTH, Packet
+
+cache_hits = Counter(
+    "theater_game_data_cache_hits_total",
+    "Games listed (GLST) with already encoded game data",
+)
+cache_misses = Counter(
+    "theater_game_data_cache_misses_total",
+    "Games whose game data had to be read from database and encoded for listing (GLST)",
+)
+
+
+class GameDataCache:
+    """Per-process cache of encoded GDAT bodies (listing of a game sent by GLST), keyed by game id
+
+    Body doesn't contain TID, so one entry is shared by all clients. Entry is dropped whenever the game is saved
+    (created or updated by its server) or deleted, and encoded again when the game is listed next time
+    """
+
+    def __init__(self):
+        self.__bodies = {}
+
+    def get_many(self, gids):
+        """Get cached bodies of games (games which aren't cached are left out)"""
+
+        bodies = {}
+
+        for gid in gids:
+            body = self.__bodies.get(gid)
+
+            if body is not None:
+                bodies[gid] = body
+
+        cache_hits.inc(amount=len(bodies))
+        cache_misses.inc(amount=len(gids) - len(bodies))
+
+        return bodies
+
+    def set(self, gid, game_data):
+        """Encode and cache game data, returns encoded body"""
+
+        packet = Packet(service="GDAT", kind=0)
+
+        for key, value in game_data.items():
+            if value is None:
+                continue
+
+            packet.Set(key, value)
+
+        # Only header is compiled for every response, TID (and NULL terminator) is appended after the last line
+        body = packet.compile()[HEADER_LENGTH:-1] + b"\n"
+        self.__bodies[gid] = body
+
+        return body
+
+    def invalidate(self, gid):
+        self.__bodies.pop(gid, None)
+
+    def clear(self):
+        self.__bodies.clear()
+
+
+def game_data_packet(body, tid):
+    """Create GDAT response from cached body"""
+    return Packet(service="GDAT", compiled_data=body + f"TID={tid}\x00".encode())
+
+
+game_data_cache = GameDataCache()
@@ -0,0 +1,104 @@
+import asyncio
+from time import monotonic
+
+from django.conf import settings
+
+from BFBC2_MasterServer.metrics import Counter
+
+cache_hits = Counter(
+    "theater_game_list_cache_hits_total",
+    "Game lists (GLST) served from cached result",
+)
+cache_misses = Counter(
+    "theater_game_list_cache_misses_total",
+    "Game lists (GLST) which had to be queried",
+)
+cache_coalesced = Counter(
+    "theater_game_list_cache_coalesced_total",
+    "Game lists (GLST) which waited for the same query started by another client",
+)
+
+
+class GameListCache:
+    """Per-process cache of game list results (GLST), keyed by normalized filters, kept for ttl seconds
+
+    Concurrent requests with the same filters share a single query, it keeps running even if the client
+    which started it disconnects. Failed queries aren't cached, everyone waiting for them gets the error
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.__results = {}  # Key -> (expires at, result)
+        self.__loading = {}  # Key -> task running the query
+
+    async def get(self, key, loader):
+        """Get result for key, loader (coroutine function) is called when there is no fresh result or query running"""
+
+        entry = self.__results.get(key)
+
+        if entry is not None and entry[0] > monotonic():
+            cache_hits.inc()
+            return entry[1]
+
+        task = self.__loading.get(key)
+
+        if task is None:
+            cache_misses.inc()
+            task = asyncio.create_task(self.__load(key, loader))
+            self.__loading[key] = task
+        else:
+            cache_coalesced.inc()
+
+        return await asyncio.shield(task)
+
+    async def __load(self, key, loader):
+        try:
+            result = await loader()
+        finally:
+            del self.__loading[key]
+
+        now = monotonic()
+
+        # Results of other filters are dropped once they expire, so the cache doesn't grow with every filter used
+        expired = [k for k, entry in self.__results.items() if entry[0] <= now]
+
+        for k in expired:
+            del self.__results[k]
+
+        self.__results[key] = (now + self.ttl, result)
+        return result
+
+    def clear(self):
+        self.__results.clear()
+
+
+def get_filter_key(lid, gameType, gameMod, count, gid, **filters):
+    """Normalize GLST filters, so requests which list the same games share the key (missing filter is the same as off)"""
+
+    favGame = filters.get("favGame")
+
+    if favGame:
+        # Favorite servers are matched case-insensitively and in any order
+        favGame = tuple(sorted({name.lower() for name in favGame.split(";")}))
+
+    return (
+        lid,
+        gameType,
+        gameMod,
+        count,
+        gid,
+        favGame or None,
+        bool(filters.get("notFull")),
+        filters.get("minPlayers") or 0,
+        filters.get("gamemode") or None,
+        filters.get("level") or None,
+        filters.get("region") or None,
+        bool(filters.get("public")),
+        bool(filters.get("punkbuster")),
+        bool(filters.get("password")),
+        bool(filters.get("softcore")),
+        bool(filters.get("ea")),
+    )
+
+
+game_list_cache = GameListCache(settings.GAME_LIST_CACHE_TTL)
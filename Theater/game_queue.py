@@ -0,0 +1,72 @@
+from BFBC2_MasterServer.globals import GAME_SESSION_TTL
+from BFBC2_MasterServer.session_store import session_store
+
+# Players are scored by the order they joined in, so rank of a player is the position in queue
+ENQUEUE_SCRIPT = """
+if not redis.call("ZSCORE", KEYS[1], ARGV[1]) then
+    local last = redis.call("ZRANGE", KEYS[1], -1, -1, "WITHSCORES")
+    redis.call("ZADD", KEYS[1], (tonumber(last[2]) or 0) + 1, ARGV[1])
+end
+
+-- Queue of a game which stopped sending heartbeats expires along with its session
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+
+return {redis.call("ZRANK", KEYS[1], ARGV[1]), redis.call("ZCARD", KEYS[1])}
+"""
+
+# Players behind the removed one move forward, they are returned so they can be notified
+DEQUEUE_SCRIPT = """
+local position = redis.call("ZRANK", KEYS[1], ARGV[1])
+
+if not position then
+    return false
+end
+
+redis.call("ZREM", KEYS[1], ARGV[1])
+return {position, redis.call("ZCARD", KEYS[1]), redis.call("ZRANGE", KEYS[1], position, -1)}
+"""
+
+
+class GameQueue:
+    """Players (PIDs) waiting for a free slot on full game server, stored in Redis sorted set
+
+    All operations are atomic, position lookups are O(log n)
+    """
+
+    def __init__(self, gid):
+        self.gid = gid
+        self.key = f"gameQueue:{gid}"
+
+    async def enqueue(self, pid):
+        """Add player to the end of the queue (if not queued already), returns position and queue length"""
+
+        position, length = await session_store.script(ENQUEUE_SCRIPT)(
+            keys=[self.key], args=[pid, GAME_SESSION_TTL]
+        )
+
+        return position, length
+
+    async def dequeue(self, pid):
+        """Remove player from the queue
+
+        Returns position the player had, new queue length and PIDs of players who moved forward (in order),
+        or None if player wasn't queued
+        """
+
+        result = await session_store.script(DEQUEUE_SCRIPT)(keys=[self.key], args=[pid])
+
+        if result is None:
+            return None
+
+        position, length, moved = result
+        return position, length, [int(pid) for pid in moved]
+
+    async def get_position(self, pid):
+        """Get position of player (None if not queued) and queue length"""
+
+        async with session_store.client.pipeline(transaction=True) as pipe:
+            pipe.zrank(self.key, pid)
+            pipe.zcard(self.key)
+            position, length = await pipe.execute()
+
+        return position, length
@@ -0,0 +1,98 @@
+from BFBC2_MasterServer.globals import GAME_SESSION_TTL
+from BFBC2_MasterServer.session_store import session_store
+from Theater.game_queue import GameQueue
+
+# PIDs start at 0, allocation and saving of player's login key happens at once
+ADD_PLAYER_SCRIPT = """
+local pid = redis.call("HINCRBY", KEYS[1], "nextPid", 1) - 1
+
+redis.call("HSET", KEYS[1], "player:" .. pid, ARGV[1])
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+
+return pid
+"""
+
+
+class GameSession:
+    """Redis state of hosted game, kept in a single hash (and the join queue)
+
+    Hash holds login key of the game server, PID counter and login key (and data) of every joining player
+    """
+
+    def __init__(self, gid):
+        self.gid = gid
+        self.key = f"game:{gid}"
+        self.queue = GameQueue(gid)
+
+    async def create(self, server_lkey):
+        """Start new session (state left from previous game with the same id is dropped)"""
+
+        async with session_store.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key, self.queue.key)
+            pipe.hset(self.key, "server", server_lkey)
+            pipe.expire(self.key, GAME_SESSION_TTL)
+            await pipe.execute()
+
+    async def get_server(self):
+        """Get login key of the game server"""
+        return await session_store.client.hget(self.key, "server")
+
+    async def add_player(self, lkey):
+        """Allocate PID for player joining the game"""
+
+        return await session_store.script(ADD_PLAYER_SCRIPT)(
+            keys=[self.key], args=[lkey, GAME_SESSION_TTL]
+        )
+
+    async def set_player_data(self, pid, data):
+        await session_store.client.hset(self.key, f"playerData:{pid}", data)
+
+    async def get_player(self, pid):
+        """Get login key and data (if player is queued) of player"""
+
+        return tuple(
+            await session_store.client.hmget(
+                self.key, [f"player:{pid}", f"playerData:{pid}"]
+            )
+        )
+
+    async def get_players(self, pids):
+        """Get login keys of multiple players (None for unknown ones)"""
+
+        if not pids:
+            return []
+
+        return await session_store.client.hmget(
+            self.key, [f"player:{pid}" for pid in pids]
+        )
+
+    async def remove_player(self, pid):
+        await session_store.client.hdel(self.key, f"player:{pid}", f"playerData:{pid}")
+
+    async def send_queue_positions(self, connection, lid, position, length, pids):
+        """Send updated position (QLEN) to every player who moved forward, first of them is now at position"""
+
+        lkeys = await self.get_players(pids)
+
+        messages = [
+            (
+                lkey,
+                {"QPOS": position + i, "QLEN": length, "LID": lid, "GID": self.gid},
+            )
+            for i, lkey in enumerate(lkeys)
+            if lkey is not None
+        ]
+
+        await connection.send_remote_messages("QLEN", messages)
+
+    async def refresh(self):
+        """Extend lifetime of the session (called on heartbeat from the game server)"""
+
+        async with session_store.client.pipeline(transaction=False) as pipe:
+            pipe.expire(self.key, GAME_SESSION_TTL)
+            pipe.expire(self.queue.key, GAME_SESSION_TTL)
+            await pipe.execute()
+
+    async def delete(self):
+        """Drop the whole session (including the queue) at once"""
+        await session_store.client.delete(self.key, self.queue.key)
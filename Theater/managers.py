@@ -3,7 +3,59 @@ from base64 import b64encode
 
 from asgiref.sync import sync_to_async
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+
+from Theater.game_data_cache import game_data_cache
+
+
+def get_list_data(game):
+    """Game data sent for every game listed by GLST (GDAT), owner has to be loaded along with the game"""
+
+    game_data = {
+        "LID": game.lobby_id,
+        "GID": game.id,
+        "N": game.name,
+        "AP": game.activePlayers,
+        "JP": game.joiningPlayers,
+        "QP": game.queuedPlayers,
+        "MP": game.maxPlayers,
+        "F": 0,  # Is Player Favorite
+        "NF": 0,  # Favorite Player Count
+        "HU": game.owner.id,
+        "HN": game.owner.name,
+        "I": game.addrIp,
+        "P": game.addrPort,
+        "J": game.joinMode,
+        "PL": game.platform,
+        "PW": int(game.isPasswordRequired),
+        "V": game.clientVersion,
+        "TYPE": game.gameType,
+        "B-numObservers": game.numObservers,
+        "B-maxObservers": game.maxObservers,
+        "B-version": game.serverVersion,
+        "B-U-region": game.gameRegion,
+        "B-U-level": game.gameLevel,
+        "B-U-elo": game.gameElo,
+        "B-U-Softcore": int(game.serverSoftcore),
+        "B-U-Hardcore": int(game.serverHardcore),
+        "B-U-EA": int(game.serverEA),
+        "B-U-HasPassword": int(game.serverHasPassword),
+        "B-U-public": int(game.gamePublic),
+        "B-U-QueueLength": game.queueLength,
+        "B-U-gameMod": game.gameMod,
+        "B-U-gamemode": game.gameMode,
+        "B-U-sguid": game.gameSGUID,
+        "B-U-Provider": game.providerId,
+        "B-U-Time": game.gameTime,
+        "B-U-hash": game.gameHash,
+        "B-U-Punkbuster": int(game.serverPunkbuster),
+    }
+
+    if game_data["B-U-Punkbuster"]:
+        game_data["B-U-PunkBusterVersion"] = game.punkBusterVersion
+
+    return game_data
 
 
 class LobbyManager(models.Manager):
@@ -206,115 +258,66 @@ class GameManager(models.Manager):
 
     @sync_to_async
     def get_games(self, lobby, gameType, gameMod, count, minGID, **filters):
+        # Games are paged by GID (client sends GID of the last game it got)
         filtered_games = self.filter(
-            id__gt=int(minGID), lobby=lobby, gameType=gameType, gameMod=gameMod
+            lobby=lobby, gameType=gameType, gameMod=gameMod, id__gt=int(minGID)
         )
 
+        if filters.get("favGame"):
+            # Server names are matched case-insensitively
+            favGames = {favGame.lower() for favGame in filters["favGame"].split(";")}
+            filtered_games = filtered_games.annotate(lowerName=Lower("name")).filter(
+                lowerName__in=favGames
+            )
+
+        if filters.get("notFull", False):
+            filtered_games = filtered_games.filter(activePlayers__lt=F("maxPlayers"))
+
+        if filters.get("minPlayers", 0):
+            filtered_games = filtered_games.filter(
+                activePlayers__gte=filters["minPlayers"]
+            )
+
+        if filters.get("gamemode", None):
+            filtered_games = filtered_games.filter(gameMode=filters["gamemode"])
+
+        if filters.get("level", None):
+            filtered_games = filtered_games.filter(gameLevel=filters["level"])
+
+        if filters.get("region", None):
+            filtered_games = filtered_games.filter(gameRegion=filters["region"])
+
+        if filters.get("public", False):
+            filtered_games = filtered_games.filter(gamePublic=True)
+
+        if filters.get("punkbuster", False):
+            filtered_games = filtered_games.filter(serverPunkbuster=True)
+
+        if filters.get("password", False):
+            filtered_games = filtered_games.filter(serverHasPassword=True)
+
+        if filters.get("softcore", False):
+            filtered_games = filtered_games.filter(serverSoftcore=True)
+
+        if filters.get("ea", False):
+            filtered_games = filtered_games.filter(serverEA=True)
+
+        filtered_games = filtered_games.order_by("id")
+
+        # Limit is applied after filtering, so the page is full whenever there are enough matching games
         if count > 0:
             filtered_games = filtered_games[:count]
 
-        games = []
-
-        for game in filtered_games:
-            if filters.get("favGame"):
-                serverName = game.name
-                favGames = filters.get("favGame").split(";")
-
-                isInFavGame = False
-                for favGame in favGames:
-                    if favGame.casefold() == serverName.casefold():
-                        isInFavGame = True
-                        break
-
-                if not isInFavGame:
-                    continue
-
-            if filters.get("notFull", False):
-                if game.activePlayers >= game.maxPlayers:
-                    continue
-
-            if filters.get("minPlayers", 0):
-                if game.activePlayers < filters.get("minPlayers"):
-                    continue
-
-            if filters.get("gamemode", None):
-                if game.gameMode != filters.get("gamemode"):
-                    continue
-
-            if filters.get("level", None):
-                if game.gameLevel != filters.get("level"):
-                    continue
-
-            if filters.get("region", None):
-                if game.gameRegion != filters.get("region"):
-                    continue
-
-            if filters.get("public", False):
-                if not game.gamePublic:
-                    continue
-
-            if filters.get("punkbuster", False):
-                if not game.serverPunkbuster:
-                    continue
-
-            if filters.get("password", False):
-                if not game.serverHasPassword:
-                    continue
-
-            if filters.get("softcore", False):
-                if not game.serverSoftcore:
-                    continue
-
-            if filters.get("ea", False):
-                if not game.serverEA:
-                    continue
-
-            game_data = {
-                "LID": game.lobby.id,
-                "GID": game.id,
-                "N": game.name,
-                "AP": game.activePlayers,
-                "JP": game.joiningPlayers,
-                "QP": game.queuedPlayers,
-                "MP": game.maxPlayers,
-                "F": 0,  # Is Player Favorite
-                "NF": 0,  # Favorite Player Count
-                "HU": game.owner.id,
-                "HN": game.owner.name,
-                "I": game.addrIp,
-                "P": game.addrPort,
-                "J": game.joinMode,
-                "PL": game.platform,
-                "PW": int(game.isPasswordRequired),
-                "V": game.clientVersion,
-                "TYPE": game.gameType,
-                "B-numObservers": game.numObservers,
-                "B-maxObservers": game.maxObservers,
-                "B-version": game.serverVersion,
-                "B-U-region": game.gameRegion,
-                "B-U-level": game.gameLevel,
-                "B-U-elo": game.gameElo,
-                "B-U-Softcore": int(game.serverSoftcore),
-                "B-U-Hardcore": int(game.serverHardcore),
-                "B-U-EA": int(game.serverEA),
-                "B-U-HasPassword": int(game.serverHasPassword),
-                "B-U-public": int(game.gamePublic),
-                "B-U-QueueLength": game.queueLength,
-                "B-U-gameMod": game.gameMod,
-                "B-U-gamemode": game.gameMode,
-                "B-U-sguid": game.gameSGUID,
-                "B-U-Provider": game.providerId,
-                "B-U-Time": game.gameTime,
-                "B-U-hash": game.gameHash,
-                "B-U-Punkbuster": int(game.serverPunkbuster),
-            }
-
-            if game_data["B-U-Punkbuster"]:
-                game_data["B-U-PunkBusterVersion"] = game.punkBusterVersion
-
-            games.append(game_data)
-
-        return games
+        # Only ids are selected, games which aren't cached yet are read (and encoded) all at once
+        gids = list(filtered_games.values_list("id", flat=True))
+        bodies = game_data_cache.get_many(gids)
+        missing = [gid for gid in gids if gid not in bodies]
+
+        if missing:
+            for game in self.filter(id__in=missing).select_related("owner"):
+                bodies[game.id] = game_data_cache.set(game.id, get_list_data(game))
+
+        return [bodies[gid] for gid in gids if gid in bodies]
 
     @sync_to_async
     def get_lobby_games_count(self, lobby):
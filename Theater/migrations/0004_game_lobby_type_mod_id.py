@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Theater", "0003_playerdata_gamedescription"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["lobby", "gameType", "gameMod", "id"],
+                name="game_lobby_type_mod_id",
+            ),
+        ),
+    ]
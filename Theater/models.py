@@ -282,6 +282,13 @@ class Game(models.Model):
         verbose_name = "Game"
         verbose_name_plural = "Games"
         ordering = ("id",)
+        # Game list is filtered by these and paged by id
+        indexes = [
+            models.Index(
+                fields=["lobby", "gameType", "gameMod", "id"],
+                name="game_lobby_type_mod_id",
+            )
+        ]
 
 
 class GameDescription(models.Model):
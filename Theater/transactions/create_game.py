@@ -1,8 +1,7 @@
 from ipaddress import ip_address
 
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 from Theater.models import Game, Lobby
 
 
@@ -32,6 +31,6 @@ async def create_game(connection, message):
         response.Set(key, gameData[key])
 
     connection.game = gameObj
-    cache.set(f"gameSession:{gameData['GID']}", connection.lkey, timeout=None)
+    await GameSession(gameData["GID"]).create(connection.lkey)
 
     yield response
@@ -1,18 +1,20 @@
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 
 
 async def dequeue_player(connection, message):
     gid = message.Get("GID")
     pid = message.Get("PID")
 
-    queue_str = cache.get_or_set(f"queue:{gid}", "", timeout=None)
-    queue_list = queue_str.split(";")
-    queue_list.remove(str(pid))
-    cache.set(f"queue:{gid}", ";".join(queue_list), timeout=None)
+    session = GameSession(gid)
+    dequeued = await session.queue.dequeue(pid)
+
+    await session.remove_player(pid)
 
-    cache.delete(f"players:{gid}:{pid}")
-    cache.delete(f"playerData:{gid}:{pid}")
+    if dequeued and connection.game:
+        # Everyone behind the dequeued player moved forward
+        await session.send_queue_positions(
+            connection, connection.game.lobby_id, *dequeued
+        )
 
     yield Packet()
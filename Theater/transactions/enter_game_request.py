@@ -1,9 +1,8 @@
 import random
 import string
 
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 from Theater.models import Game
 
 
@@ -16,13 +15,12 @@ async def enter_game_request(connection, message):
     if not game:
         return
 
+    session = GameSession(gid)
+
     # pid is the unique player id on the game server
-    pid = cache.get_or_set(f"nextServerPlayerID:{gid}", 0, timeout=None)
+    pid = await session.add_player(connection.lkey)
     connection.pid = pid
 
-    cache.incr(f"nextServerPlayerID:{gid}")
-    cache.set(f"players:{gid}:{pid}", connection.lkey, timeout=None)
-
     response = Packet()
     response.Set("LID", lid)
     response.Set("GID", gid)
@@ -32,26 +30,21 @@ async def enter_game_request(connection, message):
     if serverFull:
         response.kind = 0x71756575
 
-        queue_str = cache.get_or_set(f"queue:{gid}", "", timeout=None)
-        queue_list = queue_str.split(";")
-        queue_list.append(str(pid))
-        queue_str = ";".join(queue_list)
-        cache.set(f"queue:{gid}", queue_str, timeout=None)
-        cache.set(
-            f"playerData:{gid}:{pid}",
+        position, length = await session.queue.enqueue(pid)
+        await session.set_player_data(
+            pid,
             f"{connection.persona.id};{message.Get('R-INT-IP')}:{message.Get('R-INT-PORT')};{connection.ip}:{message.Get('PORT')};{message.Get('PTYPE')}",
-            timeout=None,
         )
 
-        response.Set("QPOS", queue_list.index(str(pid)) - 1)
-        response.Set("QLEN", len(queue_list) - 1)
+        response.Set("QPOS", position)
+        response.Set("QLEN", length)
 
     yield response
 
     # Ticket is random 10 digit number, it has to be sent to both client and server
     ticket = "".join(random.choices(string.digits, k=10))
 
-    gameSession = cache.get(f"gameSession:{gid}")
+    gameSession = await session.get_server()
 
     # Sent "Enter Game Host Request" to the game server
     if not serverFull:
@@ -1,13 +1,17 @@
+from django.conf import settings
+
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_data_cache import game_data_packet
+from Theater.game_list_cache import game_list_cache, get_filter_key
 from Theater.models import Game, Lobby
 
 
 async def get_game_list(connection, message):
-    lobby = await Lobby.objects.get_lobby(message.Get("LID"))
+    lid = message.Get("LID")
 
     gameType = message.Get("TYPE")
     gameMod = message.Get("FILTER-ATTR-U-gameMod")
-    count = message.Get("COUNT")
+    count = int(message.Get("COUNT"))
 
     favOnly = message.Get("FILTER-FAV-ONLY")
     favGame = None
@@ -15,61 +19,54 @@ async def get_game_list(connection, message):
     if favOnly:
         favGame = message.Get("FAV-GAME")
 
-    notFull = message.Get("FILTER-NOT-FULL")
-    minPlayers = message.Get("FILTER-MIN-SIZE")
-
-    # Attributes
-    gamemode = message.Get("FILTER-ATTR-U-gamemode")
-    level = message.Get("FILTER-ATTR-U-level")
-    region = message.Get("FILTER-ATTR-U-region")
-
-    public = message.Get("FILTER-ATTR-U-public")
-    punkbuster = message.Get("FILTER-ATTR-U-Punkbuster")
-    password = message.Get("FILTER-ATTR-U-HasPassword")
-    softcore = message.Get("FILTER-ATTR-U-Softcore")
-    ea = message.Get("FILTER-ATTR-U-EA")
-
     gid = message.Get("GID")
 
     if gid is None:
         gid = 0
 
-    games = await Game.objects.get_games(
-        lobby,
-        gameType,
-        gameMod,
-        int(count),
-        gid,
-        favGame=favGame,
-        notFull=notFull,
-        minPlayers=minPlayers,
-        gamemode=gamemode,
-        level=level,
-        region=region,
-        public=public,
-        punkbuster=punkbuster,
-        password=password,
-        softcore=softcore,
-        ea=ea,
-    )
-
-    lobby_game_count = await Game.objects.get_lobby_games_count(lobby)
+    filters = {
+        "favGame": favGame,
+        "notFull": message.Get("FILTER-NOT-FULL"),
+        "minPlayers": message.Get("FILTER-MIN-SIZE"),
+        # Attributes
+        "gamemode": message.Get("FILTER-ATTR-U-gamemode"),
+        "level": message.Get("FILTER-ATTR-U-level"),
+        "region": message.Get("FILTER-ATTR-U-region"),
+        "public": message.Get("FILTER-ATTR-U-public"),
+        "punkbuster": message.Get("FILTER-ATTR-U-Punkbuster"),
+        "password": message.Get("FILTER-ATTR-U-HasPassword"),
+        "softcore": message.Get("FILTER-ATTR-U-Softcore"),
+        "ea": message.Get("FILTER-ATTR-U-EA"),
+    }
+
+    async def load_game_list():
+        lobby = await Lobby.objects.get_lobby(lid)
+        games = await Game.objects.get_games(
+            lobby, gameType, gameMod, count, gid, **filters
+        )
+        lobby_game_count = await Game.objects.get_lobby_games_count(lobby)
+
+        return lobby.id, lobby.maxGames, lobby_game_count, games
+
+    if settings.GAME_LIST_CACHE:
+        # Clients browsing with the same filters at the same time share one (short-lived) result
+        lobby_id, max_games, lobby_game_count, games = await game_list_cache.get(
+            get_filter_key(lid, gameType, gameMod, count, gid, **filters),
+            load_game_list,
+        )
+    else:
+        lobby_id, max_games, lobby_game_count, games = await load_game_list()
 
     game_list = Packet()
     game_list.Set("LOBBY-NUM-GAMES", lobby_game_count)
     game_list.Set("NUM-GAMES", len(games))
-    game_list.Set("LID", lobby.id)
-    game_list.Set("LOBBY-MAX-GAMES", lobby.maxGames)
+    game_list.Set("LID", lobby_id)
+    game_list.Set("LOBBY-MAX-GAMES", max_games)
 
     yield game_list
 
-    for game in games:
-        game_data = Packet(service="GDAT")  # GDAT = Game Data
-
-        for key in game:
-            if game[key] is None:
-                continue
-
-            game_data.Set(key, game[key])
+    # Games are cached already encoded (without TID), GDAT = Game Data
+    tid = message.Get("TID")
 
-        yield game_data
+    for body in games:
+        yield game_data_packet(body, tid)
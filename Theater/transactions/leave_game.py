@@ -1,6 +1,5 @@
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 
 
 async def leave_game(connection, message):
@@ -8,19 +7,14 @@ async def leave_game(connection, message):
     gid = message.Get("GID")
 
     if connection.pid:
-        queue_str = cache.get_or_set(f"queue:{gid}", "", timeout=None)
-        queue_list = queue_str.split(";")
-
-        try:
-            queue_list.remove(str(connection.pid))
-        except ValueError:
-            # Server probably is shutdown and we cannot remove the player from the queue, ignore this exception
-            pass
+        # Player might not be queued (or server is already shut down and queue is gone)
+        session = GameSession(gid)
+        dequeued = await session.queue.dequeue(connection.pid)
 
-        cache.set(f"queue:{gid}", ";".join(queue_list), timeout=None)
+        await session.remove_player(connection.pid)
 
-        cache.delete(f"players:{gid}:{connection.pid}")
-        cache.delete(f"playerData:{gid}:{connection.pid}")
+        if dequeued:
+            await session.send_queue_positions(connection, lid, *dequeued)
 
     connection.pid = None
 
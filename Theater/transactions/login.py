@@ -1,7 +1,6 @@
-from channels.auth import database_sync_to_async
-from django.core.cache import cache
-
 from BFBC2_MasterServer.packet import Packet
+from BFBC2_MasterServer.session_store import session_store
+from Plasma.identity_cache import identity_cache
 from Plasma.models import Persona
 
 
@@ -25,25 +24,29 @@ async def login(connection, message):
         connection.logger.error("Client sent invalid Login packet")
         return
 
-    persona_id = cache.get(f"lkeyMap:{lkey}")
+    persona_id = await identity_cache.get_persona_id(lkey)
 
     if persona_id is None:
         connection.logger.error("Invalid persona login key, login failed")
         return
 
-    try:
-        persona = await database_sync_to_async(Persona.objects.get)(id=persona_id)
-        connection.persona = persona
-    except Persona.DoesNotExist:
+    personaInfo = await identity_cache.get_persona(persona_id)
+
+    if personaInfo is None:
         connection.logger.error("Login key is for invalid persona, login failed")
         return
 
+    # Persona is built from cached fields (enough for reading its name and referencing it), without database query
+    name, account_id = personaInfo
+    persona = Persona(id=persona_id, name=name, account_id=account_id)
+    connection.persona = persona
+
     connection.logger.info(f"Persona {persona.name} logged in")
 
     response = Packet()
     response.Set("NAME", persona.name)
 
-    cache.set(f"theaterSession:{lkey}", connection.channel_name, timeout=None)
+    await session_store.set_theater_session(lkey, connection.channel_name)
     connection.lkey = lkey
 
     yield response
@@ -1,5 +1,10 @@
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 
 
 async def ping(connection, message):
     yield Packet()
+
+    if connection.game:
+        # Game server is still alive, keep its session
+        await GameSession(connection.game.id).refresh()
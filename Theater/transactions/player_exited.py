@@ -1,4 +1,5 @@
 from BFBC2_MasterServer.packet import Packet
+from Theater.game_session import GameSession
 from Theater.models import Game
 
 
@@ -15,6 +16,7 @@ async def player_exited(connection, message):
     yield kickPacket
 
     await Game.objects.decrement_active_players(lid, gid)
+    await GameSession(gid).remove_player(pid)
 
     response = Packet()
     yield response
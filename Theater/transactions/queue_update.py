@@ -2,10 +2,10 @@ import random
 import string
 
 from channels.auth import database_sync_to_async
-from django.core.cache import cache
 
 from BFBC2_MasterServer.packet import Packet
 from Plasma.models import Persona
+from Theater.game_session import GameSession
 from Theater.models import Game
 
 
@@ -27,18 +27,17 @@ async def queue_update(connection, message):
 
     pid = message.Get("QUEUE")
 
-    queue_str = cache.get_or_set(f"queue:{gid}", "", timeout=None)
-    queue_list = queue_str.split(";")
+    session = GameSession(gid)
 
-    idx = queue_list.index(str(pid)) - 1
-    playerSession = cache.get(f"players:{gid}:{pid}")
+    position, length = await session.queue.get_position(pid)
+    playerSession, playerData = await session.get_player(pid)
 
     serverFull = game.activePlayers + 1 > game.maxPlayers
 
-    if serverFull:
+    if serverFull and position is not None:
         queueInfoNotice = {
-            "QPOS": idx,
-            "QLEN": len(queue_list) - 1,
+            "QPOS": position,
+            "QLEN": length,
             "LID": lid,
             "GID": gid,
         }
@@ -50,8 +49,6 @@ async def queue_update(connection, message):
     if serverFull:
         return
 
-    playerData = cache.get(f"playerData:{gid}:{pid}")
-
     persona_id, int_addr, addr, ptype = playerData.split(";")
     persona = await database_sync_to_async(Persona.objects.get)(id=persona_id)
 
@@ -1,6 +1,10 @@
 import logging
 from enum import Enum
+from time import perf_counter
 
+from packaging import version
+
+from BFBC2_MasterServer.metrics import Counter, Histogram
 from BFBC2_MasterServer.packet import Packet
 from Theater.transactions.connect import connect
 from Theater.transactions.create_game import create_game
@@ -23,6 +27,19 @@ from Theater.transactions.update_game_details import update_game_details
 
 logger = logging.getLogger(__name__)
 
+SERVER_VERSION = version.parse("2.0")  # Game servers identify as 2.0, clients as 1.0
+
+transaction_duration = Histogram(
+    "theater_transaction_duration_seconds",
+    "Time spent handling transactions started by clients (including sending responses)",
+    ["txn", "type"],
+)
+transaction_errors = Counter(
+    "theater_transaction_errors_total",
+    "Transactions started by clients which failed with an exception",
+    ["txn", "type"],
+)
+
 
 class Transaction(Enum):
     Connect = "CONN"
@@ -167,23 +184,41 @@ class Transactor:
             )
             return
 
-        if responses is not None:
-            async for response in responses:
-                if response is None:
-                    continue
+        start = perf_counter()
+        failed = True
+
+        try:
+            if responses is not None:
+                async for response in responses:
+                    if response is None:
+                        continue
+
+                    if response.service is None:
+                        response.service = transaction.value
+
+                    if response.kind is None:
+                        response.kind = TransactionKind.NormalResponse.value
 
-                if response.service is None:
-                    response.service = transaction.value
+                    if transaction == Transaction.Ping:
+                        response.Set("TID", 0)
+                    elif not response.precompiled:
+                        # Cached responses (GDAT) already contain TID, only header is compiled for them
+                        response.Set("TID", self.tid)
 
-                if response.kind is None:
-                    response.kind = TransactionKind.NormalResponse.value
+                    await self.connection.send_packet(response)
 
-                if transaction != Transaction.Ping:
-                    response.Set("TID", self.tid)
-                else:
-                    response.Set("TID", 0)
+            failed = False
+        finally:
+            client_type = (
+                "server" if self.connection.vers == SERVER_VERSION else "client"
+            )
+
+            transaction_duration.observe(
+                perf_counter() - start, transaction.value, client_type
+            )
 
-                await self.connection.send_packet(response)
+            if failed:
+                transaction_errors.inc(transaction.value, client_type)
 
         if not self.connection.currentlyUpdating:
             self.tid += 1
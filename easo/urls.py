@@ -2,10 +2,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path
 
-from easo.views import fileupload_locker, healthcheck
+from easo.views import fileupload_locker, healthcheck, metrics
 
 urlpatterns = [
     path("healthcheck", healthcheck),
+    path("metrics", metrics),
     path("fileupload/locker2.jsp", fileupload_locker),
 ] + static(
     "/editorial/BF/2010/BFBC2/config/PC/",
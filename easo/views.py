@@ -1,9 +1,13 @@
+from hmac import compare_digest
+
 from django.conf import settings
-from django.core.cache import cache
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
 from django.views.defaults import server_error
 
+from BFBC2_MasterServer.metrics import render as render_metrics
+from BFBC2_MasterServer.session_store import session_store
+
 
 # Create your views here.
 
@@ -21,7 +25,25 @@ def healthcheck(request):
     return HttpResponse("<h1>It Works!</h1>")
 
 
-def fileupload_locker(request):
+def metrics(request):
+    # Prometheus text exposition format, only served to scrapers with the token (as bearer token)
+
+    if not settings.METRICS_TOKEN:
+        raise Http404()
+
+    authorization = request.headers.get("Authorization", "")
+
+    if not compare_digest(
+        authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+async def fileupload_locker(request):
     # More-or-less original server behaviour
 
     cmd = request.GET.get("cmd", None)
@@ -30,7 +52,7 @@ def fileupload_locker(request):
         return server_error(request)
 
     lkey = request.GET.get("lkey")
-    personaId = cache.get(f"lkeyMap:{lkey}")
+    personaId = await session_store.get_persona_id(lkey)
 
     locker = '<?xml version="1.0" encoding="UTF-8"?>'
 